@@ -0,0 +1,97 @@
+# assets.py
+# =============================
+# 靜態資源指紋 (Fingerprinted asset pipeline)
+# =============================
+# 功能說明：
+# - 原始檔放在 styles/（例如 styles/base.css、styles/jobList.css）
+# - build：依內容 SHA-256 產生 www/assets/base.<hash>.css，並寫入 www/assets/manifest.json
+#   （原始名稱 -> 指紋名稱）；內容改變檔名就改變，可由 /static 永久快取（staticFiles.py）
+# - 模板以 {{ asset("base.css") }} 取得帶指紋的網址
+# - 部署時由 python buildStatic.py 產生（並一併預先壓縮）；
+#   manifest 不存在時（開發環境）第一次呼叫 url 會自動建置
+# - ASSETS_RELOAD=1：每次呼叫都檢查原始檔（開發時修改 CSS 不需重新啟動）
+# =============================
+
+import hashlib
+import json
+import os
+import re
+
+SOURCE_DIR = "styles"
+OUTPUT_DIR = os.path.join("www", "assets")
+URL_PREFIX = "/static/assets"
+MANIFEST = os.path.join(OUTPUT_DIR, "manifest.json")
+
+HASH_LENGTH = 12
+# 帶指紋的檔名：name.<12 碼 hex>.ext
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{%d}\.[A-Za-z0-9]+$" % HASH_LENGTH)
+
+RELOAD = os.environ.get("ASSETS_RELOAD", "0") == "1"
+
+_manifest = None
+
+
+def _sources(source_dir):
+    for dirpath, _, filenames in os.walk(source_dir):
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            yield os.path.relpath(path, source_dir).replace(os.sep, "/"), path
+
+
+def _fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def build(source_dir=SOURCE_DIR, output_dir=OUTPUT_DIR):
+    """
+    產生所有帶指紋的檔案與 manifest，回傳 manifest。
+    已存在的指紋檔內容必定相同，直接跳過；舊版本保留，讓仍在使用舊頁面的瀏覽器取得。
+    """
+    global _manifest
+    manifest = {}
+    for name, path in _sources(source_dir):
+        with open(path, "rb") as f:
+            data = f.read()
+        hashed = _fingerprint(name, data)
+        manifest[name] = hashed
+        dest = os.path.join(output_dir, *hashed.split("/"))
+        if os.path.exists(dest):
+            continue
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.{os.getpid()}.part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dest)
+
+    tmp = f"{os.path.join(output_dir, 'manifest.json')}.{os.getpid()}.part"
+    os.makedirs(output_dir, exist_ok=True)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(output_dir, "manifest.json"))
+    _manifest = manifest
+    return manifest
+
+
+def _load():
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST, encoding="utf-8") as f:
+                _manifest = json.load(f)
+        except FileNotFoundError:
+            build()
+    return _manifest
+
+
+def url(name):
+    # 模板 helper：{{ asset("base.css") }} -> /static/assets/base.3f2a9c1d0b4e.css
+    manifest = build() if RELOAD else _load()
+    hashed = manifest.get(name)
+    if hashed is None:
+        raise KeyError(f"找不到資源 {name!r}（請確認 styles/{name} 存在並執行 python buildStatic.py）")
+    return f"{URL_PREFIX}/{hashed}"
+
+
+def isFingerprinted(path):
+    return bool(FINGERPRINTED.search(path))
@@ -0,0 +1,6 @@
+# bench/
+# =============================
+# 效能基準測試 (Benchmarks)
+# =============================
+# 以 python -m bench.<模組> 執行，需連線至本機 PostgreSQL（設定同 db.py）
+# =============================
@@ -0,0 +1,182 @@
+# bench/bidContention.py
+# =============================
+# 競標爭搶基準 (Bid contention)
+# =============================
+# 數百個乙方同時對同一個新案件出價，比較：
+# - legacy：舊版 placeBid（SELECT budget → DELETE → INSERT → UPDATE，四次往返）
+# - atomic：jobs.placeBid（單一 CTE 敘述）
+#
+# 每個乙方連續出價 --rounds 次，其中一半的乙方會「連點」：同時送出兩筆出價。
+# 結束後驗證：
+# - 每個乙方在 bids 中剛好一筆，金額等於他最後一次成功送出的金額之一
+# - 案件狀態為「待確認」
+# - 出價過程沒有錯誤（legacy 在連點時會撞上 bids_job_bidder_key）
+#
+# 需先執行 python -m bench.seed 產生 bench_ 乙方帳號
+# 執行：python -m bench.bidContention --bidders 300 --rounds 5 --connections 20
+# =============================
+
+import argparse
+import asyncio
+import random
+import time
+
+import psycopg
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+import db
+import jobs
+import statements
+from bench import seed
+from bench.report import percentile
+
+BUDGET = 1000
+
+
+async def legacyPlaceBid(conn, job_id, bidder_id, amount):
+    # 舊版實作（僅供比較）
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT budget FROM jobs WHERE id=%s;", (job_id,))
+        job = await cur.fetchone()
+        if not job:
+            return {"result": "job_not_found"}
+        if amount <= job["budget"]:
+            return {"result": "too_low"}
+        await cur.execute("DELETE FROM bids WHERE job_id=%s AND bidder_id=%s;", (job_id, bidder_id))
+        await cur.execute(
+            "INSERT INTO bids (job_id, bidder_id, amount) VALUES (%s, %s, %s);",
+            (job_id, bidder_id, amount)
+        )
+        await cur.execute("UPDATE jobs SET status = '待確認' WHERE id = %s AND status = '新工作';", (job_id,))
+        await conn.commit()
+        return {"result": "success"}
+
+
+IMPLEMENTATIONS = {"legacy": legacyPlaceBid, "atomic": jobs.placeBid}
+
+
+async def _configure(conn):
+    statements.configureConnection(conn)
+
+
+async def _createJob(pool, client_id):
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            "INSERT INTO jobs (title, content, budget, client_id) VALUES (%s, %s, %s, %s) RETURNING id;",
+            ("bench 競標爭搶", "bench", BUDGET, client_id)
+        )
+        return (await cur.fetchone())["id"]
+
+
+async def _bidder(pool, fn, job_id, bidder_id, rounds, double_click, rng, samples, errors, sent):
+    async def one(amount):
+        start = time.perf_counter()
+        try:
+            async with pool.connection() as conn:
+                result = await fn(conn, job_id, bidder_id, amount)
+        except psycopg.Error as e:
+            errors.append(type(e).__name__)
+            return
+        samples.append((time.perf_counter() - start) * 1000)
+        if result["result"] == "success":
+            sent.setdefault(bidder_id, set()).add(amount)
+
+    for _ in range(rounds):
+        amount = BUDGET + rng.randrange(1, 100000)
+        if double_click:
+            await asyncio.gather(one(amount), one(amount + 1))
+        else:
+            await one(amount)
+
+
+async def _verify(pool, job_id, bidders, sent):
+    async with pool.connection() as conn:
+        cur = await conn.execute("SELECT bidder_id, amount FROM bids WHERE job_id = %s;", (job_id,))
+        rows = await cur.fetchall()
+        cur = await conn.execute("SELECT status FROM jobs WHERE id = %s;", (job_id,))
+        status = (await cur.fetchone())["status"]
+
+    problems = []
+    per_bidder = {}
+    for row in rows:
+        per_bidder.setdefault(row["bidder_id"], []).append(row["amount"])
+    duplicates = [b for b, amounts in per_bidder.items() if len(amounts) > 1]
+    if duplicates:
+        problems.append(f"{len(duplicates)} 個乙方有重複報價")
+    missing = [b for b in bidders if b in sent and b not in per_bidder]
+    if missing:
+        problems.append(f"{len(missing)} 個乙方的報價遺失")
+    wrong = [b for b, amounts in per_bidder.items() if amounts[0] not in sent.get(b, ())]
+    if wrong:
+        problems.append(f"{len(wrong)} 個報價金額不是該乙方送出的值")
+    if status != "待確認":
+        problems.append(f"案件狀態為 {status}")
+    return problems
+
+
+async def run(name, pool, job_id, bidders, args):
+    fn = IMPLEMENTATIONS[name]
+    samples, errors, sent = [], [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _bidder(pool, fn, job_id, bidder, args.rounds, i % 2 == 0, random.Random(args.seed + i),
+                samples, errors, sent)
+        for i, bidder in enumerate(bidders)
+    ))
+    elapsed = time.perf_counter() - start
+    problems = await _verify(pool, job_id, bidders, sent)
+    return {
+        "bids": len(samples),
+        "errors": len(errors),
+        "bids_per_s": len(samples) / elapsed,
+        "p50_ms": percentile(samples, 50),
+        "p99_ms": percentile(samples, 99),
+        "problems": problems,
+    }
+
+
+async def main(args):
+    async with await psycopg.AsyncConnection.connect(db.DATABASE_URL, row_factory=dict_row) as conn:
+        fixture = await seed.loadFixture(conn)
+    names = set(fixture["freelancers"])
+    bidders = [uid for uid, name in fixture["user_names"].items() if name in names][:args.bidders]
+    client_name = fixture["clients"][0]
+    client_id = next(uid for uid, name in fixture["user_names"].items() if name == client_name)
+    if len(bidders) < args.bidders:
+        print(f"⚠️  只有 {len(bidders)} 個 bench 乙方帳號，請以較大的 --users 重新 seed")
+
+    pool = AsyncConnectionPool(
+        db.DATABASE_URL, kwargs={"row_factory": dict_row}, configure=_configure,
+        min_size=args.connections, max_size=args.connections, open=False
+    )
+    await pool.open()
+    await pool.wait()
+    results = {}
+    job_ids = []
+    try:
+        for name in args.implementations.split(","):
+            job_id = await _createJob(pool, client_id)
+            job_ids.append(job_id)
+            results[name] = await run(name, pool, job_id, bidders, args)
+    finally:
+        async with pool.connection() as conn:
+            await conn.execute("DELETE FROM jobs WHERE id = ANY(%s);", (job_ids,))
+        await pool.close()
+
+    print(f"{len(bidders)} 個乙方 × {args.rounds} 輪，{args.connections} 條連線")
+    print(f"{'impl':<8} {'bids':>7} {'errors':>7} {'bids/s':>9} {'p50 ms':>9} {'p99 ms':>9}  驗證")
+    for name, r in results.items():
+        verdict = "✅" if not r["problems"] and not r["errors"] else "❌ " + "；".join(r["problems"])
+        print(f"{name:<8} {r['bids']:>7} {r['errors']:>7} {r['bids_per_s']:>9.0f}"
+              f" {r['p50_ms'] or 0:>9.2f} {r['p99_ms'] or 0:>9.2f}  {verdict}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="同一案件的並行出價：legacy vs. atomic")
+    parser.add_argument("--bidders", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--implementations", default="legacy,atomic")
+    parser.add_argument("--seed", type=int, default=1141)
+    asyncio.run(main(parser.parse_args()))
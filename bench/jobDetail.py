@@ -0,0 +1,69 @@
+# bench/jobDetail.py
+# =============================
+# 案件詳情查詢微基準
+# =============================
+# 比較兩種取得案件詳情的方式：
+# - three_calls：getJob → getBids → getDeliverable（三次網路往返）
+# - pipeline：jobs.getJobDetail（一次網路往返）
+#
+# 執行：python -m bench.jobDetail --job-id 1 --iterations 500
+# 資料庫位於其他機房時差距最明顯，可搭配 DATABASE_URL 指向遠端資料庫
+# =============================
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import db
+import jobs
+from bench.report import percentile
+
+
+async def threeCalls(conn, job_id):
+    return {
+        "job": await jobs.getJob(conn, job_id),
+        "bids": await jobs.getBids(conn, job_id),
+        "deliverable": await jobs.getDeliverable(conn, job_id),
+    }
+
+
+async def measure(fn, conn, job_id, iterations, warmup):
+    for _ in range(warmup):
+        await fn(conn, job_id)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn(conn, job_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+    }
+
+
+async def main(args):
+    await db.openPool()
+    try:
+        async with db.getPool().connection() as conn:
+            results = {
+                "three_calls": await measure(threeCalls, conn, args.job_id, args.iterations, args.warmup),
+                "pipeline": await measure(jobs.getJobDetail, conn, args.job_id, args.iterations, args.warmup),
+            }
+    finally:
+        await db.closePool()
+
+    print(f"{'path':<12} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['mean_ms']:>10.3f} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f}")
+    speedup = results["three_calls"]["mean_ms"] / results["pipeline"]["mean_ms"]
+    print(f"pipeline speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="案件詳情查詢：三次往返 vs. pipeline")
+    parser.add_argument("--job-id", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
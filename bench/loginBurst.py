@@ -0,0 +1,94 @@
+# bench/loginBurst.py
+# =============================
+# 登入尖峰對首頁延遲的影響
+# =============================
+# 在行程內呼叫 main.app，持續以 --browsers 個虛擬使用者瀏覽 /，
+# 先量一段基準延遲，再同時送出 --logins 個登入請求，比較尖峰期間 / 的 p50 / p99：
+# - pool（預設）：scrypt 在 credentials 的 thread pool 計算
+# - --inline：直接在 event loop 上計算（改版前的情況），作為對照
+#
+# 需先執行 python -m bench.seed 產生 bench_ 帳號
+# 執行：python -m bench.loginBurst --browsers 10 --logins 200
+# =============================
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import psycopg
+from psycopg.rows import dict_row
+
+import credentials
+import db
+import ratelimit
+from bench import seed
+from bench.report import percentile
+
+
+async def _browse(client, samples, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/")
+        if response.status_code == 200:
+            samples.append((time.perf_counter() - start) * 1000)
+
+
+async def _login(client, username, password, statuses):
+    response = await client.post("/login", data={"username": username, "password": password})
+    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def _phase(transport, args, fixture, with_logins):
+    samples, statuses = [], {}
+    stop = asyncio.Event()
+    clients = [httpx.AsyncClient(transport=transport, base_url="http://bench") for _ in range(args.browsers)]
+    browsers = [asyncio.create_task(_browse(c, samples, stop)) for c in clients]
+    start = time.perf_counter()
+    if with_logins:
+        names = fixture["freelancers"]
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await asyncio.gather(*(
+                _login(client, names[i % len(names)], fixture["password"], statuses)
+                for i in range(args.logins)
+            ))
+        elapsed = time.perf_counter() - start
+    else:
+        await asyncio.sleep(args.baseline)
+        elapsed = args.baseline
+    stop.set()
+    await asyncio.gather(*browsers)
+    for c in clients:
+        await c.aclose()
+    return samples, statuses, elapsed
+
+
+async def main(args):
+    credentials.INLINE = args.inline
+    # 所有登入來自同一個 IP，量測時停用限流
+    ratelimit.ENABLED = False
+    async with await psycopg.AsyncConnection.connect(db.DATABASE_URL, row_factory=dict_row) as conn:
+        fixture = await seed.loadFixture(conn)
+
+    import main as app_module
+
+    async with app_module.lifespan(app_module.app):
+        transport = httpx.ASGITransport(app=app_module.app)
+        baseline, _, _ = await _phase(transport, args, fixture, with_logins=False)
+        burst, statuses, elapsed = await _phase(transport, args, fixture, with_logins=True)
+
+    mode = "inline" if args.inline else f"thread pool ({credentials.WORKERS} workers)"
+    print(f"密碼雜湊：{mode}，{args.logins} 個登入，耗時 {elapsed:.2f}s，狀態碼 {statuses}")
+    print(f"{'GET /':<10} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, samples in (("baseline", baseline), ("burst", burst)):
+        p50, p99 = percentile(samples, 50), percentile(samples, 99)
+        print(f"{name:<10} {len(samples):>9} {p50 or 0:>9.2f} {p99 or 0:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="登入尖峰期間的首頁延遲")
+    parser.add_argument("--browsers", type=int, default=10)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--baseline", type=float, default=5, help="基準量測秒數")
+    parser.add_argument("--inline", action="store_true", help="在 event loop 上計算雜湊（對照組）")
+    asyncio.run(main(parser.parse_args()))
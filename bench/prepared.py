@@ -0,0 +1,66 @@
+# bench/prepared.py
+# =============================
+# Prepared statement 微基準
+# =============================
+# 以三種 prepare 模式各跑一次熱門讀取查詢，比較每秒查詢數：
+# - never：每次都送完整 SQL（prepare=False，等同 PgBouncer 模式）
+# - auto：psycopg 預設，同一 SQL 執行 5 次後才 prepare（prepare=None）
+# - registry：statements.py 的設定，第一次執行就 prepare（prepare=True）
+#
+# 執行：python -m bench.prepared --job-id 1 --iterations 2000
+# =============================
+
+import argparse
+import asyncio
+import time
+
+import db
+import jobs
+import statements
+
+MODES = {"never": False, "auto": None, "registry": True}
+
+
+def _queries(job_id):
+    return {
+        "getJobList": lambda conn: jobs.getJobList(conn),
+        "getJob": lambda conn: jobs.getJob(conn, job_id),
+        "getBids": lambda conn: jobs.getBids(conn, job_id),
+    }
+
+
+async def measure(fn, iterations):
+    # 每個模式使用新的連線，避免沿用前一個模式已 prepare 的敘述
+    async with db.getPool().connection() as conn:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await fn(conn)
+        elapsed = time.perf_counter() - start
+    return iterations / elapsed
+
+
+async def main(args):
+    await db.openPool()
+    results = {}
+    try:
+        for mode, prepare in MODES.items():
+            statements.PREPARE = prepare
+            await db.getPool().drain()
+            results[mode] = {
+                name: await measure(fn, args.iterations)
+                for name, fn in _queries(args.job_id).items()
+            }
+    finally:
+        await db.closePool()
+
+    names = list(_queries(args.job_id))
+    print(f"{'mode':<10}" + "".join(f"{n + ' qps':>16}" for n in names))
+    for mode, r in results.items():
+        print(f"{mode:<10}" + "".join(f"{r[n]:>16.0f}" for n in names))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="prepared statement 模式比較")
+    parser.add_argument("--job-id", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+# bench/report.py
+# =============================
+# 基準測試報告 (Latency / RPS report)
+# =============================
+# - summarize：由每個請求的延遲與狀態碼算出 p50 / p95 / p99、RPS、錯誤數
+# - save / load：報告以 JSON 存放於 bench/results/，方便跨版本比較
+# - compare：比較兩份報告，p95 或 RPS 退步超過門檻時以結束碼 1 失敗
+#
+# 執行：python -m bench.report bench/results/舊.json bench/results/新.json --threshold 10
+# =============================
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(samples, pct):
+    # nearest-rank 百分位數
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples, errors, elapsed, cpu=None):
+    """
+    samples：成功請求的延遲（毫秒）；errors：{狀態碼或例外名稱: 次數}
+    cpu：行程內執行時整段期間的 CPU 秒數（含測試用戶端），用來算每個請求的 CPU 成本
+    """
+    total = len(samples) + sum(errors.values())
+    return {
+        "cpu_ms_per_request": round(cpu * 1000 / total, 3) if cpu is not None and total else None,
+        "requests": total,
+        "errors": dict(errors),
+        "error_rate": round(sum(errors.values()) / total, 4) if total else None,
+        "rps": round(total / elapsed, 2) if elapsed else None,
+        "mean_ms": round(statistics.fmean(samples), 3) if samples else None,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": max(samples) if samples else None,
+    }
+
+
+def _gitCommit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save(results, meta, path=None):
+    # 預設檔名：bench/results/<時間>-<commit>.json
+    now = datetime.datetime.now()
+    commit = _gitCommit()
+    report = {
+        "meta": {"created_at": now.isoformat(timespec="seconds"), "commit": commit, **meta},
+        "scenarios": results,
+    }
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{now:%Y%m%d-%H%M%S}-{commit or 'nogit'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def printTable(results):
+    print(f"{'scenario':<14} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cpu ms/rq':>9}")
+    for name, r in results.items():
+        cells = [r["p50_ms"], r["p95_ms"], r["p99_ms"], r.get("cpu_ms_per_request")]
+        latency = "".join(f"{c:>10.2f}" if c is not None else f"{'-':>10}" for c in cells)
+        errors = sum(r["errors"].values())
+        print(f"{name:<14} {r['requests']:>9} {errors:>7} {r['rps'] or 0:>9.1f}{latency}")
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(old, new, threshold):
+    """
+    比較兩份報告中相同名稱的情境，回傳退步的情境清單：
+    - p95 延遲增加超過 threshold %
+    - RPS 下降超過 threshold %
+    """
+    regressions = []
+    print(f"{'scenario':<14} {'p95 old':>9} {'p95 new':>9} {'Δ%':>7} {'rps old':>9} {'rps new':>9} {'Δ%':>7}")
+    for name, n in new["scenarios"].items():
+        o = old["scenarios"].get(name)
+        if o is None:
+            print(f"{name:<14} （舊報告沒有此情境）")
+            continue
+        p95 = _change(o["p95_ms"], n["p95_ms"])
+        rps = _change(o["rps"], n["rps"])
+        flag = ""
+        if (p95 is not None and p95 > threshold) or (rps is not None and rps < -threshold):
+            regressions.append(name)
+            flag = "  ❌"
+        print(
+            f"{name:<14} {o['p95_ms'] or 0:>9.2f} {n['p95_ms'] or 0:>9.2f} {p95 or 0:>+7.1f}"
+            f" {o['rps'] or 0:>9.1f} {n['rps'] or 0:>9.1f} {rps or 0:>+7.1f}{flag}"
+        )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="比較兩份基準測試報告")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10,
+                        help="p95 增加或 RPS 下降超過此百分比即視為退步（預設 10）")
+    args = parser.parse_args()
+    regressed = compare(load(args.old), load(args.new), args.threshold)
+    if regressed:
+        print(f"退步的情境：{', '.join(regressed)}")
+    sys.exit(1 if regressed else 0)
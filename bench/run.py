@@ -0,0 +1,159 @@
+# bench/run.py
+# =============================
+# 端對端負載測試 (End-to-end load test)
+# =============================
+# 依序執行 bench/scenarios.py 的情境，每個情境以 --concurrency 個虛擬使用者
+# 持續 --duration 秒，記錄每個請求的延遲，最後輸出並存成 JSON 報告：
+# - 預設在行程內透過 ASGI 直接呼叫 main.app（不經網路，量到的是應用程式本身）
+# - --url http://127.0.0.1:8000 改為對執行中的伺服器發送請求（含 uvicorn / 網路開銷）
+# - 每個虛擬使用者有自己的 cookie（session）；需登入的情境會先以 bench_ 帳號登入
+# - 行程內執行時另外記錄每個請求的 CPU 毫秒數（cpu_ms_per_request，含測試用戶端本身）
+#
+# 執行：
+#   python -m bench.seed --reset
+#   python -m bench.run --scenarios browse,read,bid --concurrency 50 --duration 15
+#   python -m bench.report bench/results/舊.json bench/results/新.json
+# =============================
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from contextlib import AsyncExitStack
+
+import httpx
+import psycopg
+from psycopg.rows import dict_row
+
+import db
+import ratelimit
+from bench import report, seed
+from bench.scenarios import SCENARIOS
+
+
+async def _loadFixture():
+    async with await psycopg.AsyncConnection.connect(db.DATABASE_URL, row_factory=dict_row) as conn:
+        return await seed.loadFixture(conn)
+
+
+def _users(fixture, role, count, rng):
+    # 為每個虛擬使用者挑選帳號；乙方優先使用有指派案件的帳號（上傳情境需要 job_id）
+    if role is None:
+        return [{} for _ in range(count)]
+    if role == "甲方":
+        return [{"username": rng.choice(fixture["clients"])} for _ in range(count)]
+    assigned = fixture["assigned"] or [(fixture["hot_job"]["id"], None)]
+    users = []
+    for i in range(count):
+        job_id, freelancer_id = assigned[i % len(assigned)]
+        username = fixture["user_names"].get(freelancer_id) or rng.choice(fixture["freelancers"])
+        users.append({"username": username, "job_id": job_id})
+    return users
+
+
+async def _login(client, fixture, user):
+    response = await client.post(
+        "/login", data={"username": user["username"], "password": fixture["password"]}
+    )
+    if response.status_code != 302:
+        raise SystemExit(f"bench 帳號 {user['username']} 登入失敗（{response.status_code}）")
+
+
+async def _virtualUser(make_client, name, fixture, user, deadline, rng, samples, errors):
+    fn, expected, role = SCENARIOS[name]
+    async with make_client() as client:
+        if role:
+            await _login(client, fixture, user)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await fn(client, fixture, user, rng)
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code == expected:
+                samples.append(elapsed)
+            else:
+                errors[str(response.status_code)] += 1
+
+
+async def runScenario(make_client, name, fixture, concurrency, duration, seed_value, measure_cpu=False):
+    rng = random.Random(seed_value)
+    users = _users(fixture, SCENARIOS[name][2], concurrency, rng)
+    samples, errors = [], Counter()
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    await asyncio.gather(*(
+        _virtualUser(make_client, name, fixture, user, deadline, random.Random(seed_value + i), samples, errors)
+        for i, user in enumerate(users)
+    ))
+    cpu = time.process_time() - cpu_start if measure_cpu else None
+    return report.summarize(samples, errors, time.perf_counter() - start, cpu)
+
+
+async def main(args):
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"未知的情境：{', '.join(unknown)}（可用：{', '.join(SCENARIOS)}）")
+
+    fixture = await _loadFixture()
+    fixture["upload_size"] = args.upload_kb * 1024
+
+    async with AsyncExitStack() as stack:
+        if args.url:
+            target = args.url
+
+            def make_client():
+                return httpx.AsyncClient(base_url=args.url, follow_redirects=False, timeout=args.timeout)
+        else:
+            # 行程內執行：手動進入 lifespan 以開啟連線池；
+            # 所有虛擬使用者來自同一個 IP，除非指定 --rate-limit 否則停用限流
+            ratelimit.ENABLED = args.rate_limit
+            import main as app_module
+
+            await stack.enter_async_context(app_module.lifespan(app_module.app))
+            transport = httpx.ASGITransport(app=app_module.app)
+            target = "in-process"
+
+            def make_client():
+                return httpx.AsyncClient(
+                    transport=transport, base_url="http://bench", follow_redirects=False, timeout=args.timeout
+                )
+
+        results = {}
+        for name in names:
+            print(f"▶ {name}（{args.concurrency} 個虛擬使用者，{args.duration}s）")
+            results[name] = await runScenario(
+                make_client, name, fixture, args.concurrency, args.duration, args.seed,
+                measure_cpu=not args.url
+            )
+
+    report.printTable(results)
+    meta = {
+        "target": target,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "jobs": len(fixture["job_ids"]),
+        "pool_max_size": db.POOL_MAX_SIZE,
+    }
+    path = report.save(results, meta, args.out)
+    print(f"報告已儲存：{path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="端對端負載測試")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"以逗號分隔（預設全部：{','.join(SCENARIOS)}）")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10, help="每個情境的秒數")
+    parser.add_argument("--url", help="對執行中的伺服器測試，例如 http://127.0.0.1:8000")
+    parser.add_argument("--upload-kb", type=int, default=64, help="上傳情境的檔案大小（KB）")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--rate-limit", action="store_true", help="行程內執行時保留限流（預設停用）")
+    parser.add_argument("--seed", type=int, default=1141)
+    parser.add_argument("--out", help="報告路徑（預設 bench/results/<時間>-<commit>.json）")
+    asyncio.run(main(parser.parse_args()))
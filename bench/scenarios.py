@@ -0,0 +1,92 @@
+# bench/scenarios.py
+# =============================
+# 負載測試情境 (Load-test scenarios)
+# =============================
+# 每個情境是一個 async 函式 (client, fixture, user, rng) -> httpx.Response，
+# user 為該虛擬使用者登入的帳號與負責的案件（未登入時為空 dict），
+# 由 bench/run.py 以多個虛擬使用者同時重複執行：
+# - browse：首頁清單（含 keyset 翻頁）
+# - browse_status：首頁 ?status= 篩選
+# - read：/read/{id} 案件詳情
+# - bid：所有乙方同時對同一個熱門案件出價（/bid 爭搶）
+# - upload：乙方上傳小型成果檔（/api/upload）
+# - login：/login 帳密驗證與建立 session
+# - api_list：/api/v1/jobs 清單（與 browse 相同資料的 JSON 版本）
+# - api_batch：/api/v1/jobs/batch 一次取 20 個案件（含報價與成果），與 read 比較每個案件的成本
+# =============================
+
+import os
+
+import httpx
+
+
+async def browse(client, fixture, user, rng):
+    if rng.random() < 0.3:
+        # 約三成請求翻到某個 id 之後的頁面
+        return await client.get("/", params={"after": rng.choice(fixture["job_ids"])})
+    return await client.get("/")
+
+
+async def browseStatus(client, fixture, user, rng):
+    status = rng.choice(["新工作", "進行中", "已完成"])
+    return await client.get("/", params={"status": status})
+
+
+async def read(client, fixture, user, rng):
+    return await client.get(f"/read/{rng.choice(fixture['job_ids'])}")
+
+
+async def bid(client, fixture, user, rng):
+    job = fixture["hot_job"]
+    amount = job["budget"] + rng.randrange(100, 100000)
+    return await client.post("/bid", data={"job_id": job["id"], "amount": amount})
+
+
+async def upload(client, fixture, user, rng):
+    # 每次內容不同，避免全部走去重捷徑
+    body = os.urandom(fixture.get("upload_size", 64 * 1024))
+    # 副檔名須在 routes/upload.safeFilename 的允許清單內，否則每次都是 400
+    response = await client.post(
+        "/api/upload",
+        data={"job_id": user["job_id"]},
+        files={"uploadedFile": ("bench.zip", body, "application/zip")},
+    )
+    # 成功時導向案件詳情頁；其他 302（例如被導回登入頁）不算成功
+    if response.status_code == 302 and response.headers.get("location") != f"/read/{user['job_id']}":
+        raise httpx.HTTPStatusError(
+            f"上傳後導向 {response.headers.get('location')!r}", request=response.request, response=response
+        )
+    return response
+
+
+async def login(client, fixture, user, rng):
+    username = rng.choice(fixture["freelancers"])
+    return await client.post("/login", data={"username": username, "password": fixture["password"]})
+
+
+async def apiList(client, fixture, user, rng):
+    params = {"fields": "id,title,status,budget,client_name"}
+    if rng.random() < 0.3:
+        params["after"] = rng.choice(fixture["job_ids"])
+    return await client.get("/api/v1/jobs", params=params)
+
+
+async def apiBatch(client, fixture, user, rng):
+    ids = rng.sample(fixture["job_ids"], min(20, len(fixture["job_ids"])))
+    return await client.get(
+        "/api/v1/jobs/batch",
+        params={"ids": ",".join(map(str, ids)), "fields": "title,status,budget,price,bids,deliverable"},
+    )
+
+
+# 名稱 -> (函式, 預期狀態碼, 需要先登入的角色)
+SCENARIOS = {
+    "browse": (browse, 200, None),
+    "browse_status": (browseStatus, 200, None),
+    "read": (read, 200, None),
+    "bid": (bid, 302, "乙方"),
+    "upload": (upload, 302, "乙方"),
+    "login": (login, 302, None),
+    "api_list": (apiList, 200, None),
+    "api_batch": (apiBatch, 200, "乙方"),
+}
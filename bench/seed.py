@@ -0,0 +1,190 @@
+# bench/seed.py
+# =============================
+# 基準測試資料產生器 (Synthetic data seeder)
+# =============================
+# 以 COPY 大量寫入使用者、案件、競標與交付成果：
+# - 使用者名稱皆以 bench_ 開頭，密碼皆為 BENCH_PASSWORD（同一個 scrypt 雜湊），方便情境腳本登入
+# - 案件標題由中英文詞彙組合，讓搜尋與首頁有真實的資料分布
+# - --reset 先刪除上一次產生的 bench_ 資料
+# - 寫入後執行 ANALYZE，讓執行計畫反映新的資料量
+#
+# 執行：python -m bench.seed --users 2000 --jobs 50000 --bids-per-job 4 --reset
+# 請勿對正式資料庫執行
+# =============================
+
+import argparse
+import asyncio
+import random
+import time
+
+import psycopg
+from psycopg.rows import dict_row
+
+import credentials
+import db
+
+PREFIX = "bench_"
+BENCH_PASSWORD = "bench-password"
+
+STATUSES = ["新工作", "新工作", "新工作", "待確認", "進行中", "上傳成果", "已完成"]
+WORDS = [
+    "網站設計", "後端", "前端", "資料庫", "行動應用", "爬蟲", "報表", "翻譯", "影片剪輯",
+    "logo", "API", "Python", "React", "FastAPI", "PostgreSQL", "自動化", "測試", "部署",
+]
+
+
+def _title(rng):
+    return " ".join(rng.sample(WORDS, 3)) + f" 專案 #{rng.randrange(100000)}"
+
+
+async def reset(conn):
+    # 依外鍵順序刪除；jobs 的 bids / deliverables 會 ON DELETE CASCADE
+    like = PREFIX.replace("_", r"\_") + "%"
+    async with conn.cursor() as cur:
+        await cur.execute("""
+            DELETE FROM jobs WHERE client_id IN (SELECT id FROM users WHERE username LIKE %s)
+        """, (like,))
+        await cur.execute("""
+            DELETE FROM bids WHERE bidder_id IN (SELECT id FROM users WHERE username LIKE %s)
+        """, (like,))
+        await cur.execute("""
+            DELETE FROM deliverables WHERE uploaded_by IN (SELECT id FROM users WHERE username LIKE %s)
+        """, (like,))
+        await cur.execute("""
+            UPDATE jobs SET freelancer_id = NULL
+            WHERE freelancer_id IN (SELECT id FROM users WHERE username LIKE %s)
+        """, (like,))
+        await cur.execute("DELETE FROM users WHERE username LIKE %s", (like,))
+    await conn.commit()
+
+
+async def _copyUsers(cur, role, count):
+    tag = "client" if role == "甲方" else "freelancer"
+    # 雜湊一次共用，避免產生大量帳號時花時間在 scrypt
+    hashed = credentials.hashSync(BENCH_PASSWORD)
+    async with cur.copy("COPY users (username, password, role, email) FROM STDIN") as copy:
+        for i in range(count):
+            name = f"{PREFIX}{tag}_{i}"
+            await copy.write_row((name, hashed, role, f"{name}@example.com"))
+    await cur.execute(
+        "SELECT id FROM users WHERE role = %s AND username LIKE %s ORDER BY id",
+        (role, f"{PREFIX}{tag}\\_%")
+    )
+    return [row["id"] for row in await cur.fetchall()]
+
+
+async def seed(conn, users, job_count, bids_per_job, deliverable_ratio, rng):
+    clients_n = max(1, users // 4)
+    freelancers_n = max(1, users - clients_n)
+    async with conn.cursor() as cur:
+        clients = await _copyUsers(cur, "甲方", clients_n)
+        freelancers = await _copyUsers(cur, "乙方", freelancers_n)
+
+        # 1️⃣ 案件：先記下目前最大 id，COPY 後以 id 範圍取回
+        await cur.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM jobs")
+        start_id = (await cur.fetchone())["max_id"]
+        async with cur.copy(
+            "COPY jobs (title, content, status, budget, price, client_id, freelancer_id) FROM STDIN"
+        ) as copy:
+            for _ in range(job_count):
+                status = rng.choice(STATUSES)
+                budget = rng.randrange(1000, 100000, 500)
+                assigned = status not in ("新工作", "待確認")
+                await copy.write_row((
+                    _title(rng),
+                    " ".join(rng.choices(WORDS, k=20)),
+                    status,
+                    budget,
+                    budget + rng.randrange(0, 5000, 100) if assigned else None,
+                    rng.choice(clients),
+                    rng.choice(freelancers) if assigned else None,
+                ))
+        await cur.execute("SELECT id, status, budget, freelancer_id FROM jobs WHERE id > %s ORDER BY id", (start_id,))
+        job_rows = await cur.fetchall()
+
+        # 2️⃣ 競標：每個案件的出價者不重複
+        bids = 0
+        async with cur.copy("COPY bids (job_id, bidder_id, amount) FROM STDIN") as copy:
+            for job in job_rows:
+                if job["status"] not in ("新工作", "待確認"):
+                    continue
+                for bidder in rng.sample(freelancers, min(bids_per_job, len(freelancers))):
+                    await copy.write_row((job["id"], bidder, job["budget"] + rng.randrange(100, 10000, 100)))
+                    bids += 1
+
+        # 3️⃣ 交付成果：只建立紀錄，檔案路徑指向不存在的舊版路徑
+        deliverables = 0
+        async with cur.copy(
+            "COPY deliverables (job_id, file_path, file_name, uploaded_by) FROM STDIN"
+        ) as copy:
+            for job in job_rows:
+                if job["freelancer_id"] is None or rng.random() >= deliverable_ratio:
+                    continue
+                await copy.write_row((job["id"], f"uploads/bench/{job['id']}.zip", f"{job['id']}.zip", job["freelancer_id"]))
+                deliverables += 1
+
+    await conn.commit()
+    for table in ("users", "jobs", "bids", "deliverables"):
+        await conn.execute(f"ANALYZE {table}")
+    await conn.commit()
+    return {
+        "clients": len(clients),
+        "freelancers": len(freelancers),
+        "jobs": len(job_rows),
+        "bids": bids,
+        "deliverables": deliverables,
+    }
+
+
+async def loadFixture(conn):
+    """
+    取回情境腳本需要的 bench_ 資料：案件 id、甲方 / 乙方帳號，
+    以及用來模擬競標爭搶的熱門案件（最早的一筆「新工作」）。
+    """
+    like = PREFIX.replace("_", r"\_") + "%"
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT id, username, role FROM users WHERE username LIKE %s ORDER BY id", (like,))
+        users = await cur.fetchall()
+        await cur.execute("""
+            SELECT j.id, j.status, j.budget, j.freelancer_id
+            FROM jobs j JOIN users u ON u.id = j.client_id
+            WHERE u.username LIKE %s
+            ORDER BY j.id
+        """, (like,))
+        job_rows = await cur.fetchall()
+    if not job_rows:
+        raise SystemExit("找不到 bench_ 資料，請先執行 python -m bench.seed")
+    open_jobs = [j for j in job_rows if j["status"] == "新工作"] or job_rows
+    return {
+        "password": BENCH_PASSWORD,
+        "clients": [u["username"] for u in users if u["role"] == "甲方"],
+        "freelancers": [u["username"] for u in users if u["role"] == "乙方"],
+        "job_ids": [j["id"] for j in job_rows],
+        "hot_job": {"id": open_jobs[0]["id"], "budget": open_jobs[0]["budget"]},
+        # 已指派的案件與其乙方，供上傳情境使用
+        "assigned": [(j["id"], j["freelancer_id"]) for j in job_rows if j["freelancer_id"]],
+        "user_names": {u["id"]: u["username"] for u in users},
+    }
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    async with await psycopg.AsyncConnection.connect(db.DATABASE_URL, row_factory=dict_row) as conn:
+        if args.reset:
+            await reset(conn)
+        start = time.perf_counter()
+        counts = await seed(conn, args.users, args.jobs, args.bids_per_job, args.deliverables, rng)
+    elapsed = time.perf_counter() - start
+    print(", ".join(f"{k}={v}" for k, v in counts.items()) + f"（{elapsed:.1f}s）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="產生基準測試用的假資料")
+    parser.add_argument("--users", type=int, default=2000, help="使用者數（1/4 為甲方）")
+    parser.add_argument("--jobs", type=int, default=50000)
+    parser.add_argument("--bids-per-job", type=int, default=4)
+    parser.add_argument("--deliverables", type=float, default=0.5,
+                        help="已指派案件中有交付成果的比例（預設 0.5）")
+    parser.add_argument("--seed", type=int, default=1141, help="亂數種子，固定後每次產生相同資料")
+    parser.add_argument("--reset", action="store_true", help="先刪除上一次產生的 bench_ 資料")
+    asyncio.run(main(parser.parse_args()))
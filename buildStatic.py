@@ -0,0 +1,102 @@
+# buildStatic.py
+# =============================
+# 靜態檔案建置 (Static asset build step)
+# =============================
+# 用法：
+#   python buildStatic.py            產生帶指紋的 CSS（assets.py），
+#                                    再預先壓縮 www/ 下的文字類靜態檔（.gz，已安裝 brotli 時另產生 .br）
+#   python buildStatic.py --clean    刪除所有預先壓縮檔
+#
+# - staticFiles.CachedStaticFiles 依 Accept-Encoding 直接送出壓縮檔，請求時不需壓縮
+# - 只處理可壓縮的類型（CSS / JS / HTML / SVG / JSON / 文字）且大於 COMPRESS_MIN_SIZE 的檔案；
+#   PDF、圖片、zip 本身已壓縮，不處理
+# - 壓縮檔比原檔新時跳過；壓縮後沒有變小則不保留
+# - 上傳目錄（www/uploads、www/thumbs）不處理
+# - 部署時於啟動伺服器前執行
+# =============================
+
+import argparse
+import mimetypes
+import os
+import sys
+
+import assets
+import compression
+import staticFiles
+
+STATIC_ROOT = "www"
+SKIP_DIRS = {"uploads", "thumbs"}
+
+
+def _walk(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        if os.path.normpath(dirpath) == os.path.normpath(root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for name in filenames:
+            yield os.path.join(dirpath, name)
+
+
+def _isCompressed(path):
+    return path.endswith(tuple(staticFiles.PRECOMPRESSED.values()))
+
+
+def _candidates(root):
+    for path in _walk(root):
+        if _isCompressed(path) or os.path.basename(path).startswith("."):
+            continue
+        media_type = mimetypes.guess_type(path)[0] or ""
+        if media_type.startswith(compression.COMPRESSIBLE):
+            yield path
+
+
+def precompress(root=STATIC_ROOT, min_size=compression.MIN_SIZE):
+    encodings = ["gzip"] + (["br"] if compression.brotli is not None else [])
+    written = skipped = 0
+    for path in _candidates(root):
+        stat = os.stat(path)
+        if stat.st_size < min_size:
+            continue
+        for encoding in encodings:
+            target = path + staticFiles.PRECOMPRESSED[encoding]
+            if os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+                skipped += 1
+                continue
+            data = compression.compressFile(path, encoding)
+            if len(data) >= stat.st_size:
+                if os.path.exists(target):
+                    os.remove(target)
+                continue
+            tmp = target + ".part"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+            written += 1
+            print(f"{target}  {stat.st_size} → {len(data)} bytes")
+    print(f"預先壓縮完成：新增 {written} 個，未變更 {skipped} 個")
+
+
+def clean(root=STATIC_ROOT):
+    removed = 0
+    for path in _walk(root):
+        if _isCompressed(path):
+            os.remove(path)
+            removed += 1
+    print(f"已刪除 {removed} 個預先壓縮檔")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="靜態檔案建置")
+    parser.add_argument("--clean", action="store_true", help="刪除預先壓縮檔")
+    parser.add_argument("--root", default=STATIC_ROOT)
+    args = parser.parse_args(argv)
+    if args.clean:
+        clean(args.root)
+    else:
+        manifest = assets.build()
+        print(f"資源指紋：{len(manifest)} 個檔案 → {assets.OUTPUT_DIR}")
+        precompress(args.root)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
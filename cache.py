@@ -0,0 +1,78 @@
+# cache.py
+# =============================
+# 行程內快取 (In-process cache)
+# =============================
+# 功能說明：
+# - LRU 淘汰 + 容量上限 + TTL 過期
+# - 記錄 hit / miss / eviction 次數，可由 /api/cacheStats 觀察效果
+# - version 計數器：讀取前記下版本，寫入時若期間有失效就不寫入，
+#   避免「先查 DB、期間被更新、再把舊資料放回快取」的競爭
+# - 只在 event loop 中使用，不需要鎖
+# =============================
+
+import time
+from collections import OrderedDict
+
+# 所有已建立的快取（名稱 -> 快取物件），供統計使用
+caches = {}
+
+
+class TTLCache:
+    def __init__(self, name, maxsize, ttl):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # key -> (到期時間, 值)
+        caches[name] = self
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, version=None):
+        # 讀取期間若有失效發生，放棄寫入舊資料
+        if version is not None and version != self.version:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self.version += 1
+        self._data.pop(key, None)
+
+    def clear(self):
+        self.version += 1
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def allStats():
+    return {name: c.stats() for name, c in caches.items()}
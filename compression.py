@@ -0,0 +1,195 @@
+# compression.py
+# =============================
+# 回應壓縮 (Response compression)
+# =============================
+# 功能說明：
+# - 依請求的 Accept-Encoding 選擇 br（需安裝 brotli）或 gzip，壓縮 HTML / JSON / 文字回應
+# - 小於 COMPRESS_MIN_SIZE 的回應不壓縮（壓縮後省不了多少，反而多花 CPU）
+# - 串流回應逐段壓縮，不需先把整個 body 收集起來
+# - 不壓縮：
+#   - 已有 Content-Encoding 的回應（/static 預先壓縮的 .br / .gz，見 staticFiles.py）
+#   - text/event-stream（SSE 需要每個事件立即送出）
+#   - PDF、圖片、zip 等已壓縮的檔案、檔案下載（attachment），以及 Range（206）回應
+# - 需放在 SessionMiddleware 之外、MetricsMiddleware 之內（main.py）
+# =============================
+
+import gzip
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # 未安裝 brotli：只提供 gzip
+    brotli = None
+
+MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6))
+# 動態回應用較低的 brotli 等級（壓縮率接近 gzip 9，速度與 gzip 6 相當）
+BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 4))
+
+COMPRESSIBLE = (
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "image/svg+xml",
+)
+
+COMPRESSED_BYTES = metrics.Counter(
+    "http_compression_bytes_total", "壓縮前後的回應位元組數", ("encoding", "stage")
+)
+
+
+def _parseAcceptEncoding(value):
+    # "gzip, br;q=0.8, *;q=0" -> {"gzip": 1.0, "br": 0.8, "*": 0.0}
+    accepted = {}
+    for part in value.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def negotiate(accept_encoding, available=None):
+    """
+    依 Accept-Encoding 選出編碼（偏好 br），都不接受時回傳 None。
+    available 預設為目前可用的編碼。
+    """
+    if available is None:
+        available = ("br", "gzip") if brotli is not None else ("gzip",)
+    accepted = _parseAcceptEncoding(accept_encoding or "")
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31：gzip 檔頭
+            self._impl = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == "br":
+            return self._impl.process(data)
+        return self._impl.compress(data)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._impl.finish()
+        return self._impl.flush()
+
+
+def _compressible(headers):
+    if "content-encoding" in headers or "content-range" in headers:
+        return False
+    # 檔案下載（download.py）保留 Range 續傳與 zero-copy 傳送
+    if headers.get("content-disposition", "").lower().startswith("attachment"):
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return media_type.startswith(COMPRESSIBLE)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None         # 延後送出的 http.response.start
+        compressor = None    # None：尚未決定；False：不壓縮
+
+        async def sendWrapper(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                # zero-copy / pathsend 等擴充訊息：原樣送出
+                if compressor is None:
+                    compressor = False
+                    await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+
+            if compressor is None:
+                headers = Headers(raw=start["headers"])
+                # 一次送完且小於門檻、或類型不適合：原樣送出
+                if (
+                    start["status"] in (204, 206, 304)
+                    or not _compressible(headers)
+                    or (not more and len(body) < self.minimum_size)
+                ):
+                    compressor = False
+                else:
+                    compressor = _Compressor(encoding)
+                    headers = MutableHeaders(raw=start["headers"])
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    # 內容改變後原本的強 ETag 不再成立
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = "W/" + etag
+                await send(start)
+
+            if compressor is False:
+                await send(message)
+                return
+
+            data = compressor.compress(body)
+            if not more:
+                data += compressor.finish()
+            COMPRESSED_BYTES.inc(encoding, "in", amount=len(body))
+            COMPRESSED_BYTES.inc(encoding, "out", amount=len(data))
+            # 串流中若這一段尚未產生輸出，等下一段再送（最後一段一定送出）
+            if data or not more:
+                await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, sendWrapper)
+        # 沒有 body 的回應（例如 HEAD）仍要送出 start
+        if start is not None and compressor is None:
+            await send(start)
+
+
+def compressFile(path, encoding):
+    # 預先壓縮用（buildStatic.py）：最高壓縮等級，只在建置時做一次
+    with open(path, "rb") as f:
+        data = f.read()
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
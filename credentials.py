@@ -0,0 +1,122 @@
+# credentials.py
+# =============================
+# 密碼雜湊服務 (Credential service)
+# =============================
+# 功能說明：
+# - 以 scrypt（hashlib，標準函式庫）雜湊密碼，格式：scrypt$n$r$p$salt$hash
+# - 雜湊 / 驗證在固定大小的 thread pool 執行（OpenSSL 計算時釋放 GIL），
+#   不阻塞 event loop；等待中的工作數有上限，超過時回傳 503 + Retry-After
+# - 舊版明文密碼在下一次登入成功時自動改存雜湊（needsRehash）
+# - 使用者不存在時仍驗證一次假雜湊，避免以回應時間猜出帳號是否存在
+# - 供 sessionLogin.py（登入、註冊、重設密碼）使用
+# =============================
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+# scrypt 參數：n=2^14、r=8 約需 16MB 記憶體、數十毫秒 CPU
+SCRYPT_N = int(os.environ.get("SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.environ.get("SCRYPT_R", 8))
+SCRYPT_P = int(os.environ.get("SCRYPT_P", 1))
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# 同時計算的執行緒數與最多排隊的工作數
+WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 64))
+
+# 設為 True 時直接在 event loop 上計算（僅供 bench.loginBurst 對照）
+INLINE = False
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="password-hash")
+_pending = 0
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r + 1024 * 1024, dklen=KEY_BYTES
+    )
+
+
+def hashSync(password):
+    # 同步版本：於 thread pool 中執行，或由 bench.seed 等離線工具直接呼叫
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+
+
+def isHashed(stored):
+    return stored.startswith("scrypt$")
+
+
+def verifySync(password, stored):
+    if not stored:
+        return False
+    if not isHashed(stored):
+        # 舊版明文密碼
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        _, n, r, p, salt, key = stored.split("$")
+        expected = _unb64(key)
+        actual = _scrypt(password, _unb64(salt), int(n), int(r), int(p))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needsRehash(stored):
+    # 明文或參數與目前設定不同時，登入成功後重新雜湊
+    return not isHashed(stored) or not stored.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+# 帳號不存在時用來驗證的假雜湊（讓回應時間與帳號存在時相同）
+_DUMMY_HASH = None
+
+
+async def _run(fn, *args):
+    global _pending
+    if INLINE:
+        return fn(*args)
+    if _pending >= MAX_QUEUE:
+        raise HTTPException(status_code=503, detail="登入請求過多，請稍後再試", headers={"Retry-After": "1"})
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hashPassword(password):
+    return await _run(hashSync, password)
+
+
+async def verifyPassword(password, stored):
+    """
+    驗證密碼；stored 為 None（帳號不存在）時仍做一次相同成本的計算後回傳 False。
+    """
+    global _DUMMY_HASH
+    if stored is None:
+        if _DUMMY_HASH is None:
+            _DUMMY_HASH = await _run(hashSync, "")
+        await _run(verifySync, password, _DUMMY_HASH)
+        return False
+    return await _run(verifySync, password, stored)
+
+
+def stats():
+    return {"workers": WORKERS, "pending": _pending, "max_queue": MAX_QUEUE}
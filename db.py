@@ -1,5 +1,11 @@
 from psycopg_pool import AsyncConnectionPool #使用connection pool
 from psycopg.rows import dict_row
+from psycopg.types.json import set_json_loads
+import os
+import time
+import fastjson
+import metrics
+import statements
 # db.py
 defaultDB="1141se"
 dbUser="postgres"
@@ -7,24 +13,88 @@ dbPassword="boy20050525"
 dbHost="localhost"
 dbPort=5432
 
-DATABASE_URL = f"dbname={defaultDB} user={dbUser} password={dbPassword} host={dbHost} port={dbPort}"
+DATABASE_URL = os.environ.get(
+	"DATABASE_URL",
+	f"dbname={defaultDB} user={dbUser} password={dbPassword} host={dbHost} port={dbPort}"
+)
 #DATABASE_URL = f"postgresql://{dbUser}:{dbPassword}@{dbHost}:{dbPort}/{defaultDB}"
 
+#連線池設定，可由環境變數調整（秒為單位）
+POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 4))
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 20))
+POOL_MAX_IDLE = float(os.environ.get("DB_POOL_MAX_IDLE", 600))
+POOL_MAX_LIFETIME = float(os.environ.get("DB_POOL_MAX_LIFETIME", 3600))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+
 #宣告變數，預設為None
 _pool: AsyncConnectionPool | None = None
 
-#取得DB連線物件
-async def getDB():
+#每條新連線建立時呼叫：套用 prepared statement 設定，json 欄位以 orjson 解析（若已安裝）
+async def _configure(conn):
+	statements.configureConnection(conn)
+	set_json_loads(fastjson.loads, conn)
+
+#開啟連線池（由 main.py 的 lifespan 在啟動時呼叫）
+async def openPool():
 	global _pool
 	if _pool is None:
-		#lazy create, 等到main.py來呼叫時再啟用 _pool
 		_pool = AsyncConnectionPool(
 			conninfo=DATABASE_URL,
 			kwargs={"row_factory": dict_row}, #設定查詢結果以dictionary方式回傳
+			min_size=POOL_MIN_SIZE,
+			max_size=POOL_MAX_SIZE,
+			max_idle=POOL_MAX_IDLE,
+			max_lifetime=POOL_MAX_LIFETIME,
+			timeout=POOL_TIMEOUT,
+			configure=_configure,
 			open=False #不直接開啟
 		)
-		await _pool.open() #等待開啟完成
-	#使用with context manager，當結束時自動關閉連線
-	async with _pool.connection() as conn:
+		await _pool.open()
+		#預熱：等到 min_size 條連線都建立完成才開始接受請求
+		await _pool.wait()
+	return _pool
+
+#關閉連線池（由 main.py 的 lifespan 在關閉時呼叫）
+async def closePool():
+	global _pool
+	if _pool is not None:
+		await _pool.close()
+		_pool = None
+
+#取得連線池物件
+def getPool() -> AsyncConnectionPool:
+	if _pool is None:
+		raise RuntimeError("連線池尚未開啟，請透過 main.app 的 lifespan 啟動")
+	return _pool
+
+#連線池即時狀態（使用中、等待中、等待時間）
+def poolStats():
+	if _pool is None:
+		return {"open": False}
+	stats = _pool.get_stats()
+	size = stats.get("pool_size", 0)
+	available = stats.get("pool_available", 0)
+	return {
+		"open": True,
+		"min_size": _pool.min_size,
+		"max_size": _pool.max_size,
+		"pool_size": size,
+		"in_use": size - available,
+		"available": available,
+		"waiting": stats.get("requests_waiting", 0),
+		"requests": stats.get("requests_num", 0),
+		"requests_queued": stats.get("requests_queued", 0),
+		"requests_wait_ms": stats.get("requests_wait_ms", 0),
+		"requests_errors": stats.get("requests_errors", 0),
+		"connections_ms": stats.get("connections_ms", 0),
+	}
+
+#取得DB連線物件
+async def getDB():
+	#使用with context manager，當結束時自動歸還連線
+	start = time.perf_counter()
+	async with getPool().connection() as conn:
+		#記錄等待連線池的時間
+		metrics.POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
 		#使用yeild generator傳回連線物件
 		yield conn
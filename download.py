@@ -0,0 +1,210 @@
+# download.py
+# =============================
+# 檔案下載回應 (Range / ETag / 304 / zero-copy)
+# =============================
+# 功能說明：
+# - 強 ETag：blob 使用內容 SHA-256，舊版檔案使用 size + mtime
+# - If-None-Match / If-Modified-Since 命中時回傳 304，不傳檔案內容
+# - 支援單一 HTTP Range（206）與 If-Range，可續傳大型檔案
+# - 伺服器支援 ASGI zerocopysend / pathsend 擴充時直接交給 sendfile 傳送，
+#   否則以 thread pool 分塊讀檔
+# - 供 main.py 的 /download、/download_requirement 使用
+# =============================
+
+import email.utils
+import mimetypes
+import os
+from urllib.parse import quote
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+import storage
+
+# 不支援 zero-copy 時每次讀取的大小
+CHUNK_SIZE = 256 * 1024
+
+
+def makeETag(path, st):
+    # blob 以內容雜湊為 ETag；其他檔案以大小與修改時間組成
+    sha256 = storage.blobHash(path)
+    if sha256:
+        return f'"{sha256}"'
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _etagMatches(header, etag, weak=True):
+    # If-None-Match 使用弱比較；If-Range 使用強比較
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            # "*" 只用於 If-None-Match；If-Range 必須是實際的 ETag
+            if weak:
+                return True
+            continue
+        if weak and tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def _parseDate(value):
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed.timestamp() if parsed else None
+
+
+def _parseRange(header, size):
+    """
+    解析 Range 標頭，只處理單一區段：
+    - 回傳 (start, end)（含 end）
+    - 格式不支援時回傳 None（改送完整檔案）
+    - 範圍無法滿足（包含空檔案）時回傳 "unsatisfiable"
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start, sep, end = spec.strip().partition("-")
+    if not sep:
+        return None
+    if size == 0:
+        # 空檔案沒有任何位元組可回應
+        return "unsatisfiable"
+    try:
+        if start == "":
+            # bytes=-N：最後 N 個位元組
+            length = int(end)
+            if length <= 0:
+                return "unsatisfiable"
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end else None
+    except ValueError:
+        return None
+    # start > end 是無效的標頭（忽略）；bytes=N- 沒有 end，N >= size 時回 416
+    if end is not None and start > end:
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def _contentDisposition(filename):
+    # 中文檔名使用 RFC 5987 的 filename* 格式
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+class FileRangeResponse(Response):
+    """傳送檔案的某個區段，優先使用伺服器的 zero-copy 擴充。"""
+
+    def __init__(self, path, offset, count, status_code, headers, media_type):
+        headers["content-length"] = str(count)
+        super().__init__(content=None, status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.offset = offset
+        self.count = count
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            # 由伺服器以 sendfile() 直接從 page cache 傳送
+            f = await run_in_threadpool(open, self.path, "rb")
+            try:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            finally:
+                await run_in_threadpool(f.close)
+            return
+
+        if "http.response.pathsend" in extensions and self.offset == 0 and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+            return
+
+        # 後備方案：在 thread pool 中分塊讀檔
+        f = await run_in_threadpool(open, self.path, "rb")
+        try:
+            await run_in_threadpool(f.seek, self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # 檔案在傳送期間被截短
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await run_in_threadpool(f.close)
+
+
+async def fileDownload(request, path, filename):
+    """
+    依請求標頭回傳 200 / 206 / 304 / 416 回應；檔案不存在時回傳 None。
+    """
+    try:
+        st = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        return None
+
+    size = st.st_size
+    etag = makeETag(path, st)
+    last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+    headers = {
+        "etag": etag,
+        "last-modified": last_modified,
+        "accept-ranges": "bytes",
+        # 同一網址可能換成新的成果檔案，需每次驗證（驗證成功只回 304）
+        "cache-control": "private, no-cache",
+    }
+
+    # 1️⃣ 條件式請求：內容未變更時回傳 304
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etagMatches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    else:
+        since = _parseDate(request.headers.get("if-modified-since"))
+        if since is not None and int(st.st_mtime) <= since:
+            return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    headers["content-disposition"] = _contentDisposition(filename)
+
+    # 2️⃣ Range 請求：If-Range 不符時改送完整檔案
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range:
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            if not _etagMatches(if_range, etag, weak=False):
+                range_header = None
+        elif _parseDate(if_range) is None or int(st.st_mtime) > _parseDate(if_range):
+            range_header = None
+
+    if range_header:
+        parsed = _parseRange(range_header, size)
+        if parsed == "unsatisfiable":
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if parsed:
+            start, end = parsed
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            return FileRangeResponse(path, start, end - start + 1, 206, headers, media_type)
+
+    return FileRangeResponse(path, 0, size, 200, headers, media_type)
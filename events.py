@@ -0,0 +1,170 @@
+# events.py
+# =============================
+# 即時更新 (LISTEN / NOTIFY → Server-Sent Events)
+# =============================
+# 功能說明：
+# - jobs.py 的寫入函式在同一交易中 NOTIFY job_events（jobs.notifyJob、placeBid）
+# - 每個 worker 只開一條 LISTEN 連線（不佔用連線池），收到事件後：
+#   1. 清除本 worker 的案件詳情與清單快取（其他 worker 的寫入也能即時失效）
+#   2. 轉送給訂閱該案件的瀏覽器（routes/events.py 的 SSE 串流）
+# - bid 事件：重新查一次報價清單並渲染 fragments/bids.html（甲方 / 乙方兩種版本），
+#   只送出報價表格片段；同一案件的連續出價會合併成一次查詢
+# - status 事件：只送出新狀態，由頁面自行更新或重新整理
+# - file 事件：worker 處理完成果檔案或需求文件（processing.py），頁面重新整理以顯示縮圖
+# - 由 main.py 的 lifespan 啟動與停止
+# =============================
+
+import asyncio
+import json
+
+import psycopg
+from fastapi.templating import Jinja2Templates
+
+import db
+import jobs
+
+# 每個瀏覽器連線最多暫存的事件數；滿了代表用戶端太慢，改送 reload
+QUEUE_SIZE = 64
+# LISTEN 連線中斷後重新連線的等待秒數（最多 30 秒）
+RECONNECT_DELAY = 1
+
+templates = Jinja2Templates(directory="templates")
+
+_subscribers = {}      # job_id -> set(Subscription)
+_refreshing = {}       # job_id -> 是否在查詢期間又收到新的出價
+_tasks = set()         # 進行中的報價清單查詢（保留參照避免被回收）
+_task = None
+
+
+class Subscription:
+    def __init__(self, job_ids, role, bids):
+        self.job_ids = set(job_ids)
+        self.role = role
+        self.bids = bids
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def push(self, kind, data):
+        try:
+            self.queue.put_nowait((kind, data))
+        except asyncio.QueueFull:
+            # 丟掉積壓的事件，請頁面直接重新載入
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(("reload", ""))
+
+
+def subscribe(job_ids, role=None, bids=False):
+    sub = Subscription(job_ids, role, bids)
+    for job_id in sub.job_ids:
+        _subscribers.setdefault(job_id, set()).add(sub)
+    return sub
+
+
+def unsubscribe(sub):
+    for job_id in sub.job_ids:
+        subs = _subscribers.get(job_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del _subscribers[job_id]
+
+
+def formatSSE(kind, data):
+    # 多行資料每行都要加上 data: 前綴
+    lines = "".join(f"data: {line}\n" for line in str(data).split("\n"))
+    return f"event: {kind}\n{lines}\n"
+
+
+# ---------------------------------
+# 事件分派
+# ---------------------------------
+def _renderBids(job, bids, role):
+    return templates.get_template("fragments/bids.html").render(job=job, bids=bids, role=role)
+
+
+async def _refreshBids(job_id):
+    # 查詢期間若又有新出價，查完再跑一次，確保最後送出的是最新的清單
+    try:
+        while _refreshing.get(job_id):
+            _refreshing[job_id] = False
+            subs = [s for s in _subscribers.get(job_id, ()) if s.bids and s.role in ("甲方", "乙方")]
+            if not subs:
+                break
+            async with db.getPool().connection() as conn:
+                job = await jobs.getJob(conn, job_id)
+                bids = await jobs.getBids(conn, job_id)
+            if not job:
+                break
+            rendered = {role: _renderBids(job, bids, role) for role in {s.role for s in subs}}
+            for sub in subs:
+                sub.push("bids", rendered[sub.role])
+    finally:
+        _refreshing.pop(job_id, None)
+
+
+def dispatch(event):
+    job_id = event.get("job_id")
+    if job_id is None:
+        return
+    # 其他 worker 的寫入：清除本 worker 的快取（單純出價、檔案處理完成不影響首頁清單）
+    jobs.invalidateJob(job_id, event.get("type") in ("job", "status") or bool(event.get("status")))
+
+    subs = _subscribers.get(job_id)
+    if not subs:
+        return
+    if event.get("status"):
+        data = json.dumps({"job_id": job_id, "status": event["status"]}, ensure_ascii=False)
+        for sub in list(subs):
+            sub.push("status", data)
+    if event.get("type") == "file":
+        data = json.dumps({"job_id": job_id}, ensure_ascii=False)
+        for sub in list(subs):
+            sub.push("file", data)
+    if event.get("type") == "bid" and any(s.bids for s in subs):
+        running = job_id in _refreshing
+        _refreshing[job_id] = True
+        if not running:
+            task = asyncio.create_task(_refreshBids(job_id))
+            _tasks.add(task)
+            task.add_done_callback(_tasks.discard)
+
+
+# ---------------------------------
+# LISTEN 連線
+# ---------------------------------
+async def listen():
+    delay = RECONNECT_DELAY
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(db.DATABASE_URL, autocommit=True) as conn:
+                await conn.execute(f"LISTEN {jobs.EVENT_CHANNEL};")
+                delay = RECONNECT_DELAY
+                async for notify in conn.notifies():
+                    try:
+                        dispatch(json.loads(notify.payload))
+                    except ValueError:
+                        continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 斷線期間的事件會遺失，快取仍會在 TTL 到期後更新
+            print(f"⚠️ LISTEN {jobs.EVENT_CHANNEL} 中斷：{e}，{delay} 秒後重新連線")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+def start():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(listen())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,47 @@
+# fastjson.py
+# =============================
+# JSON 編碼 (orjson with stdlib fallback)
+# =============================
+# 功能說明：
+# - 已安裝 orjson 時使用 orjson（C 實作，datetime 原生支援，直接輸出 bytes），
+#   否則退回標準函式庫 json，行為相同只是較慢
+# - JSONResponse：供 /api/v1（routes/apiV1.py）使用的回應類別
+# - loads：db.py 設定給每條連線，解析 json / jsonb 欄位（報價、成果等彙總欄位）
+# =============================
+
+import datetime
+import json
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # 未安裝 orjson：使用標準函式庫
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"無法轉成 JSON：{type(value).__name__}")
+
+
+if orjson is not None:
+    def dumps(value):
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    loads = orjson.loads
+else:
+    def dumps(value):
+        return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+
+class JSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
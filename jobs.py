@@ -5,17 +5,146 @@
 # 功能說明：
 # - 提供工作 (Job) 的 CRUD 與查詢功能
 # - 與 main.py、upload.py 共同運作
+# - 所有 SQL 皆登錄於 statements.py，以 prepared statement 執行
 # - 對應資料表：jobs, users, quotations, deliverables
 # =============================
 
 from psycopg_pool import AsyncConnectionPool
 
+import json
+import os
+
+import psycopg
+
+import cache
+import statements
+import storage
+import taskqueue
+
+# ---------------------------------
+# 案件詳情快取（readJob 使用；寫入時失效）
+# ---------------------------------
+jobDetailCache = cache.TTLCache(
+    "job_detail",
+    maxsize=int(os.environ.get("JOB_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("JOB_CACHE_TTL", 30)),
+)
+
+
+# ---------------------------------
+# 首頁清單 HTML 快取（main.home 使用；key 為 狀態 + 分頁游標）
+# 任何一個案件改變都可能出現在任何一頁，因此寫入時整個清空
+# ---------------------------------
+jobListCache = cache.TTLCache(
+    "job_list_html",
+    maxsize=int(os.environ.get("JOB_LIST_CACHE_SIZE", 256)),
+    ttl=float(os.environ.get("JOB_LIST_CACHE_TTL", 60)),
+)
+
+
+def invalidateJob(job_id, list_changed=True):
+    # 所有修改 jobs / bids / deliverables 的函式都要呼叫；
+    # 只影響競標清單（不影響首頁欄位）時 list_changed=False
+    jobDetailCache.invalidate(job_id)
+    if list_changed:
+        jobListCache.clear()
+
 # ---------------------------------
-# 1️⃣ 取得全部工作清單 (首頁)
+# 即時事件（NOTIFY；events.py 的 listener 轉送給瀏覽器並讓其他 worker 清快取）
 # ---------------------------------
-async def getJobList(conn):
+EVENT_CHANNEL = "job_events"
+
+statements.register("notifyJob", "SELECT pg_notify(%s, %s);")
+
+
+async def notifyJob(cur, job_id, kind, status=None):
+    # 與資料變更在同一交易中送出：commit 後才會送達，rollback 則不會送出
+    payload = json.dumps({"job_id": job_id, "type": kind, "status": status}, ensure_ascii=False)
+    await statements.execute(cur, "notifyJob", (EVENT_CHANNEL, payload))
+
+# ---------------------------------
+# 分頁設定 (keyset pagination，以 j.id 為游標)
+# ---------------------------------
+PAGE_SIZE = 20        # 每頁預設筆數
+MAX_PAGE_SIZE = 100   # 每頁筆數上限
+
+
+def clampLimit(limit):
+    # 將 ?limit= 限制在 1 ~ MAX_PAGE_SIZE 之間
+    if not limit:
+        return PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def _registerPage(name, select_sql, where, descending):
+    """
+    為一個分頁清單登錄三種 keyset 查詢：
+    - name.first：第一頁
+    - name.after：顯示順序中排在游標之後的資料（下一頁）
+    - name.before：顯示順序中排在游標之前的資料（上一頁，反向排序後再倒回來）
+    """
+    variants = {
+        "first": (None, "DESC" if descending else "ASC"),
+        "after": ("j.id < %s" if descending else "j.id > %s", "DESC" if descending else "ASC"),
+        "before": ("j.id > %s" if descending else "j.id < %s", "ASC" if descending else "DESC"),
+    }
+    for variant, (keyset, order) in variants.items():
+        conditions = list(where) + ([keyset] if keyset else [])
+        sql = select_sql
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY j.id {order} LIMIT %s;"
+        statements.register(f"{name}.{variant}", sql)
+    return name
+
+
+async def _fetchPage(conn, name, params, after, before, limit):
+    """
+    以 keyset 方式取得一頁資料：
+    - 多取一筆用來判斷是否還有下一頁 / 上一頁
+    - 每次查詢只掃描 limit + 1 筆，與資料表大小無關
+    """
+    limit = clampLimit(limit)
+    params = list(params)
+
+    # 往「上一頁」查詢時反轉排序方向，取回後再倒過來
+    backward = before is not None and after is None
+    if after is not None:
+        variant = "after"
+        params.append(after)
+    elif backward:
+        variant = "before"
+        params.append(before)
+    else:
+        variant = "first"
+    params.append(limit + 1)
+
     async with conn.cursor() as cur:
-        sql = """
+        await statements.execute(cur, f"{name}.{variant}", params)
+        rows = await cur.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+        next_after = rows[-1]["id"] if rows else None
+        prev_before = rows[0]["id"] if rows and has_more else None
+    else:
+        next_after = rows[-1]["id"] if rows and has_more else None
+        prev_before = rows[0]["id"] if rows and after is not None else None
+
+    return {
+        "items": rows,
+        "next_after": next_after,
+        "prev_before": prev_before,
+        "limit": limit,
+    }
+
+
+# ---------------------------------
+# 1️⃣ 取得全部工作清單 (首頁，分頁)
+# ---------------------------------
+_registerPage("getJobList", """
         SELECT 
             j.id, j.title, j.content, j.status, j.budget, j.price,
             c.username AS client_name,
@@ -24,16 +153,13 @@ async def getJobList(conn):
         FROM jobs j
         LEFT JOIN users c ON j.client_id = c.id
         LEFT JOIN users f ON j.freelancer_id = f.id
-        ORDER BY j.id ASC;
-        """
-        await cur.execute(sql)
-        rows = await cur.fetchall()
-        return rows
+        """, [], descending=False)
+
+async def getJobList(conn, after=None, before=None, limit=PAGE_SIZE):
+    return await _fetchPage(conn, "getJobList", [], after, before, limit)
     
-# 依狀態取得工作清單
-async def getJobsByStatus(conn, status):
-    async with conn.cursor() as cur:
-        await cur.execute("""
+# 依狀態取得工作清單（分頁）
+_registerPage("getJobsByStatus", """
             SELECT 
                 j.*, 
                 c.username AS client_name, 
@@ -41,32 +167,130 @@ async def getJobsByStatus(conn, status):
             FROM jobs j
             LEFT JOIN users c ON j.client_id = c.id
             LEFT JOIN users f ON j.freelancer_id = f.id
-            WHERE j.status = %s
-            ORDER BY j.id DESC;
-        """, (status,))
-        result = await cur.fetchall()
-    return result
+            """, ["j.status = %s"], descending=True)
+
+async def getJobsByStatus(conn, status, after=None, before=None, limit=PAGE_SIZE):
+    return await _fetchPage(conn, "getJobsByStatus", [status], after, before, limit)
+
+# 預算篩選（首頁表單只填預算、沒有關鍵字時）：
+# 狀態 × 下限 × 上限 中至少有一個預算條件的 6 種組合，各自登錄一組分頁查詢
+def _budgetPageName(status, min_budget, max_budget):
+    return "getJobsByBudget" + (".status" if status else "") \
+        + (".min" if min_budget is not None else "") + (".max" if max_budget is not None else "")
+
+for _status in (False, True):
+    for _min, _max in ((0, None), (None, 0), (0, 0)):
+        _registerPage(_budgetPageName(_status, _min, _max), """
+            SELECT 
+                j.id, j.title, j.content, j.status, j.budget, j.price,
+                c.username AS client_name,
+                f.username AS freelancer_name,
+                j.created_at
+            FROM jobs j
+            LEFT JOIN users c ON j.client_id = c.id
+            LEFT JOIN users f ON j.freelancer_id = f.id
+            """, (["j.status = %s"] if _status else [])
+            + (["j.budget >= %s"] if _min is not None else [])
+            + (["j.budget <= %s"] if _max is not None else []),
+            descending=_status)
+
+async def getJobsByBudget(conn, status, min_budget, max_budget, after=None, before=None, limit=PAGE_SIZE):
+    # 排序與未篩選預算時相同：有狀態時新案件在前（同 getJobsByStatus），否則同 getJobList
+    params = [value for value in (status, min_budget, max_budget) if value is not None]
+    name = _budgetPageName(status, min_budget, max_budget)
+    return await _fetchPage(conn, name, params, after, before, limit)
 
 
 
 # ---------------------------------
-# 2️⃣ 取得單一工作詳細資料
+# 🔍 搜尋工作（標題 / 內容全文搜尋，依相關度排序）
 # ---------------------------------
-async def getJob(conn, job_id):
+MAX_SEARCH_PAGE = 50  # 相關度排序使用 OFFSET，限制可翻閱的頁數
+
+
+def _searchStatement(status, min_budget, max_budget):
+    # 每種篩選組合各自登錄一個 statement，讓執行計畫能使用對應的索引
+    filters = []
+    conditions = ["j.search_vec @@ jobs_search_query(%s)"]
+    if status:
+        filters.append("status")
+        conditions.append("j.status = %s")
+    if min_budget is not None:
+        filters.append("min_budget")
+        conditions.append("j.budget >= %s")
+    if max_budget is not None:
+        filters.append("max_budget")
+        conditions.append("j.budget <= %s")
+
+    return statements.register(f"searchJobs[{','.join(filters)}]", f"""
+        SELECT 
+            j.id, j.title, j.status, j.budget, j.price,
+            c.username AS client_name,
+            f.username AS freelancer_name,
+            j.created_at,
+            ts_rank(j.search_vec, jobs_search_query(%s)) AS rank
+        FROM jobs j
+        LEFT JOIN users c ON j.client_id = c.id
+        LEFT JOIN users f ON j.freelancer_id = f.id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY rank DESC, j.id DESC
+        LIMIT %s OFFSET %s;
+        """)
+
+
+async def searchJobs(conn, q, status=None, min_budget=None, max_budget=None, page=1, limit=PAGE_SIZE):
+    """
+    使用 jobs.search_vec 的 GIN 索引（migrations/0003_search.sql）搜尋工作：
+    - 中文、英文皆以 bigram 比對，支援子字串搜尋
+    - 可依狀態、預算範圍篩選
+    - 依 ts_rank 相關度排序，同分時新案件在前
+    """
+    limit = clampLimit(limit)
+    page = max(1, min(int(page or 1), MAX_SEARCH_PAGE))
+
+    params = [q, q]
+    if status:
+        params.append(status)
+    if min_budget is not None:
+        params.append(min_budget)
+    if max_budget is not None:
+        params.append(max_budget)
+    params += [limit + 1, (page - 1) * limit]
+
+    name = _searchStatement(status, min_budget, max_budget)
     async with conn.cursor() as cur:
-        sql = """
+        await statements.execute(cur, name, params)
+        rows = await cur.fetchall()
+
+    return {
+        "items": rows[:limit],
+        "page": page,
+        "has_next": len(rows) > limit and page < MAX_SEARCH_PAGE,
+        "limit": limit,
+    }
+
+
+# ---------------------------------
+# 2️⃣ 取得單一工作詳細資料
+# ---------------------------------
+statements.register("getJob", """
         SELECT 
             j.id, j.title, j.content, j.status, j.budget, j.price,
-            j.requirement_file,
+            j.requirement_file, j.requirement_name,
+            rb.sha256 AS requirement_sha256, rb.has_thumbnail AS requirement_thumbnail,
             c.username AS client_name,
             f.username AS freelancer_name,
             j.created_at
         FROM jobs j
         LEFT JOIN users c ON j.client_id = c.id
         LEFT JOIN users f ON j.freelancer_id = f.id
+        LEFT JOIN blobs rb ON rb.path = j.requirement_file
         WHERE j.id = %s;
-        """
-        await cur.execute(sql, (job_id,))
+        """)
+
+async def getJob(conn, job_id):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "getJob", (job_id,))
         row = await cur.fetchone()
         return row
 
@@ -74,74 +298,128 @@ async def getJob(conn, job_id):
 # ---------------------------------
 # 3️⃣ 新增工作 (甲方建立)
 # ---------------------------------
-async def addJob(conn, title, content, budget, client_id, requirement_file=None):
+statements.register("addJob", """
+        INSERT INTO jobs (title, content, budget, client_id, status, requirement_file, requirement_name)
+        VALUES (%s, %s, %s, %s, '新工作', %s, %s)
+        RETURNING id;
+        """)
+
+async def addJob(conn, title, content, budget, client_id, requirement_file=None, requirement_name=None):
     async with conn.cursor() as cur:
-        sql = """
-        INSERT INTO jobs (title, content, budget, client_id, status, requirement_file)
-        VALUES (%s, %s, %s, %s, '新工作', %s);
-        """
-        await cur.execute(sql, (title, content, budget, client_id, requirement_file))
+        await statements.execute(cur, "addJob", (title, content, budget, client_id, requirement_file, requirement_name))
+        row = await cur.fetchone()
+        await notifyJob(cur, row["id"], "job")
+        if requirement_file:
+            # 需求文件的檢查與縮圖由 worker 處理（processing.py）
+            await taskqueue.enqueue(conn, "requirement.process", {"job_id": row["id"], "path": requirement_file})
         await conn.commit()
+        invalidateJob(row["id"])
         return True
 
 
 # ---------------------------------
 # 4️⃣ 刪除工作 (甲方刪除)
 # ---------------------------------
+statements.register("deleteJob", """
+        WITH j AS (
+            DELETE FROM jobs WHERE id=%s AND client_id=%s
+            RETURNING id, requirement_file
+        ), b AS (
+            DELETE FROM bids WHERE job_id IN (SELECT id FROM j)
+        ), d AS (
+            DELETE FROM deliverables WHERE job_id IN (SELECT id FROM j)
+            RETURNING file_path
+        )
+        SELECT id AS job_id, requirement_file AS path FROM j
+        UNION ALL
+        SELECT NULL, file_path FROM d;
+        """)
+
 async def deleteJob(conn, job_id, client_id):
     async with conn.cursor() as cur:
-        # 僅能刪除自己發的案子
-        sql = "DELETE FROM jobs WHERE id=%s AND client_id=%s;"
-        await cur.execute(sql, (job_id, client_id))
-        return True
+        # 僅能刪除自己發的案子；一併刪除競標與成果，並取回引用的檔案路徑
+        await statements.execute(cur, "deleteJob", (job_id, client_id))
+        rows = await cur.fetchall()
+        paths = [row["path"] for row in rows if row["path"]]
+        # 有刪到案件（j 有一列）才通知
+        if any(row["job_id"] is not None for row in rows):
+            await notifyJob(cur, job_id, "job")
+
+    # 釋放 blob 引用（commit 後才刪除無人引用的檔案）
+    await storage.releaseBlobs(conn, paths)
+    invalidateJob(job_id)
+    return True
 
 
 # ---------------------------------
 # 5️⃣ 查詢甲方發的工作 (Dashboard)
 # ---------------------------------
-async def getJobsByClient(conn, client_id):
-    async with conn.cursor() as cur:
-        sql = """
+_registerPage("getJobsByClient", """
         SELECT 
             j.id, j.title, j.status, j.budget, j.price,
             f.username AS freelancer_name,
             j.created_at
         FROM jobs j
         LEFT JOIN users f ON j.freelancer_id = f.id
-        WHERE j.client_id = %s
-        ORDER BY j.id ASC;
-        """
-        await cur.execute(sql, (client_id,))
-        rows = await cur.fetchall()
-        return rows
+        """, ["j.client_id = %s"], descending=False)
+
+async def getJobsByClient(conn, client_id, after=None, before=None, limit=PAGE_SIZE):
+    # 走 jobs_client_id_idx (client_id, id)，每頁只讀 limit + 1 筆
+    return await _fetchPage(conn, "getJobsByClient", [client_id], after, before, limit)
 
 
 # ---------------------------------
 # 6️⃣ 查詢乙方接的案子 (Dashboard)
 # ---------------------------------
-async def getJobsByFreelancer(conn, freelancer_id):
-    async with conn.cursor() as cur:
-        sql = """
+_registerPage("getJobsByFreelancer", """
         SELECT 
             j.id, j.title, j.status, j.budget, j.price,
             c.username AS client_name,
             j.created_at
         FROM jobs j
         LEFT JOIN users c ON j.client_id = c.id
-        WHERE j.freelancer_id = %s
-        ORDER BY j.id ASC;
-        """
-        await cur.execute(sql, (freelancer_id,))
+        """, ["j.freelancer_id = %s"], descending=False)
+
+async def getJobsByFreelancer(conn, freelancer_id, after=None, before=None, limit=PAGE_SIZE):
+    return await _fetchPage(conn, "getJobsByFreelancer", [freelancer_id], after, before, limit)
+
+
+# ---------------------------------
+# 📊 控制台統計（user_job_stats，由 jobs 上的 trigger 逐筆維護）
+# ---------------------------------
+statements.register("getUserJobStats", """
+        SELECT status, job_count, budget_sum, price_sum
+        FROM user_job_stats
+        WHERE user_id = %s AND side = %s AND job_count > 0
+        ORDER BY status;
+        """)
+
+async def getUserJobStats(conn, user_id, side):
+    """
+    side 為 "client"（甲方發出的案件）或 "freelancer"（乙方承接的案件）。
+    只讀主鍵前綴的幾列（每個狀態一列），不掃描 jobs。
+    回傳 {"by_status": {狀態: {"count", "budget", "price"}}, "count", "budget", "price"}
+    """
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "getUserJobStats", (user_id, side))
         rows = await cur.fetchall()
-        return rows
+
+    by_status = {
+        row["status"]: {"count": row["job_count"], "budget": row["budget_sum"], "price": row["price_sum"]}
+        for row in rows
+    }
+    return {
+        "by_status": by_status,
+        "count": sum(s["count"] for s in by_status.values()),
+        "budget": sum(s["budget"] for s in by_status.values()),
+        "price": sum(s["price"] for s in by_status.values()),
+    }
 
 
 # ---------------------------------
 # 7️⃣ 查詢乙方可報價的工作 (尚未有人接案)
 # ---------------------------------
-async def getAvailableJobs(conn):
-    async with conn.cursor() as cur:
-        sql = """
+statements.register("getAvailableJobs", """
         SELECT 
             j.id, j.title, j.status, j.budget, j.content,
             c.username AS client_name,
@@ -150,8 +428,11 @@ async def getAvailableJobs(conn):
         LEFT JOIN users c ON j.client_id = c.id
         WHERE j.status IN ('新工作', '報價中')
         ORDER BY j.id ASC;
-        """
-        await cur.execute(sql)
+        """)
+
+async def getAvailableJobs(conn):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "getAvailableJobs")
         rows = await cur.fetchall()
         return rows
 
@@ -159,14 +440,16 @@ async def getAvailableJobs(conn):
 # ---------------------------------
 # 8️⃣ 甲方選擇乙方承接 (更新 freelancer_id 與狀態)
 # ---------------------------------
-async def assignFreelancer(conn, job_id, freelancer_id, price):
-    async with conn.cursor() as cur:
-        sql = """
+statements.register("assignFreelancer", """
         UPDATE jobs
         SET freelancer_id = %s, price = %s, status = '進行中', updated_at = CURRENT_TIMESTAMP
         WHERE id = %s;
-        """
-        await cur.execute(sql, (freelancer_id, price, job_id))
+        """)
+
+async def assignFreelancer(conn, job_id, freelancer_id, price):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "assignFreelancer", (freelancer_id, price, job_id))
+        invalidateJob(job_id)
         return True
 
 
@@ -175,99 +458,144 @@ async def assignFreelancer(conn, job_id, freelancer_id, price):
 # ---------------------------------
 # 🔟 查詢上傳成果（deliverables）
 # ---------------------------------
-async def getDeliverables(conn, job_id):
-    async with conn.cursor() as cur:
-        sql = """
+statements.register("getDeliverables", """
         SELECT 
-            d.id, d.file_path, d.uploaded_by, u.username AS uploader_name, d.uploaded_at
+            d.id, d.file_path, d.file_name, d.uploaded_by, u.username AS uploader_name, d.uploaded_at
         FROM deliverables d
         LEFT JOIN users u ON d.uploaded_by = u.id
         WHERE d.job_id = %s
         ORDER BY d.uploaded_at ASC;
-        """
-        await cur.execute(sql, (job_id,))
+        """)
+
+async def getDeliverables(conn, job_id):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "getDeliverables", (job_id,))
         rows = await cur.fetchall()
         return rows
 
 
 # 乙方提出接案申請
-async def requestJob(conn, job_id, freelancer_id):
-    async with conn.cursor() as cur:
-        sql = """
+statements.register("requestJob", """
         UPDATE jobs
         SET freelancer_id = %s, status = '待確認'
         WHERE id = %s AND freelancer_id IS NULL;
-        """
-        await cur.execute(sql, (freelancer_id, job_id))
+        """)
+
+async def requestJob(conn, job_id, freelancer_id):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "requestJob", (freelancer_id, job_id))
+        if cur.rowcount:
+            await notifyJob(cur, job_id, "status", "待確認")
         await conn.commit()
+        invalidateJob(job_id)
         return True
 
 
 # 甲方確認接案
-async def confirmJob(conn, job_id, client_id):
-    async with conn.cursor() as cur:
-        sql = """
+statements.register("confirmJob", """
         UPDATE jobs
         SET status = '進行中'
         WHERE id = %s AND client_id = %s AND status = '待確認';
-        """
-        await cur.execute(sql, (job_id, client_id))
+        """)
+
+async def confirmJob(conn, job_id, client_id):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "confirmJob", (job_id, client_id))
+        if cur.rowcount:
+            await notifyJob(cur, job_id, "status", "進行中")
         await conn.commit()
+        invalidateJob(job_id)
         return True
 
 # 甲方確認結案
-async def completeJob(conn, job_id, client_id):
-    async with conn.cursor() as cur:
-        sql = """
+statements.register("completeJob", """
         UPDATE jobs
         SET status = '已完成', updated_at = CURRENT_TIMESTAMP
         WHERE id = %s AND client_id = %s;
-        """
-        await cur.execute(sql, (job_id, client_id))
+        """)
+
+async def completeJob(conn, job_id, client_id):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "completeJob", (job_id, client_id))
+        if cur.rowcount:
+            await notifyJob(cur, job_id, "status", "已完成")
         await conn.commit()
+        invalidateJob(job_id)
         return True
 
 
 # 甲方退件
-async def rejectJob(conn, job_id, client_id, reason):
-    async with conn.cursor() as cur:
-        # 更新 job 狀態
-        sql1 = """
+statements.register("rejectJob.job", """
         UPDATE jobs
         SET status = '進行中', updated_at = CURRENT_TIMESTAMP
         WHERE id = %s AND client_id = %s;
-        """
-        await cur.execute(sql1, (job_id, client_id))
+        """)
 
-        # 更新 deliverable 的退件原因
-        sql2 = """
+statements.register("rejectJob.deliverables", """
         UPDATE deliverables
         SET reject_reason = %s
         WHERE job_id = %s;
-        """
-        await cur.execute(sql2, (reason, job_id))
+        """)
+
+async def rejectJob(conn, job_id, client_id, reason):
+    async with conn.cursor() as cur:
+        # 更新 job 狀態
+        await statements.execute(cur, "rejectJob.job", (job_id, client_id))
+        rejected = cur.rowcount
+
+        # 更新 deliverable 的退件原因
+        await statements.execute(cur, "rejectJob.deliverables", (reason, job_id))
 
+        if rejected:
+            await notifyJob(cur, job_id, "status", "進行中")
         await conn.commit()
+        invalidateJob(job_id)
         return True
 
 
-# 查詢乙方上傳的交付檔案（含退件理由）
+# 查詢乙方上傳的交付檔案（含退件理由與背景處理結果，見 processing.py）
+statements.register("getDeliverable", """
+        SELECT d.file_path, d.file_name, d.uploaded_by, d.reject_reason,
+               b.sha256, b.mime_type, b.page_count, b.processed_at, b.has_thumbnail
+        FROM deliverables d
+        LEFT JOIN blobs b ON b.path = d.file_path
+        WHERE d.job_id = %s
+        ORDER BY d.id DESC LIMIT 1;
+        """)
+
 async def getDeliverable(conn, job_id):
     async with conn.cursor() as cur:
-        sql = """
-        SELECT file_path, uploaded_by, reject_reason
-        FROM deliverables
-        WHERE job_id = %s
-        ORDER BY id DESC LIMIT 1;
-        """
-        await cur.execute(sql, (job_id,))
+        await statements.execute(cur, "getDeliverable", (job_id,))
         row = await cur.fetchone()
         return row
+
+
+# === 乙方上傳成果（/api/upload 與分段上傳完成時共用）===
+# 新增 deliverables 紀錄並把案件狀態改為「上傳成果」（一次往返）
+statements.register("addDeliverable", """
+        WITH d AS (
+            INSERT INTO deliverables (job_id, file_path, file_name, uploaded_by)
+            VALUES (%s, %s, %s, %s)
+        )
+        UPDATE jobs
+        SET status = '上傳成果', updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s;
+        """)
+
+async def addDeliverable(conn, job_id, file_path, file_name, uploaded_by):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "addDeliverable", (job_id, file_path, file_name, uploaded_by, job_id))
+        # 通知正在看此案件的瀏覽器（rowcount 為 jobs 的 UPDATE 筆數）
+        if cur.rowcount:
+            await notifyJob(cur, job_id, "status", "上傳成果")
+    # 與上傳紀錄同一交易排入背景處理：commit 失敗就不會有孤兒工作
+    await taskqueue.enqueue(conn, "deliverable.process", {"job_id": job_id, "path": file_path})
+    await conn.commit()
+    invalidateJob(job_id)
+    return True
     
 # === 取得競標列表 ===
-async def getBids(conn, job_id):
-    async with conn.cursor() as cur:
-        sql = """
+statements.register("getBids", """
         SELECT 
             b.id AS bid_id, 
             u.id AS bidder_id,
@@ -278,73 +606,303 @@ async def getBids(conn, job_id):
         JOIN users u ON b.bidder_id = u.id
         WHERE b.job_id = %s
         ORDER BY b.amount DESC;
-        """
-        await cur.execute(sql, (job_id,))
+        """)
+
+async def getBids(conn, job_id):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "getBids", (job_id,))
         rows = await cur.fetchall()
         return rows
 
 
 # === 乙方出價 ===
+# 以單一敘述完成出價（一次往返、不會與其他出價交錯）：
+# - job：查預算；出價不高於預算時 bid 不會插入任何資料
+# - bid：同一乙方重複出價時以 ON CONFLICT 更新金額（bids_job_bidder_key）
+# - status：第一筆有效出價把「新工作」改為「待確認」
+# - notify：出價成功時送出 bid 事件（與出價同一交易）
+statements.register("placeBid", """
+            WITH job AS (
+                SELECT id, budget FROM jobs WHERE id = %(job_id)s
+            ),
+            bid AS (
+                INSERT INTO bids (job_id, bidder_id, amount)
+                SELECT id, %(bidder_id)s, %(amount)s FROM job WHERE %(amount)s > budget
+                ON CONFLICT (job_id, bidder_id) DO UPDATE
+                SET amount = EXCLUDED.amount, created_at = CURRENT_TIMESTAMP
+                RETURNING id, job_id, amount
+            ),
+            status AS (
+                UPDATE jobs
+                SET status = '待確認'
+                WHERE id IN (SELECT job_id FROM bid) AND status = '新工作'
+                RETURNING id
+            ),
+            notify AS (
+                SELECT pg_notify(%(channel)s, json_build_object(
+                    'job_id', job_id,
+                    'type', 'bid',
+                    'status', CASE WHEN EXISTS (SELECT 1 FROM status) THEN '待確認' END
+                )::text)
+                FROM bid
+            )
+            SELECT
+                (SELECT budget FROM job) AS budget,
+                (SELECT id FROM bid) AS bid_id,
+                (SELECT amount FROM bid) AS amount,
+                EXISTS (SELECT 1 FROM status) AS status_changed,
+                (SELECT count(*) FROM notify) AS notified;
+        """)
+
 async def placeBid(conn, job_id, bidder_id, amount):
+    """
+    乙方出價（同一乙方重複出價會覆蓋舊報價），回傳：
+    {"result": "success" | "too_low" | "job_not_found",
+     "bid_id", "amount", "budget", "status_changed"}
+    """
     async with conn.cursor() as cur:
-        # 1️⃣ 查案件預算
-        await cur.execute("SELECT budget FROM jobs WHERE id=%s;", (job_id,))
-        job = await cur.fetchone()
-        if not job:
-            return "job_not_found"
-        if amount <= job["budget"]:
-            return "too_low"
-
-        # 2️⃣ 刪除該乙方舊報價
-        await cur.execute("DELETE FROM bids WHERE job_id=%s AND bidder_id=%s;", (job_id, bidder_id))
-
-        # 3️⃣ 插入新報價
-        await cur.execute("""
-            INSERT INTO bids (job_id, bidder_id, amount)
-            VALUES (%s, %s, %s);
-        """, (job_id, bidder_id, amount))
-
-        # ✅ 4️⃣ 更新 job 狀態為「待確認」
-        await cur.execute("""
-            UPDATE jobs
-            SET status = '待確認'
-            WHERE id = %s AND status = '新工作';
-        """, (job_id,))
+        await statements.execute(
+            cur, "placeBid",
+            {"job_id": job_id, "bidder_id": bidder_id, "amount": amount, "channel": EVENT_CHANNEL}
+        )
+        row = await cur.fetchone()
+    await conn.commit()
 
-        await conn.commit()
-        return "success"
+    if row["budget"] is None:
+        result = "job_not_found"
+    elif row["bid_id"] is None:
+        result = "too_low"
+    else:
+        result = "success"
+        # 只有狀態改變時首頁清單才需要更新
+        invalidateJob(job_id, row["status_changed"])
+    return {"result": result, **row}
 
 
 
 # === 甲方選擇得標乙方 ===
+statements.register("chooseBid.assign", "UPDATE jobs SET freelancer_id=%s, status='進行中' WHERE id=%s;")
+statements.register("chooseBid.clearBids", "DELETE FROM bids WHERE job_id=%s;")
+
 async def chooseBid(conn, job_id, freelancer_id):
     async with conn.cursor() as cur:
-        await cur.execute(
-            "UPDATE jobs SET freelancer_id=%s, status='進行中' WHERE id=%s;",
-            (freelancer_id, job_id)
-        )
+        await statements.execute(cur, "chooseBid.assign", (freelancer_id, job_id))
+        assigned = cur.rowcount
         # 清除所有競標紀錄（可保留歷史）
-        await cur.execute("DELETE FROM bids WHERE job_id=%s;", (job_id,))
+        await statements.execute(cur, "chooseBid.clearBids", (job_id,))
+        if assigned:
+            await notifyJob(cur, job_id, "status", "進行中")
         await conn.commit()
+        invalidateJob(job_id)
 
 #甲方更新案件
-async def updateJob(conn, job_id, title, content, budget, requirement_file=None):
-    async with conn.cursor() as cur:
-        if requirement_file:
-            sql = """
-            UPDATE jobs 
-            SET title=%s, content=%s, budget=%s, requirement_file=%s
-            WHERE id=%s;
-            """
-            await cur.execute(sql, (title, content, budget, requirement_file, job_id))
-        else:
-            sql = """
+statements.register("updateJob.withFile", """
+            UPDATE jobs j
+            SET title=%s, content=%s, budget=%s, requirement_file=%s, requirement_name=%s
+            FROM (SELECT id, requirement_file AS old_file FROM jobs WHERE id=%s FOR UPDATE) o
+            WHERE j.id = o.id
+            RETURNING o.old_file;
+            """)
+
+statements.register("updateJob", """
             UPDATE jobs 
             SET title=%s, content=%s, budget=%s
             WHERE id=%s;
-            """
-            await cur.execute(sql, (title, content, budget, job_id))
+            """)
+
+async def updateJob(conn, job_id, title, content, budget, requirement_file=None, requirement_name=None):
+    """
+    更新案件；案件不存在時回傳 False。
+    兩個分支都在最後的 storage.releaseBlobs 一次 commit（沒有要釋放的舊檔時也會 commit）。
+    """
+    released = []
+    async with conn.cursor() as cur:
+        if requirement_file:
+            # 換上新需求文件，並取回舊檔路徑以釋放 blob 引用
+            await statements.execute(cur, "updateJob.withFile", (title, content, budget, requirement_file, requirement_name, job_id))
+            row = await cur.fetchone()
+            if not row:
+                # 案件不存在：釋放呼叫端剛存入的新檔引用（storeBlob 已 refcount + 1），避免 blob 外洩
+                await storage.releaseBlobs(conn, [requirement_file])
+                return False
+            await notifyJob(cur, job_id, "job")
+            await taskqueue.enqueue(conn, "requirement.process", {"job_id": job_id, "path": requirement_file})
+            if row["old_file"]:
+                released.append(row["old_file"])
+        else:
+            await statements.execute(cur, "updateJob", (title, content, budget, job_id))
+            if not cur.rowcount:
+                await conn.commit()
+                return False
+            await notifyJob(cur, job_id, "job")
 
-        await conn.commit()
+    # 釋放舊檔引用並 commit（更新、通知、背景工作一起生效）
+    await storage.releaseBlobs(conn, released)
+    invalidateJob(job_id)
+    return True
 
 
+# ---------------------------------
+# 案件詳情：案件 + 競標清單（依金額排序）+ 最新成果，一次往返取得
+# ---------------------------------
+async def getJobDetail(conn, job_id):
+    """
+    以 psycopg pipeline mode 一次送出三個查詢、一次同步取回結果，
+    只需一次網路往返；libpq 不支援 pipeline 時退回逐一查詢。
+    """
+    if not psycopg.Pipeline.is_supported():
+        return {
+            "job": await getJob(conn, job_id),
+            "bids": await getBids(conn, job_id),
+            "deliverable": await getDeliverable(conn, job_id),
+        }
+
+    async with conn.pipeline() as p:
+        async with conn.cursor() as job_cur, conn.cursor() as bids_cur, conn.cursor() as deliv_cur:
+            await statements.execute(job_cur, "getJob", (job_id,))
+            await statements.execute(bids_cur, "getBids", (job_id,))
+            await statements.execute(deliv_cur, "getDeliverable", (job_id,))
+            await p.sync()
+            return {
+                "job": await job_cur.fetchone(),
+                "bids": await bids_cur.fetchall(),
+                "deliverable": await deliv_cur.fetchone(),
+            }
+
+
+# ---------------------------------
+# 案件詳情，經由快取讀取
+# ---------------------------------
+async def getCachedJobDetail(conn, job_id):
+    version = jobDetailCache.version
+    detail = jobDetailCache.get(job_id)
+    if detail is not None:
+        return detail
+
+    detail = await getJobDetail(conn, job_id)
+    # 不存在的案件不快取，避免新增後仍讀到空結果
+    if detail["job"]:
+        jobDetailCache.set(job_id, detail, version)
+    return detail
+
+
+# ---------------------------------
+# JSON API（routes/apiV1.py）：欄位投影 + 批次查詢
+# ---------------------------------
+# 欄位名稱 -> SQL 運算式；只 SELECT 要求的欄位，
+# 需要的 JOIN（委託人 / 接案人名稱）也只在用到時才加上
+API_FIELDS = {
+    "id": "j.id",
+    "title": "j.title",
+    "content": "j.content",
+    "status": "j.status",
+    "budget": "j.budget",
+    "price": "j.price",
+    "client_id": "j.client_id",
+    "freelancer_id": "j.freelancer_id",
+    "client_name": "c.username",
+    "freelancer_name": "f.username",
+    "requirement_name": "j.requirement_name",
+    "created_at": "j.created_at",
+    "updated_at": "j.updated_at",
+    # 報價（依金額排序）與最新成果以 json 子查詢一併取回，不需額外往返
+    "bids": """(
+            SELECT COALESCE(json_agg(json_build_object(
+                'bid_id', b.id, 'bidder_id', b.bidder_id, 'username', bu.username,
+                'amount', b.amount, 'created_at', b.created_at
+            ) ORDER BY b.amount DESC), '[]'::json)
+            FROM bids b JOIN users bu ON bu.id = b.bidder_id
+            WHERE b.job_id = j.id
+        )""",
+    "deliverable": """(
+            SELECT json_build_object(
+                'file_name', d.file_name, 'uploaded_by', d.uploaded_by, 'uploaded_at', d.uploaded_at,
+                'reject_reason', d.reject_reason, 'mime_type', bl.mime_type, 'page_count', bl.page_count
+            )
+            FROM deliverables d LEFT JOIN blobs bl ON bl.path = d.file_path
+            WHERE d.job_id = j.id
+            ORDER BY d.id DESC LIMIT 1
+        )""",
+}
+
+# 未指定 fields= 時回傳的欄位（不含內文與報價 / 成果）
+API_DEFAULT_FIELDS = ("id", "title", "status", "budget", "price", "client_name", "freelancer_name", "created_at")
+
+_API_JOINS = {
+    "client_name": "LEFT JOIN users c ON j.client_id = c.id",
+    "freelancer_name": "LEFT JOIN users f ON j.freelancer_id = f.id",
+}
+
+MAX_BATCH = 100  # 批次查詢一次最多的案件數
+
+
+# 報價 / 成果為較貴的子查詢，只在要求時加入 SQL；其餘欄位一律查詢，回傳前再依 fields= 挑選
+_API_EXTRAS = ("bids", "deliverable")
+
+
+def apiFields(fields):
+    """
+    整理 fields=：依 API_FIELDS 的順序排列，一律包含 id（分頁游標與批次對應需要）；
+    有未知欄位時拋出 ValueError。
+    """
+    if not fields:
+        fields = API_DEFAULT_FIELDS
+    unknown = set(fields) - API_FIELDS.keys()
+    if unknown:
+        raise ValueError(f"未知的欄位：{', '.join(sorted(unknown))}")
+    wanted = set(fields) | {"id"}
+    return tuple(name for name in API_FIELDS if name in wanted)
+
+
+def _apiSelect(extras):
+    names = [name for name in API_FIELDS if name not in _API_EXTRAS or name in extras]
+    columns = ",\n            ".join(f"{API_FIELDS[name]} AS {name}" for name in names)
+    joins = "\n        ".join(_API_JOINS.values())
+    return f"""
+        SELECT
+            {columns}
+        FROM jobs j
+        {joins}
+        """
+
+
+def _apiSuffix(fields):
+    # 只依報價 / 成果是否要求區分 statement：組合數固定（4 種），
+    # 用戶端送出任意 fields= 都不會增加 prepared statement 或 /metrics 的 statement 標籤
+    return "".join(f"+{name}" for name in _API_EXTRAS if name in fields)
+
+
+for _extras in ((), ("bids",), ("deliverable",), _API_EXTRAS):
+    _suffix = _apiSuffix(_extras)
+    _registerPage(f"apiJobs{_suffix}", _apiSelect(_extras), [], descending=True)
+    _registerPage(f"apiJobs{_suffix}.status", _apiSelect(_extras), ["j.status = %s"], descending=True)
+    statements.register(f"apiJobsBatch{_suffix}", _apiSelect(_extras) + " WHERE j.id = ANY(%s);")
+
+
+def _apiProject(rows, fields):
+    return [{name: row[name] for name in fields} for row in rows]
+
+
+async def apiListJobs(conn, fields=None, status=None, after=None, before=None, limit=PAGE_SIZE):
+    # 案件清單（新案件在前），keyset 分頁與首頁相同
+    fields = apiFields(fields)
+    name = f"apiJobs{_apiSuffix(fields)}{'.status' if status else ''}"
+    page = await _fetchPage(conn, name, [status] if status else [], after, before, limit)
+    page["items"] = _apiProject(page["items"], fields)
+    return page
+
+
+async def apiGetJobs(conn, ids, fields=None):
+    """
+    依 id 批次取得案件（一次查詢，含要求的報價 / 成果），
+    回傳 {"items": [...依 ids 順序], "missing": [不存在的 id]}。
+    """
+    fields = apiFields(fields)
+    ids = list(dict.fromkeys(int(i) for i in ids))[:MAX_BATCH]
+    async with conn.cursor() as cur:
+        await statements.execute(cur, f"apiJobsBatch{_apiSuffix(fields)}", (ids,))
+        rows = {row["id"]: row for row in _apiProject(await cur.fetchall(), fields)}
+    return {
+        "items": [rows[i] for i in ids if i in rows],
+        "missing": [i for i in ids if i not in rows],
+    }
@@ -1,26 +1,56 @@
 # main.py
 from fastapi import FastAPI, Depends, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 from sessionLogin import router as login_router
 from fastapi import File, UploadFile
+from markupsafe import Markup
 
 import os
-import time
+from contextlib import asynccontextmanager
 
+import assets
+import compression
+import db
 from db import getDB
 import jobs  # 對應 jobs.py（原本的 posts.py 改名後）
+import storage
+import download
+import events
+import metrics
+import ratelimit
+import staticFiles
+import thumbnails
+import users
 
 # 載入 routes 子模組
 from routes.upload import router as upload_router
 from routes.dbQuery import router as db_router
+from routes.events import router as events_router
+from routes.apiV1 import router as api_v1_router
+
+# =============================
+# 應用程式生命週期：啟動時開啟並預熱連線池、開始 LISTEN 即時事件，關閉時釋放
+# =============================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db.openPool()
+    events.start()
+    try:
+        yield
+    finally:
+        await events.stop()
+        await db.closePool()
+
 
 # =============================
 # 初始化 FastAPI 應用
 # =============================
-app = FastAPI(title="工作委託平台")
+app = FastAPI(title="工作委託平台", lifespan=lifespan)
+
+# 限流（需在 session 之內才能依登入者計算；後加入的 middleware 在外層）
+app.add_middleware(ratelimit.RateLimitMiddleware)
 
 # Session Middleware（用於登入狀態保存）
 app.add_middleware(
@@ -30,55 +60,109 @@ app.add_middleware(
     https_only=False
 )
 
-# Jinja2 模板設定
-templates = Jinja2Templates(directory="templates")
+# 回應壓縮（gzip / br，依 Accept-Encoding；/static 的預先壓縮檔與 SSE 不再壓縮）
+app.add_middleware(compression.CompressionMiddleware)
+
+# 效能指標（最外層，量測包含 session 在內的完整處理時間）
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Jinja2 模板設定（記錄渲染時間）
+templates = metrics.instrumentTemplates(Jinja2Templates(directory="templates"))
+templates.env.globals["asset"] = assets.url  # 帶指紋的 CSS 網址（assets.py）
+templates.env.globals["thumbnailUrl"] = thumbnails.thumbnailUrl
+templates.env.globals["thumbnailSrcset"] = thumbnails.srcset
 
 # 掛載路由模組
 app.include_router(upload_router, prefix="/api")
 app.include_router(db_router, prefix="/api")
+app.include_router(events_router, prefix="/api")
+app.include_router(api_v1_router, prefix="/api/v1")
 app.include_router(login_router)
 
 # =============================
 # 靜態檔案掛載
 # =============================
-app.mount("/static", StaticFiles(directory="www"), name="static")
+# 縮圖（www/thumbs）與 CSS（www/assets）以內容雜湊命名，長效快取；有預先壓縮檔時直接送出（staticFiles.py）
+app.mount("/static", staticFiles.CachedStaticFiles(directory="www"), name="static")
 
 
 # =============================
 # 首頁（工作清單）
 # =============================
-@app.get("/")
-async def home(request: Request, conn=Depends(getDB)):
-    user_id = request.session.get("user_id")
-    role = request.session.get("role")
-    username = None
+def _optionalInt(value):
+    # 空字串或非數字視為未填
+    try:
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _renderJobList(result, list_context):
+    html = templates.get_template("fragments/jobListBody.html").render(
+        items=result["items"], page=result, **list_context
+    )
+    return Markup(html)
+
 
-    # 若有登入，查出對應的使用者名稱
-    if user_id:
-        async with conn.cursor() as cur:
-            await cur.execute("SELECT username FROM users WHERE id = %s;", (user_id,))
-            result = await cur.fetchone()
-            if result:
-                username = result["username"]
+@app.get("/")
+async def home(
+    request: Request,
+    after: int | None = None,
+    before: int | None = None,
+    limit: int = jobs.PAGE_SIZE,
+    q: str | None = None,
+    min_budget: str | None = None,   # 表單空白欄位會送出空字串，自行轉換
+    max_budget: str | None = None,
+    page: int = 1,
+    conn=Depends(getDB)
+):
+    # 登入者資料由 session 取得（登入時寫入），不需查詢 users
+    user = await users.resolveUser(request, conn)
 
     # === 新增這行：讀取網址列的 ?status= 參數 ===
     selected_status = request.query_params.get("status")
 
-    # === 根據選擇狀態查詢 ===
-    if selected_status and selected_status != "":
-        job_list = await jobs.getJobsByStatus(conn, selected_status)
+    # === 有關鍵字時改用全文搜尋（依相關度排序，?page= 分頁）===
+    q = (q or "").strip()
+    min_budget = _optionalInt(min_budget)
+    max_budget = _optionalInt(max_budget)
+    list_context = {
+        "current_status": selected_status or "",  # 給前端記住選項
+        "current_q": q,
+        "min_budget": min_budget,
+        "max_budget": max_budget
+    }
+    if q:
+        result = await jobs.searchJobs(
+            conn, q, selected_status or None, min_budget, max_budget, page, limit
+        )
+        list_html = _renderJobList(result, list_context)
     else:
-        job_list = await jobs.getJobList(conn)
-
+        # === 清單內容與登入者無關：依 狀態 + 分頁游標 快取渲染好的 HTML ===
+        key = (selected_status or "", min_budget, max_budget, after, before, jobs.clampLimit(limit))
+        list_html = jobs.jobListCache.get(key)
+        if list_html is None:
+            version = jobs.jobListCache.version
+            # === 根據選擇狀態 / 預算範圍查詢（?after= / ?before= / ?limit= 分頁）===
+            if min_budget is not None or max_budget is not None:
+                result = await jobs.getJobsByBudget(
+                    conn, selected_status or None, min_budget, max_budget, after, before, limit
+                )
+            elif selected_status:
+                result = await jobs.getJobsByStatus(conn, selected_status, after, before, limit)
+            else:
+                result = await jobs.getJobList(conn, after, before, limit)
+            list_html = _renderJobList(result, list_context)
+            jobs.jobListCache.set(key, list_html, version)
+
+    # 外框（登入列、搜尋表單）每次依使用者渲染，清單本身直接嵌入
     return templates.TemplateResponse(
         "jobList.html",
         {
             "request": request,
-            "items": job_list,
-            "user_id": user_id,
-            "role": role,
-            "username": username,
-            "current_status": selected_status or ""  # 給前端記住選項
+            "list_html": list_html,
+            **user,
+            **list_context
         }
     )
 
@@ -88,23 +172,23 @@ async def home(request: Request, conn=Depends(getDB)):
 # === 顯示案件詳情 (含競標清單 + 上傳檔案資訊) ===
 @app.get("/read/{id}")
 async def readJob(request: Request, id: int, conn=Depends(getDB)):
-    # 從 jobs.py 抓取案件資訊
-    jobDetail = await jobs.getJob(conn, id)
-
-    # 競標清單（乙方報價）
-    bids = await jobs.getBids(conn, id)
-
-    # 上傳成果（乙方已交付的檔案資訊）
-    deliverable = await jobs.getDeliverable(conn, id)
+    # 從 jobs.py 抓取案件資訊、競標清單（乙方報價）與上傳成果
+    # （優先讀取快取，案件有異動時由 jobs.py 失效）
+    detail = await jobs.getCachedJobDetail(conn, id)
+    # 案件不存在：模板需要 job 的欄位（狀態等），不能以 None 渲染
+    if detail["job"] is None:
+        raise HTTPException(status_code=404, detail="找不到此案件")
+    user = await users.resolveUser(request, conn)
 
     # 傳到模板 jobDetail.html
     return templates.TemplateResponse(
         "jobDetail.html",
         {
             "request": request,
-            "job": jobDetail,
-            "bids": bids,
-            "deliverable": deliverable
+            "username": user["username"],
+            "job": detail["job"],
+            "bids": detail["bids"],
+            "deliverable": detail["deliverable"]
         }
     )
 
@@ -136,14 +220,14 @@ async def add_job(
         raise HTTPException(status_code=403, detail="只有甲方可新增工作")
 
     file_path = None
-    if requirement_file:
-        upload_dir = "uploads/requirements"
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, requirement_file.filename)
-        with open(file_path, "wb") as f:
-            f.write(await requirement_file.read())
-
-    await jobs.addJob(conn, title, content, budget, user_id, file_path)
+    file_name = None
+    if requirement_file and requirement_file.filename:
+        # 以內容雜湊存放，相同檔案只存一份
+        file_name = os.path.basename(requirement_file.filename)
+        blob = await storage.storeBlob(conn, requirement_file, storage.MAX_REQUIREMENT_SIZE)
+        file_path = blob["path"]
+
+    await jobs.addJob(conn, title, content, budget, user_id, file_path, file_name)
     return RedirectResponse(url="/dashboard_client", status_code=302)
 
 # =============================
@@ -161,71 +245,56 @@ async def delete_job(request: Request, id: int, conn=Depends(getDB)):
     return RedirectResponse(url="/", status_code=302)
 
 # =============================
-# 登入 / 登出
+# 登入 / 登出：由 sessionLogin.py 的 router 處理
 # =============================
-@app.get("/loginForm")
-async def login_form(request: Request):
-    return templates.TemplateResponse("loginForm.html", {"request": request})
-
-@app.post("/login")
-async def login(
-    request: Request,
-    username: str = Form(...),
-    password: str = Form(...),
-    conn=Depends(getDB)
-):
-    async with conn.cursor() as cur:
-        sql = "SELECT id, role FROM users WHERE username=%s AND password=%s"
-        await cur.execute(sql, (username, password))
-        user = await cur.fetchone()
-
-    if user:
-        request.session["user_id"] = user["id"]
-        request.session["role"] = user["role"]
-
-        if user["role"] == "甲方":
-            return RedirectResponse(url="/dashboard_client", status_code=302)
-        else:
-            return RedirectResponse(url="/dashboard_freelancer", status_code=302)
-    else:
-        return HTMLResponse("帳號或密碼錯誤，<a href='/loginForm'>返回登入</a>", status_code=401)
-
-
-@app.get("/logout")
-async def logout(request: Request):
-    request.session.clear()
-    return RedirectResponse(url="/", status_code=302)
 
 # =============================
 # 甲方 / 乙方 Dashboard
 # =============================
 @app.get("/dashboard_client")
-async def dashboard_client(request: Request, conn=Depends(getDB)):
+async def dashboard_client(
+    request: Request,
+    after: int | None = None,
+    before: int | None = None,
+    limit: int = jobs.PAGE_SIZE,
+    conn=Depends(getDB)
+):
     if request.session.get("role") != "甲方":
         return RedirectResponse(url="/", status_code=302)
 
     client_id = request.session.get("user_id")
-    my_jobs = await jobs.getJobsByClient(conn, client_id)
+    # 標題列統計讀 user_job_stats，清單只取目前這一頁
+    stats = await jobs.getUserJobStats(conn, client_id, "client")
+    page = await jobs.getJobsByClient(conn, client_id, after, before, limit)
     return templates.TemplateResponse(
         "dashboard_client.html",
-        {"request": request, "jobs": my_jobs}
+        {"request": request, "jobs": page["items"], "page": page, "stats": stats}
     )
 
 @app.get("/dashboard_freelancer")
-async def dashboard_freelancer(request: Request, conn=Depends(getDB)):
+async def dashboard_freelancer(
+    request: Request,
+    after: int | None = None,
+    before: int | None = None,
+    limit: int = jobs.PAGE_SIZE,
+    conn=Depends(getDB)
+):
     if request.session.get("role") != "乙方":
         return RedirectResponse(url="/", status_code=302)
 
     freelancer_id = request.session.get("user_id")
     available_jobs = await jobs.getAvailableJobs(conn)
-    my_jobs = await jobs.getJobsByFreelancer(conn, freelancer_id)
+    stats = await jobs.getUserJobStats(conn, freelancer_id, "freelancer")
+    page = await jobs.getJobsByFreelancer(conn, freelancer_id, after, before, limit)
 
     return templates.TemplateResponse(
         "dashboard_freelancer.html",
         {
             "request": request,
             "available_jobs": available_jobs,
-            "my_jobs": my_jobs
+            "my_jobs": page["items"],
+            "page": page,
+            "stats": stats
         }
     )
 
@@ -264,34 +333,35 @@ async def confirm_job(
 
 # 下載成果檔案
 @app.get("/download/{job_id}")
-async def download_file(job_id: int, conn=Depends(getDB)):
+async def download_file(request: Request, job_id: int, conn=Depends(getDB)):
     deliverable = await jobs.getDeliverable(conn, job_id)
     if not deliverable:
         return HTMLResponse("尚未上傳任何成果", status_code=404)
 
+    # blob 以雜湊命名，下載時使用原始檔名（支援 Range 續傳與 304 驗證）
     file_path = deliverable["file_path"]
-    if not os.path.exists(file_path):
+    filename = deliverable["file_name"] or os.path.basename(file_path)
+    response = await download.fileDownload(request, file_path, filename)
+    if response is None:
         return HTMLResponse("檔案不存在", status_code=404)
-
-    filename = os.path.basename(file_path)
-    return FileResponse(file_path, filename=filename)
+    return response
 
 # 下載需求文件
 @app.get("/download_requirement/{job_id}")
-async def download_requirement(job_id: int, conn=Depends(getDB)):
+async def download_requirement(request: Request, job_id: int, conn=Depends(getDB)):
     async with conn.cursor() as cur:
-        await cur.execute("SELECT requirement_file FROM jobs WHERE id=%s;", (job_id,))
+        await cur.execute("SELECT requirement_file, requirement_name FROM jobs WHERE id=%s;", (job_id,))
         job = await cur.fetchone()
 
     if not job or not job["requirement_file"]:
         return HTMLResponse("⚠️ 此案件未提供需求文件", status_code=404)
 
     file_path = job["requirement_file"]
-    if not os.path.exists(file_path):
+    filename = job["requirement_name"] or os.path.basename(file_path)
+    response = await download.fileDownload(request, file_path, filename)
+    if response is None:
         return HTMLResponse("❌ 找不到檔案", status_code=404)
-
-    filename = os.path.basename(file_path)
-    return FileResponse(file_path, filename=filename)
+    return response
 
 #甲方編輯案件(取得)
 @app.get("/editJobForm/{job_id}")
@@ -351,9 +421,9 @@ async def bid_job(
         return HTMLResponse("⚠️ 只有乙方可以競標", status_code=403)
 
     result = await jobs.placeBid(conn, job_id, bidder_id, amount)
-    if result == "too_low":
+    if result["result"] == "too_low":
         return HTMLResponse("⚠️ 出價必須高於原始預算", status_code=400)
-    elif result == "job_not_found":
+    elif result["result"] == "job_not_found":
         return HTMLResponse("⚠️ 找不到此案件", status_code=404)
 
     return RedirectResponse(url=f"/read/{job_id}", status_code=302)
@@ -392,27 +462,35 @@ async def edit_job(
         return HTMLResponse("❌ 沒有權限修改", status_code=403)
 
     file_path = None
+    file_name = None
 
     # ✅ 確保有上傳檔案且不是空檔案名
     if requirement_file and requirement_file.filename:
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-
-        # ✅ 用時間戳避免覆蓋同名檔案
-        safe_filename = f"{int(time.time())}_{requirement_file.filename}"
-
-        file_path = os.path.join(upload_dir, safe_filename)
+        # ✅ 以內容雜湊存放：同名檔案不會互相覆蓋，相同內容只存一份
+        file_name = os.path.basename(requirement_file.filename)
 
-        # ✅ 寫檔案（確保這裡的 file_path 是檔案，不是資料夾）
+        # ✅ 串流寫檔案（分塊寫入、限制大小、完成後才放到定位）
         try:
-            with open(file_path, "wb") as f:
-                f.write(await requirement_file.read())
+            blob = await storage.storeBlob(conn, requirement_file, storage.MAX_REQUIREMENT_SIZE)
+            file_path = blob["path"]
+        except HTTPException:
+            raise
         except PermissionError:
             return HTMLResponse("⚠️ 沒有權限寫入檔案（可能被 OneDrive 鎖住）", status_code=500)
         except Exception as e:
             return HTMLResponse(f"⚠️ 檔案寫入失敗：{e}", status_code=500)
 
     # ✅ 呼叫更新函式
-    await jobs.updateJob(conn, job_id, title, content, budget, file_path)
+    if not await jobs.updateJob(conn, job_id, title, content, budget, file_path, file_name):
+        return HTMLResponse("⚠️ 找不到此案件", status_code=404)
     return RedirectResponse(url=f"/read/{job_id}", status_code=302)
 
+
+
+# =============================
+# Prometheus 指標
+# =============================
+@app.get("/metrics")
+async def read_metrics():
+    metrics.observePool(db.poolStats())
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,228 @@
+# metrics.py
+# =============================
+# 效能指標 (Prometheus metrics)
+# =============================
+# 功能說明：
+# - MetricsMiddleware：每個路由的延遲 histogram、狀態碼計數、處理中請求數
+# - statements.execute 記錄每個 SQL 的執行時間與回傳列數（依 jobs.py 函式分類）
+# - db.getDB 記錄等待連線池的時間；/metrics 輸出時一併帶入連線池與快取統計
+# - instrumentTemplates：記錄 Jinja2 模板渲染時間
+# - 以 Prometheus text format 0.0.4 由 main.py 的 GET /metrics 輸出
+#
+# 開銷：每次記錄只是字典查詢與加法（event loop 單執行緒，不需要鎖），
+# 路由以樣板路徑（/read/{id}）為標籤，標籤數量固定，可在正式環境常駐
+# =============================
+
+import bisect
+import time
+
+import cache
+
+# 預設 histogram 區間（秒）
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 所有指標（依建立順序輸出）
+registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        registry.append(self)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.name, _labels(self.labelnames, key), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self._samples():
+            lines.append(f"{name}{labels} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, value, *labels):
+        # 鏡像其他元件自行累計的總數（連線池、快取統計），值只會遞增
+        self._values[labels] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            # [各區間計數（最後一格為 +Inf）, 總和, 次數]
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def _samples(self):
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket", _labels(self.labelnames, key, [le]), cumulative
+            yield f"{self.name}_sum", _labels(self.labelnames, key), total
+            yield f"{self.name}_count", _labels(self.labelnames, key), count
+
+
+# ---------------------------------
+# 指標定義
+# ---------------------------------
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP 請求處理時間（含回應傳送）", ("method", "route")
+)
+REQUESTS = Counter("http_requests_total", "HTTP 請求數", ("method", "route", "status"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "處理中的 HTTP 請求數")
+
+QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "jobs.py SQL 執行時間", ("function", "statement")
+)
+QUERY_ROWS = Counter("db_query_rows_total", "jobs.py SQL 回傳或影響的資料列數", ("function", "statement"))
+QUERY_PIPELINED = Counter(
+    "db_query_pipelined_total", "以 pipeline 送出的 SQL 數（無法個別計時）", ("function", "statement")
+)
+
+POOL_WAIT_SECONDS = Histogram("db_pool_wait_seconds", "每個請求等待連線池連線的時間")
+POOL_SIZE = Gauge("db_pool_connections", "連線池連線數", ("state",))
+POOL_WAITING = Gauge("db_pool_requests_waiting", "正在排隊等待連線的請求數")
+POOL_ERRORS = Counter("db_pool_requests_errors_total", "取得連線失敗次數")
+
+TEMPLATE_SECONDS = Histogram("template_render_seconds", "Jinja2 模板渲染時間", ("template",))
+
+CACHE_LOOKUPS = Counter("cache_lookups_total", "快取查詢次數", ("cache", "result"))
+CACHE_SIZE = Gauge("cache_entries", "快取目前筆數", ("cache",))
+
+
+# ---------------------------------
+# 記錄函式
+# ---------------------------------
+def observeQuery(name, seconds, rows, pipelined=False):
+    # 敘述名稱如 "placeBid.insert"，第一段即 jobs.py 函式名稱
+    function = name.split(".", 1)[0].split("[", 1)[0]
+    if pipelined:
+        QUERY_PIPELINED.inc(function, name)
+        return
+    QUERY_SECONDS.observe(seconds, function, name)
+    if rows and rows > 0:
+        QUERY_ROWS.inc(function, name, amount=rows)
+
+
+def observePool(stats):
+    # 由 db.poolStats() 的結果更新連線池指標（於 /metrics 輸出前呼叫）
+    if not stats.get("open"):
+        return
+    POOL_SIZE.set(stats["in_use"], "in_use")
+    POOL_SIZE.set(stats["available"], "available")
+    POOL_WAITING.set(stats["waiting"])
+    POOL_ERRORS.set(stats["requests_errors"])
+
+
+def _observeCaches():
+    for name, stats in cache.allStats().items():
+        CACHE_LOOKUPS.set(stats["hits"], name, "hit")
+        CACHE_LOOKUPS.set(stats["misses"], name, "miss")
+        CACHE_SIZE.set(stats["size"], name)
+
+
+def render():
+    _observeCaches()
+    lines = []
+    for metric in registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+def instrumentTemplates(templates):
+    """包裝 Jinja2Templates.TemplateResponse，記錄每個模板的渲染時間。"""
+    original = templates.TemplateResponse
+
+    def TemplateResponse(*args, **kwargs):
+        name = kwargs.get("name") or next((a for a in args if isinstance(a, str)), "unknown")
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            TEMPLATE_SECONDS.observe(time.perf_counter() - start, name)
+
+    templates.TemplateResponse = TemplateResponse
+    return templates
+
+
+# ---------------------------------
+# ASGI middleware
+# ---------------------------------
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def sendWrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, sendWrapper)
+        finally:
+            IN_FLIGHT.dec()
+            # 路由比對後 FastAPI 會把 route 放進 scope；以樣板路徑為標籤避免標籤爆量
+            route = getattr(scope.get("route"), "path", None) or "other"
+            method = scope["method"]
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method, route)
+            REQUESTS.inc(method, route, str(status))
@@ -0,0 +1,311 @@
+# migrate.py
+# =============================
+# 資料庫 Schema 版本管理 (Migrations)
+# =============================
+# 用法：
+#   python migrate.py up                 套用尚未執行的 migrations/NNNN_*.sql
+#   python migrate.py status             列出每個版本是否已套用
+#   python migrate.py check [--min-rows N]
+#       對 jobs.py 的每個查詢執行 EXPLAIN，
+#       若在資料列數 >= N 的資料表上出現 Seq Scan 則以結束碼 1 失敗
+#
+# - 每個 migration 在獨立交易中執行，失敗時整個版本回滾
+# - schema_migrations 記錄已套用的版本與檔案 checksum，檔案被改動時 status 會提示
+# - 以 advisory lock 避免多個程序同時執行
+# =============================
+
+import argparse
+import asyncio
+import hashlib
+import inspect
+import os
+import re
+import sys
+import types
+
+import psycopg
+from psycopg.rows import dict_row
+
+import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_FILENAME = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+_LOCK_ID = 1141_0001  # pg_advisory_lock 使用的固定鍵
+
+
+# ---------------------------------
+# migration 檔案與版本紀錄
+# ---------------------------------
+def discover():
+    # 依版本號排序回傳 [(version, name, path, checksum)]
+    found = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        m = _FILENAME.match(filename)
+        if not m:
+            continue
+        path = os.path.join(MIGRATIONS_DIR, filename)
+        with open(path, "rb") as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        found.append((int(m.group(1)), m.group(2), path, checksum))
+    return found
+
+
+async def _ensureTable(conn):
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version     INTEGER PRIMARY KEY,
+            name        TEXT NOT NULL,
+            checksum    TEXT NOT NULL,
+            applied_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    await conn.commit()
+
+
+async def _applied(conn):
+    cur = await conn.execute("SELECT version, name, checksum, applied_at FROM schema_migrations;")
+    return {row["version"]: row for row in await cur.fetchall()}
+
+
+async def up(conn):
+    await _ensureTable(conn)
+    await conn.execute("SELECT pg_advisory_lock(%s);", (_LOCK_ID,))
+    await conn.commit()
+    try:
+        applied = await _applied(conn)
+        await conn.commit()
+        pending = [m for m in discover() if m[0] not in applied]
+        if not pending:
+            print("✅ 資料庫已是最新版本")
+            return 0
+        for version, name, path, checksum in pending:
+            with open(path, encoding="utf-8") as f:
+                sql = f.read()
+            try:
+                async with conn.transaction():
+                    # 無參數時 psycopg 允許一次執行多個敘述
+                    await conn.execute(sql)
+                    await conn.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s);",
+                        (version, name, checksum)
+                    )
+            except psycopg.Error as e:
+                print(f"❌ {version:04d}_{name} 失敗：{e}")
+                return 1
+            print(f"⬆️  {version:04d}_{name}")
+        return 0
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock(%s);", (_LOCK_ID,))
+        await conn.commit()
+
+
+async def status(conn):
+    await _ensureTable(conn)
+    applied = await _applied(conn)
+    for version, name, path, checksum in discover():
+        row = applied.get(version)
+        if not row:
+            state = "pending"
+        elif row["checksum"] != checksum:
+            state = f"applied {row['applied_at']:%Y-%m-%d %H:%M}（⚠️ 檔案已被修改）"
+        else:
+            state = f"applied {row['applied_at']:%Y-%m-%d %H:%M}"
+        print(f"{version:04d}_{name:<30} {state}")
+    return 0
+
+
+# ---------------------------------
+# check：EXPLAIN jobs.py 的所有查詢
+# ---------------------------------
+class _Row(dict):
+    # 假資料列：任何欄位都回傳 0，讓 DAL 函式能走完流程
+    def __missing__(self, key):
+        return 0
+
+
+class _RecordingCursor:
+    # statements.execute 會檢查是否處於 pipeline 模式
+    pgconn = types.SimpleNamespace(pipeline_status=0)
+
+    def __init__(self, log):
+        self.log = log
+        self.rowcount = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None, **kwargs):
+        self.log.append((sql, params))
+
+    async def fetchone(self):
+        return _Row()
+
+    async def fetchall(self):
+        return []
+
+
+class _RecordingPipeline:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def sync(self):
+        pass
+
+
+class _RecordingConn:
+    """只記錄 SQL 與參數、不連線資料庫的假連線，用來收集 jobs.py 送出的查詢。"""
+
+    def __init__(self):
+        self.log = []
+
+    def cursor(self, *args, **kwargs):
+        return _RecordingCursor(self.log)
+
+    def pipeline(self):
+        return _RecordingPipeline()
+
+    async def execute(self, sql, params=None, **kwargs):
+        self.log.append((sql, params))
+        return _RecordingCursor(self.log)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+def _checkCalls(jobs):
+    # 每個 jobs.py 函式的代表性呼叫（包含分頁的不同分支）
+    return {
+        "getJobList": [lambda c: jobs.getJobList(c),
+                       lambda c: jobs.getJobList(c, after=1),
+                       lambda c: jobs.getJobList(c, before=1)],
+        "getJobsByStatus": [lambda c: jobs.getJobsByStatus(c, "新工作"),
+                            lambda c: jobs.getJobsByStatus(c, "新工作", after=1),
+                            lambda c: jobs.getJobsByStatus(c, "新工作", before=1)],
+        "getJobsByBudget": [lambda c: jobs.getJobsByBudget(c, None, 100, None),
+                            lambda c: jobs.getJobsByBudget(c, "新工作", 100, 1000, after=1),
+                            lambda c: jobs.getJobsByBudget(c, None, None, 1000, before=1)],
+        "searchJobs": [lambda c: jobs.searchJobs(c, "網站設計", "新工作", 0, 100000)],
+        "getJob": [lambda c: jobs.getJob(c, 1)],
+        "addJob": [lambda c: jobs.addJob(c, "t", "c", 100, 1)],
+        "deleteJob": [lambda c: jobs.deleteJob(c, 1, 1)],
+        "getJobsByClient": [lambda c: jobs.getJobsByClient(c, 1),
+                            lambda c: jobs.getJobsByClient(c, 1, after=1),
+                            lambda c: jobs.getJobsByClient(c, 1, before=1)],
+        "getJobsByFreelancer": [lambda c: jobs.getJobsByFreelancer(c, 1),
+                                lambda c: jobs.getJobsByFreelancer(c, 1, after=1),
+                                lambda c: jobs.getJobsByFreelancer(c, 1, before=1)],
+        "getUserJobStats": [lambda c: jobs.getUserJobStats(c, 1, "client")],
+        "getAvailableJobs": [lambda c: jobs.getAvailableJobs(c)],
+        "assignFreelancer": [lambda c: jobs.assignFreelancer(c, 1, 1, 100)],
+        "getDeliverables": [lambda c: jobs.getDeliverables(c, 1)],
+        "requestJob": [lambda c: jobs.requestJob(c, 1, 1)],
+        "confirmJob": [lambda c: jobs.confirmJob(c, 1, 1)],
+        "completeJob": [lambda c: jobs.completeJob(c, 1, 1)],
+        "rejectJob": [lambda c: jobs.rejectJob(c, 1, 1, "r")],
+        "getDeliverable": [lambda c: jobs.getDeliverable(c, 1)],
+        "addDeliverable": [lambda c: jobs.addDeliverable(c, 1, "uploads/x", "x", 1)],
+        "getBids": [lambda c: jobs.getBids(c, 1)],
+        "placeBid": [lambda c: jobs.placeBid(c, 1, 1, 1)],
+        "chooseBid": [lambda c: jobs.chooseBid(c, 1, 1)],
+        "updateJob": [lambda c: jobs.updateJob(c, 1, "t", "c", 100),
+                      lambda c: jobs.updateJob(c, 1, "t", "c", 100, "uploads/x", "x")],
+        "getJobDetail": [lambda c: jobs.getJobDetail(c, 1)],
+        "getCachedJobDetail": [],  # 與 getJobDetail 相同的查詢
+        "notifyJob": [lambda c: jobs.notifyJob(c.cursor(), 1, "status", "進行中")],
+        "apiListJobs": [lambda c: jobs.apiListJobs(c, list(jobs.API_FIELDS)),
+                        lambda c: jobs.apiListJobs(c, status="新工作", after=1)],
+        "apiGetJobs": [lambda c: jobs.apiGetJobs(c, [1, 2], list(jobs.API_FIELDS))],
+    }
+
+
+async def collectQueries():
+    import jobs
+
+    calls = _checkCalls(jobs)
+    dal = {
+        name for name, fn in inspect.getmembers(jobs, inspect.iscoroutinefunction)
+        if not name.startswith("_") and fn.__module__ == jobs.__name__
+    }
+    for name in sorted(dal - calls.keys()):
+        print(f"⚠️  check 尚未涵蓋 jobs.{name}，請在 migrate._checkCalls 補上")
+
+    queries = []
+    for name, variants in calls.items():
+        for call in variants:
+            conn = _RecordingConn()
+            await call(conn)
+            queries += [(name, sql, params) for sql, params in conn.log]
+    return queries
+
+
+def _seqScans(plan):
+    # 走訪執行計畫樹，找出所有 Seq Scan 的資料表
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found += _seqScans(child)
+    return found
+
+
+async def check(conn, min_rows):
+    cur = await conn.execute(
+        "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace;"
+    )
+    sizes = {row["relname"]: row["reltuples"] for row in await cur.fetchall()}
+
+    failures = 0
+    for name, sql, params in await collectQueries():
+        statement = sql.strip().rstrip(";")
+        try:
+            # EXPLAIN 不含 ANALYZE，UPDATE / DELETE 不會真的執行
+            cur = await conn.execute("EXPLAIN (FORMAT JSON) " + statement, params)
+            plan = (await cur.fetchone())["QUERY PLAN"][0]["Plan"]
+        except psycopg.Error as e:
+            await conn.rollback()
+            print(f"❌ {name}: EXPLAIN 失敗：{e}")
+            failures += 1
+            continue
+        large = [t for t in _seqScans(plan) if sizes.get(t, 0) >= min_rows]
+        if large:
+            failures += 1
+            print(f"❌ {name}: Seq Scan on {', '.join(sorted(set(large)))}")
+        else:
+            print(f"✅ {name}")
+    await conn.rollback()
+
+    if failures:
+        print(f"{failures} 個查詢未通過（資料列數門檻 {min_rows}）")
+        return 1
+    return 0
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="資料庫 schema migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("up", help="套用尚未執行的 migrations")
+    sub.add_parser("status", help="列出 migrations 狀態")
+    p_check = sub.add_parser("check", help="EXPLAIN jobs.py 的查詢並檢查 Seq Scan")
+    p_check.add_argument("--min-rows", type=int, default=10000,
+                         help="資料列數達此門檻的資料表不允許 Seq Scan（預設 10000）")
+    args = parser.parse_args(argv)
+
+    async with await psycopg.AsyncConnection.connect(db.DATABASE_URL, row_factory=dict_row) as conn:
+        if args.command == "up":
+            return await up(conn)
+        if args.command == "status":
+            return await status(conn)
+        return await check(conn, args.min_rows)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,52 @@
+-- migrations/0001_base.sql
+-- 基本資料表：users、jobs、bids、deliverables、password_reset_tokens
+-- 已存在的資料表不會被修改（IF NOT EXISTS），既有資料庫可直接套用
+-- 由 python migrate.py up 套用
+
+CREATE TABLE IF NOT EXISTS users (
+    id          SERIAL PRIMARY KEY,
+    username    TEXT NOT NULL,
+    password    TEXT NOT NULL,
+    role        TEXT NOT NULL,                 -- 甲方 / 乙方
+    email       TEXT,
+    created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id                SERIAL PRIMARY KEY,
+    title             TEXT NOT NULL,
+    content           TEXT,
+    status            TEXT NOT NULL DEFAULT '新工作',  -- 新工作 / 待確認 / 進行中 / 上傳成果 / 已完成
+    budget            INTEGER NOT NULL DEFAULT 0,
+    price             INTEGER,
+    client_id         INTEGER REFERENCES users(id),
+    freelancer_id     INTEGER REFERENCES users(id),
+    requirement_file  TEXT,
+    created_at        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS bids (
+    id          SERIAL PRIMARY KEY,
+    job_id      INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    bidder_id   INTEGER NOT NULL REFERENCES users(id),
+    amount      INTEGER NOT NULL,
+    created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS deliverables (
+    id             SERIAL PRIMARY KEY,
+    job_id         INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    file_path      TEXT NOT NULL,
+    uploaded_by    INTEGER REFERENCES users(id),
+    uploaded_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    reject_reason  TEXT
+);
+
+CREATE TABLE IF NOT EXISTS password_reset_tokens (
+    id          SERIAL PRIMARY KEY,
+    user_id     INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    token       TEXT NOT NULL,
+    expires_at  TIMESTAMP NOT NULL,
+    created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
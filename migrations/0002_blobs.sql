@@ -0,0 +1,15 @@
+-- migrations/0002_blobs.sql
+-- 內容定址儲存：blobs 資料表與原始檔名欄位
+-- 由 python migrate.py up 套用
+
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256      TEXT PRIMARY KEY,              -- 內容 SHA-256（hex）
+    size        BIGINT NOT NULL,               -- 檔案大小（位元組）
+    path        TEXT NOT NULL UNIQUE,          -- uploads/blobs/ab/cd/<sha256>
+    refcount    INTEGER NOT NULL DEFAULT 0,    -- 被 jobs / deliverables 引用的次數
+    created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 下載時仍顯示使用者上傳的原始檔名
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS requirement_name TEXT;
+ALTER TABLE deliverables ADD COLUMN IF NOT EXISTS file_name TEXT;
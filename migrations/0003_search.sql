@@ -0,0 +1,34 @@
+-- migrations/0003_search.sql
+-- 工作全文搜尋：以二元語法 (bigram) 建立 tsvector，中文與英文皆可做子字串搜尋
+-- 由 python migrate.py up 套用
+
+-- 將文字轉為小寫、去除空白與標點後，切成相鄰兩字的 bigram 陣列
+-- 例："網站設計" -> {網站, 站設, 設計}
+CREATE OR REPLACE FUNCTION jobs_bigrams(doc text) RETURNS text[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(DISTINCT g), '{}')
+    FROM (SELECT regexp_replace(lower(coalesce(doc, '')), '[[:space:][:punct:]]+', '', 'g') AS s) t
+    CROSS JOIN LATERAL generate_series(1, greatest(length(t.s) - 1, 1)) AS i
+    CROSS JOIN LATERAL substr(t.s, i, 2) AS g
+    WHERE g <> ''
+$$;
+
+-- 將搜尋字串轉為 tsquery：所有 bigram 皆須出現（AND）；單一字元時做前綴比對
+CREATE OR REPLACE FUNCTION jobs_search_query(q text) RETURNS tsquery
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN length(t.s) = 0 THEN NULL
+        WHEN length(t.s) = 1 THEN ('''' || t.s || ''':*')::tsquery
+        ELSE (SELECT string_agg('''' || g || '''', ' & ') FROM unnest(jobs_bigrams(t.s)) AS g)::tsquery
+    END
+    FROM (SELECT regexp_replace(lower(coalesce(q, '')), '[[:space:][:punct:]]+', '', 'g') AS s) t
+$$;
+
+-- 標題權重 A、內容權重 B，供 ts_rank 排序
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS search_vec tsvector
+    GENERATED ALWAYS AS (
+        setweight(array_to_tsvector(jobs_bigrams(title)), 'A') ||
+        setweight(array_to_tsvector(jobs_bigrams(content)), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS jobs_search_vec_idx ON jobs USING GIN (search_vec);
@@ -0,0 +1,25 @@
+-- migrations/0004_hot_query_indexes.sql
+-- jobs.py、sessionLogin.py 常用查詢所需的索引
+-- 由 python migrate.py up 套用；可用 python migrate.py check 驗證執行計畫
+
+-- getJobsByStatus / getAvailableJobs：WHERE status = ? ORDER BY id（keyset 分頁）
+CREATE INDEX IF NOT EXISTS jobs_status_id_idx ON jobs (status, id);
+
+-- getJobsByClient / deleteJob：WHERE client_id = ? ORDER BY id
+CREATE INDEX IF NOT EXISTS jobs_client_id_idx ON jobs (client_id, id);
+
+-- getJobsByFreelancer：WHERE freelancer_id = ? ORDER BY id
+CREATE INDEX IF NOT EXISTS jobs_freelancer_id_idx ON jobs (freelancer_id, id);
+
+-- getBids：WHERE job_id = ? ORDER BY amount DESC
+CREATE INDEX IF NOT EXISTS bids_job_amount_idx ON bids (job_id, amount DESC);
+
+-- getDeliverable：WHERE job_id = ? ORDER BY id DESC LIMIT 1
+CREATE INDEX IF NOT EXISTS deliverables_job_id_idx ON deliverables (job_id, id DESC);
+
+-- 登入 / 註冊：username 唯一；忘記密碼：依 email 查詢
+CREATE UNIQUE INDEX IF NOT EXISTS users_username_key ON users (username);
+CREATE INDEX IF NOT EXISTS users_email_idx ON users (email);
+
+-- 重設密碼：依 token 查詢
+CREATE UNIQUE INDEX IF NOT EXISTS password_reset_tokens_token_key ON password_reset_tokens (token);
@@ -0,0 +1,12 @@
+-- migrations/0005_bids_unique_bidder.sql
+-- 每個乙方對同一案件只保留一筆報價，讓 jobs.placeBid 以 INSERT ... ON CONFLICT 單一敘述出價
+-- 由 python migrate.py up 套用
+
+-- 舊版 placeBid 的 DELETE + INSERT 在並行時可能留下重複報價：保留每組最新的一筆
+DELETE FROM bids b
+USING bids newer
+WHERE newer.job_id = b.job_id
+  AND newer.bidder_id = b.bidder_id
+  AND newer.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS bids_job_bidder_key ON bids (job_id, bidder_id);
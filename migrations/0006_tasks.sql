@@ -0,0 +1,29 @@
+-- migrations/0006_tasks.sql
+-- 背景工作佇列（taskqueue.py / worker.py）與上傳檔案的處理結果欄位
+-- 由 python migrate.py up 套用
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id            BIGSERIAL PRIMARY KEY,
+    kind          TEXT NOT NULL,                     -- 對應 taskqueue.handler 登錄的名稱
+    payload       JSONB NOT NULL DEFAULT '{}',
+    status        TEXT NOT NULL DEFAULT 'queued',    -- queued / running / done / dead
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    max_attempts  INTEGER NOT NULL DEFAULT 5,
+    run_at        TIMESTAMPTZ NOT NULL DEFAULT now(),  -- 重試時延後執行
+    locked_by     TEXT,                              -- 執行中的 worker
+    locked_at     TIMESTAMPTZ,
+    last_error    TEXT,
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- worker 取工作：WHERE status = 'queued' AND run_at <= now() ORDER BY run_at, id ... SKIP LOCKED
+CREATE INDEX IF NOT EXISTS tasks_queued_idx ON tasks (run_at, id) WHERE status = 'queued';
+
+-- 回收逾時的工作：WHERE status = 'running' AND locked_at < ?
+CREATE INDEX IF NOT EXISTS tasks_running_idx ON tasks (locked_at) WHERE status = 'running';
+
+-- 上傳後處理的結果（以 blob 為單位，內容相同的檔案只處理一次）
+ALTER TABLE blobs ADD COLUMN IF NOT EXISTS mime_type TEXT;
+ALTER TABLE blobs ADD COLUMN IF NOT EXISTS page_count INTEGER;
+ALTER TABLE blobs ADD COLUMN IF NOT EXISTS processed_at TIMESTAMPTZ;
@@ -0,0 +1,6 @@
+-- migrations/0007_thumbnails.sql
+-- 預覽縮圖（thumbnails.py）：是否已產生縮圖
+-- 由 python migrate.py up 套用
+
+-- NULL = 尚未處理；true = www/thumbs 下已有所有尺寸；false = 不支援的類型或無法解析
+ALTER TABLE blobs ADD COLUMN IF NOT EXISTS has_thumbnail BOOLEAN;
@@ -0,0 +1,79 @@
+-- migrations/0008_user_job_stats.sql
+-- 每位使用者的案件統計（控制台標題列）：各狀態的案件數與預算 / 成交價總和
+-- 由 jobs 上的 trigger 逐筆增減維護，任何寫入路徑（jobs.py、routes/upload.py、手動 SQL）都會反映
+-- 由 python migrate.py up 套用
+
+CREATE TABLE IF NOT EXISTS user_job_stats (
+    user_id     INTEGER NOT NULL,
+    side        TEXT NOT NULL,                 -- client（甲方發案）/ freelancer（乙方接案）
+    status      TEXT NOT NULL,
+    job_count   INTEGER NOT NULL DEFAULT 0,
+    budget_sum  BIGINT NOT NULL DEFAULT 0,
+    price_sum   BIGINT NOT NULL DEFAULT 0,     -- price 為 NULL 時以 0 計
+    PRIMARY KEY (user_id, side, status)
+);
+
+-- 對一列統計加上增量（不存在時新增）
+CREATE OR REPLACE FUNCTION user_job_stats_add(
+    p_user INTEGER, p_side TEXT, p_status TEXT, p_count INTEGER, p_budget BIGINT, p_price BIGINT
+) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF p_user IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO user_job_stats AS s (user_id, side, status, job_count, budget_sum, price_sum)
+    VALUES (p_user, p_side, p_status, p_count, p_budget, p_price)
+    ON CONFLICT (user_id, side, status) DO UPDATE
+    SET job_count = s.job_count + EXCLUDED.job_count,
+        budget_sum = s.budget_sum + EXCLUDED.budget_sum,
+        price_sum = s.price_sum + EXCLUDED.price_sum;
+END
+$$;
+
+-- 舊值扣除、新值加上；與統計無關的欄位（標題、內容等）變更時不做任何事
+CREATE OR REPLACE FUNCTION jobs_update_user_stats() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND OLD.client_id IS NOT DISTINCT FROM NEW.client_id
+        AND OLD.freelancer_id IS NOT DISTINCT FROM NEW.freelancer_id
+        AND OLD.status IS NOT DISTINCT FROM NEW.status
+        AND OLD.budget IS NOT DISTINCT FROM NEW.budget
+        AND OLD.price IS NOT DISTINCT FROM NEW.price THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM user_job_stats_add(OLD.client_id, 'client', OLD.status, -1, -OLD.budget, -COALESCE(OLD.price, 0));
+        PERFORM user_job_stats_add(OLD.freelancer_id, 'freelancer', OLD.status, -1, -OLD.budget, -COALESCE(OLD.price, 0));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM user_job_stats_add(NEW.client_id, 'client', NEW.status, 1, NEW.budget, COALESCE(NEW.price, 0));
+        PERFORM user_job_stats_add(NEW.freelancer_id, 'freelancer', NEW.status, 1, NEW.budget, COALESCE(NEW.price, 0));
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- 回填期間擋住 jobs 的寫入，避免統計與 trigger 之間漏算
+LOCK TABLE jobs IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS jobs_user_stats ON jobs;
+
+DELETE FROM user_job_stats;
+
+INSERT INTO user_job_stats (user_id, side, status, job_count, budget_sum, price_sum)
+SELECT client_id, 'client', status, COUNT(*), SUM(budget), SUM(COALESCE(price, 0))
+FROM jobs
+WHERE client_id IS NOT NULL
+GROUP BY client_id, status
+UNION ALL
+SELECT freelancer_id, 'freelancer', status, COUNT(*), SUM(budget), SUM(COALESCE(price, 0))
+FROM jobs
+WHERE freelancer_id IS NOT NULL
+GROUP BY freelancer_id, status;
+
+CREATE TRIGGER jobs_user_stats
+    AFTER INSERT OR DELETE OR UPDATE OF client_id, freelancer_id, status, budget, price ON jobs
+    FOR EACH ROW EXECUTE FUNCTION jobs_update_user_stats();
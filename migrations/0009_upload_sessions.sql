@@ -0,0 +1,25 @@
+-- migrations/0009_upload_sessions.sql
+-- 可續傳的分段上傳（uploadSessions.py / routes/upload.py 的 /api/uploads）
+-- 由 python migrate.py up 套用
+
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id           TEXT PRIMARY KEY,                  -- 隨機 token，同時作為暫存檔名
+    job_id       INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    uploaded_by  INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    file_name    TEXT NOT NULL,
+    size         BIGINT NOT NULL,
+    chunk_size   INTEGER NOT NULL,
+    sha256       TEXT,                              -- 用戶端宣告的檢查碼，完成時比對
+    created_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    expires_at   TIMESTAMPTZ NOT NULL
+);
+
+-- 清除過期 session：WHERE expires_at < now()
+CREATE INDEX IF NOT EXISTS upload_sessions_expires_idx ON upload_sessions (expires_at);
+
+-- 已寫入的區塊（第 chunk_index 塊 = offset chunk_index * chunk_size）
+CREATE TABLE IF NOT EXISTS upload_chunks (
+    session_id   TEXT NOT NULL REFERENCES upload_sessions(id) ON DELETE CASCADE,
+    chunk_index  INTEGER NOT NULL,
+    PRIMARY KEY (session_id, chunk_index)
+);
@@ -0,0 +1,147 @@
+# processing.py
+# =============================
+# 上傳後處理 (Background processing handlers)
+# =============================
+# 功能說明：
+# - 由 worker.py 執行（taskqueue 登錄的 handler），不在上傳請求中進行
+# - deliverable.process / requirement.process：檢查成果檔案與需求文件
+#   1. 重新計算 SHA-256，確認檔案與 blobs 紀錄一致（不一致時拋出例外 → 重試 / dead）
+#   2. 由檔頭判斷實際檔案類型（不相信副檔名）
+#   3. PDF 計算頁數
+#   4. 圖片與 PDF 產生預覽縮圖（thumbnails.py）
+#   5. 結果寫入 blobs（mime_type、page_count、processed_at、has_thumbnail），同內容的檔案只處理一次
+#   6. NOTIFY job_events（type = file），案件詳情頁即時更新
+# - 檔案讀取在 thread 中執行，不阻塞 worker 的 event loop
+# =============================
+
+import asyncio
+import hashlib
+import mmap
+import os
+import re
+
+import jobs
+import statements
+import storage
+import taskqueue
+import thumbnails
+
+# 檔頭 -> MIME 類型
+SIGNATURES = (
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"PK\x05\x06", "application/zip"),  # 空的 zip
+)
+
+_PDF_PAGE = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+_PDF_COUNT = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b", re.S)
+
+
+def sniffMime(head):
+    for magic, mime in SIGNATURES:
+        if head.startswith(magic):
+            return mime
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # 檔頭讀取可能切在多位元組字元中間
+        if e.start < len(head) - 3:
+            return "application/octet-stream"
+    return "text/plain"
+
+
+def countPdfPages(path):
+    """
+    以標準函式庫估算 PDF 頁數：計算 /Type /Page 物件；
+    頁面物件被壓縮在 object stream 內時改用頁樹根節點的 /Count。
+    無法判斷時回傳 None。
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pages = sum(1 for _ in _PDF_PAGE.finditer(data))
+            if pages:
+                return pages
+            counts = [int(a or b) for a, b in _PDF_COUNT.findall(data)]
+            return max(counts) if counts else None
+
+
+def inspectFile(path, chunk_size=storage.CHUNK_SIZE):
+    # 讀一次檔案：雜湊、大小、檔頭；PDF 另外計算頁數
+    hasher = hashlib.sha256()
+    size = 0
+    head = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            if not head:
+                head = chunk[:512]
+            hasher.update(chunk)
+            size += len(chunk)
+    mime = sniffMime(head)
+    pages = countPdfPages(path) if mime == "application/pdf" else None
+    return {"sha256": hasher.hexdigest(), "size": size, "mime_type": mime, "page_count": pages}
+
+
+statements.register("processing.blob", """
+        SELECT sha256, size, path, mime_type, processed_at, has_thumbnail
+        FROM blobs
+        WHERE path = %s;
+        """)
+
+statements.register("processing.saveBlob", """
+        UPDATE blobs
+        SET mime_type = %s, page_count = %s, processed_at = now()
+        WHERE sha256 = %s AND processed_at IS NULL;
+        """)
+
+statements.register("processing.saveThumbnail", """
+        UPDATE blobs
+        SET has_thumbnail = %s
+        WHERE sha256 = %s AND has_thumbnail IS NULL;
+        """)
+
+
+async def processFile(conn, job_id, path):
+    """
+    檢查並產生縮圖（每個 blob 只做一次），完成後通知案件詳情頁。
+    """
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "processing.blob", (path,))
+        blob = await cur.fetchone()
+        if blob is None:
+            # 檔案已被刪除或為舊版（非 blob）路徑，不需處理
+            return
+
+        mime_type = blob["mime_type"]
+        if blob["processed_at"] is None:
+            info = await asyncio.to_thread(inspectFile, blob["path"])
+            if info["sha256"] != blob["sha256"] or info["size"] != blob["size"]:
+                raise ValueError(
+                    f"blob {blob['sha256']} 內容不符：sha256={info['sha256']} size={info['size']}"
+                )
+            mime_type = info["mime_type"]
+            await statements.execute(
+                cur, "processing.saveBlob", (mime_type, info["page_count"], blob["sha256"])
+            )
+
+        if blob["has_thumbnail"] is None:
+            created = await asyncio.to_thread(thumbnails.generate, blob["path"], blob["sha256"], mime_type)
+            await statements.execute(cur, "processing.saveThumbnail", (created, blob["sha256"]))
+
+        await jobs.notifyJob(cur, job_id, "file")
+
+
+@taskqueue.handler("deliverable.process")
+async def processDeliverable(conn, payload):
+    await processFile(conn, payload["job_id"], payload["path"])
+
+
+@taskqueue.handler("requirement.process")
+async def processRequirement(conn, payload):
+    await processFile(conn, payload["job_id"], payload["path"])
@@ -0,0 +1,186 @@
+# ratelimit.py
+# =============================
+# 請求限流 (Token-bucket rate limiting)
+# =============================
+# 功能說明：
+# - 依路由設定 token bucket：每個登入者（session 的 user_id）一組、每個 IP 一組
+# - 超過限制時立即回傳 429 + Retry-After，不進入路由、不佔用資料庫連線
+# - 上傳另外限制同時進行的數量（全站），滿了同樣直接回 429
+# - 路徑含變數的路由（分段上傳的 /api/uploads/{id}）以前綴比對，同一前綴共用 bucket
+# - bucket 存放在有容量上限的 LRU 中，大量不同 IP 也不會讓記憶體無限成長
+#   （被淘汰的 bucket 下次視為全滿，只會比較寬鬆）
+# - 需放在 SessionMiddleware 之內（main.py 先加入本 middleware）才能讀到 session
+# =============================
+
+import math
+import os
+import time
+from collections import OrderedDict
+
+from starlette.responses import JSONResponse
+
+import metrics
+
+# RATE_LIMIT_ENABLED=0 可整個停用（例如負載測試）
+ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") != "0"
+
+# 位於反向代理之後時，以 X-Forwarded-For 判斷用戶端 IP
+TRUST_PROXY = os.environ.get("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+
+# 前面有幾層受信任的 proxy：取 X-Forwarded-For 從右邊數來第 N 個位址。
+# 最左邊的位址由用戶端自行填寫（nginx 的 proxy_add_x_forwarded_for 只在後面附加），不可信任
+TRUSTED_HOPS = max(1, int(os.environ.get("RATE_LIMIT_TRUSTED_HOPS", 1)))
+
+# 每種 bucket 最多保留的數量
+MAX_BUCKETS = int(os.environ.get("RATE_LIMIT_MAX_BUCKETS", 10000))
+
+# 同時進行中的上傳數上限
+MAX_CONCURRENT_UPLOADS = int(os.environ.get("RATE_LIMIT_UPLOADS", 8))
+
+# (method, path) -> {"user": (每秒補充數, 容量), "ip": (每秒補充數, 容量)}
+RULES = {
+    ("POST", "/bid"): {"user": (2, 10), "ip": (20, 60)},
+    ("POST", "/login"): {"ip": (1, 10)},
+    ("POST", "/register"): {"ip": (0.2, 5)},
+    ("POST", "/forgot"): {"ip": (0.1, 3)},
+    ("POST", "/api/upload"): {"user": (0.5, 5), "ip": (2, 20)},
+    ("POST", "/api/uploads"): {"user": (0.5, 5), "ip": (2, 20)},
+}
+
+# 路徑含變數的路由：(method, 路徑前綴) -> 規則；bucket 以前綴為鍵
+# （同一使用者的所有分段上傳 session 共用，一個大型檔案會有上百個區塊）
+PREFIX_RULES = {
+    ("PUT", "/api/uploads/"): {"user": (4, 32), "ip": (8, 64)},
+}
+
+# 佔用同時上傳數的路由（RULES 的路徑或 PREFIX_RULES 的前綴）
+UPLOAD_PATHS = {"/api/upload", "/api/uploads/"}
+
+REJECTED = metrics.Counter("rate_limited_total", "被限流拒絕的請求數", ("route", "reason"))
+
+
+class TokenBuckets:
+    def __init__(self, maxsize=MAX_BUCKETS):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # key -> [tokens, 上次更新時間]
+
+    def _refill(self, key, rate, capacity):
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [capacity, now]
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        return bucket
+
+    def wait(self, key, rate, capacity):
+        """
+        不取用 token，只回傳需要等待的秒數（0 表示目前可取用）。
+        """
+        bucket = self._refill(key, rate, capacity)
+        if bucket[0] >= 1:
+            return 0
+        return (1 - bucket[0]) / rate
+
+    def take(self, key, rate, capacity):
+        """
+        取用一個 token；成功回傳 0，否則回傳需要等待的秒數。
+        """
+        wait = self.wait(key, rate, capacity)
+        if not wait:
+            self._buckets[key][0] -= 1
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+buckets = TokenBuckets()
+_uploads = 0
+
+
+def clientIP(scope):
+    if TRUST_PROXY:
+        # 多個 X-Forwarded-For 標頭依序視為同一個清單
+        forwarded = [
+            address.strip()
+            for name, value in scope.get("headers", ())
+            if name == b"x-forwarded-for"
+            for address in value.decode("latin-1").split(",")
+            if address.strip()
+        ]
+        if len(forwarded) >= TRUSTED_HOPS:
+            return forwarded[-TRUSTED_HOPS]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def matchRule(method, path):
+    # 回傳 (route, rule)；route 為 bucket 與 metrics 使用的名稱
+    rule = RULES.get((method, path))
+    if rule is not None:
+        return path, rule
+    for (rule_method, prefix), rule in PREFIX_RULES.items():
+        if method == rule_method and path.startswith(prefix):
+            return prefix, rule
+    return path, None
+
+
+def _tooMany(retry_after):
+    return JSONResponse(
+        {"detail": "請求過於頻繁，請稍後再試"},
+        status_code=429,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class RateLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _uploads
+        if not ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route, rule = matchRule(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        # 1️⃣ token bucket：登入者與 IP 都要有 token
+        user_id = (scope.get("session") or {}).get("user_id")
+        keys = []
+        if "user" in rule and user_id is not None:
+            keys.append(("user", (route, "user", user_id), rule["user"]))
+        if "ip" in rule:
+            keys.append(("ip", (route, "ip", clientIP(scope)), rule["ip"]))
+        # 先檢查全部 bucket，都允許才一起扣：被 IP 限制擋下的請求不消耗登入者的額度
+        # （檢查與扣除之間沒有 await，不會與其他請求交錯）
+        for reason, key, (rate, capacity) in keys:
+            wait = buckets.wait(key, rate, capacity)
+            if wait:
+                REJECTED.inc(route, reason)
+                await _tooMany(wait)(scope, receive, send)
+                return
+        for reason, key, (rate, capacity) in keys:
+            buckets.take(key, rate, capacity)
+
+        # 2️⃣ 同時上傳數上限
+        if route not in UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+        if _uploads >= MAX_CONCURRENT_UPLOADS:
+            REJECTED.inc(route, "concurrency")
+            await _tooMany(1)(scope, receive, send)
+            return
+        _uploads += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _uploads -= 1
@@ -0,0 +1,80 @@
+# routes/apiV1.py
+# =============================
+# JSON API v1（行動裝置用戶端）
+# =============================
+# 功能：
+# - GET /api/v1/jobs?status=&after=&before=&limit=&fields=
+#     案件清單，keyset 分頁（回傳 next_after / prev_before 作為游標）
+# - GET /api/v1/jobs/batch?ids=1,2,3&fields=title,status,bids,deliverable
+#     依 id 批次取得案件，報價與最新成果在同一個查詢中取回（最多 jobs.MAX_BATCH 筆）
+# - GET /api/v1/jobs/{id}?fields=...
+# - fields= 以逗號分隔，只回傳要求的欄位（可用欄位見 jobs.API_FIELDS）；
+#   報價 / 成果的子查詢只在要求時執行
+# - bids / deliverable 欄位需登入
+# - 直接回傳 fastjson.JSONResponse（orjson 序列化），略過 FastAPI 的 jsonable_encoder
+# =============================
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from db import getDB
+import fastjson
+import jobs
+
+router = APIRouter(default_response_class=fastjson.JSONResponse)
+
+# 需登入才能取得的欄位
+PRIVATE_FIELDS = {"bids", "deliverable"}
+
+
+def _splitList(value):
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _fields(request, fields):
+    names = _splitList(fields)
+    if PRIVATE_FIELDS.intersection(names) and not request.session.get("user_id"):
+        raise HTTPException(status_code=403, detail="bids / deliverable 欄位需要登入")
+    try:
+        return jobs.apiFields(names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/jobs")
+async def list_jobs(
+    request: Request,
+    status: str | None = None,
+    after: int | None = None,
+    before: int | None = None,
+    limit: int = jobs.PAGE_SIZE,
+    fields: str | None = None,
+    conn=Depends(getDB)
+):
+    page = await jobs.apiListJobs(conn, _fields(request, fields), status, after, before, limit)
+    return fastjson.JSONResponse(page)
+
+
+@router.get("/jobs/batch")
+async def batch_jobs(
+    request: Request,
+    ids: str,
+    fields: str | None = None,
+    conn=Depends(getDB)
+):
+    try:
+        id_list = [int(i) for i in _splitList(ids)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids 必須是以逗號分隔的整數")
+    if not id_list:
+        raise HTTPException(status_code=400, detail="請提供 ids")
+    if len(id_list) > jobs.MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"一次最多 {jobs.MAX_BATCH} 筆")
+    return fastjson.JSONResponse(await jobs.apiGetJobs(conn, id_list, _fields(request, fields)))
+
+
+@router.get("/jobs/{job_id}")
+async def read_job(request: Request, job_id: int, fields: str | None = None, conn=Depends(getDB)):
+    result = await jobs.apiGetJobs(conn, [job_id], _fields(request, fields))
+    if not result["items"]:
+        raise HTTPException(status_code=404, detail="找不到案件")
+    return fastjson.JSONResponse(result["items"][0])
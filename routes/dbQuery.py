@@ -1,12 +1,15 @@
 from fastapi import APIRouter,Depends
-from db import getDB
+from db import getDB, poolStats
+import cache
+import jobs
 router = APIRouter()
 
 @router.get("/getUsers")
 #使用depends將取得的資料庫連線物件，當成參數注入read_items
 async def read_users(conn=Depends(getDB)):
 	async with conn.cursor() as cur:
-		await cur.execute("SELECT * FROM users;")
+		#不回傳 password 欄位
+		await cur.execute("SELECT id, username, role, email, created_at FROM users;")
 		rows = await cur.fetchall()
 		return {"items": rows}
 
@@ -14,7 +17,30 @@ async def read_users(conn=Depends(getDB)):
 async def read_user(name:str,conn=Depends(getDB)):
 	async with conn.cursor() as cur:
 		name = f"{name}%"
-		sql="SELECT * FROM users where name like %s"
+		sql="SELECT id, username, role, email, created_at FROM users where username like %s"
 		await cur.execute(sql,(name,))
 		rows = await cur.fetchall()
-		return {"items": rows}
\ No newline at end of file
+		return {"items": rows}
+
+#搜尋工作（標題 / 內容全文搜尋，可依狀態與預算篩選）
+@router.get("/searchJobs")
+async def search_jobs(
+	q:str,
+	status:str|None=None,
+	min_budget:int|None=None,
+	max_budget:int|None=None,
+	page:int=1,
+	limit:int=jobs.PAGE_SIZE,
+	conn=Depends(getDB)
+):
+	return await jobs.searchJobs(conn, q, status, min_budget, max_budget, page, limit)
+
+#連線池即時狀態，用於壓測時調整 min/max size
+@router.get("/poolStats")
+async def read_pool_stats():
+	return poolStats()
+
+#快取命中率統計（案件詳情等）
+@router.get("/cacheStats")
+async def read_cache_stats():
+	return cache.allStats()
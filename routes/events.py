@@ -0,0 +1,52 @@
+# routes/events.py
+# =============================
+# 即時更新串流 (Server-Sent Events)
+# =============================
+# 功能：
+# - GET /api/events?job=1&job=2[&bids=true]
+# - 訂閱指定案件的狀態變更；bids=true 時另外接收報價清單片段（案件詳情頁）
+# - 事件來源為 events.py 的 LISTEN 連線，串流本身不佔用資料庫連線
+# =============================
+
+import asyncio
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+
+import events
+
+router = APIRouter()
+
+# 一條串流最多訂閱的案件數（控制台頁面；模板中的 JS 也以同一個數字截斷）
+MAX_JOBS = 200
+# 沒有事件時送出心跳的間隔秒數，避免 proxy 關閉閒置連線
+HEARTBEAT = 15
+
+
+@router.get("/events")
+async def job_events(
+    request: Request,
+    job: list[int] = Query(...),
+    bids: bool = False
+):
+    sub = events.subscribe(job[:MAX_JOBS], request.session.get("role"), bids)
+
+    async def stream():
+        try:
+            # 斷線後瀏覽器 5 秒重新連線
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    kind, data = await asyncio.wait_for(sub.queue.get(), HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield events.formatSSE(kind, data)
+        finally:
+            events.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
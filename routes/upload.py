@@ -4,18 +4,28 @@
 # =============================
 # 功能：
 # - 安全地接收上傳檔案
-# - 儲存到 /www/uploads 目錄
+# - 以內容雜湊存入 blob 儲存區（相同檔案只存一份）
 # - 更新 deliverables 資料表
 # - 同步更新 jobs 狀態為「上傳成果」
+# - 檔案檢查（類型、頁數、雜湊）排入背景工作佇列，由 worker.py 處理
+# - /uploads：可續傳的分段上傳（uploadSessions.py），適用大型成果檔
+#     POST   /api/uploads                    建立 session（job_id、file_name、size、sha256）
+#     PUT    /api/uploads/{id}               以 Upload-Offset 標頭寫入一個區塊（可平行、不依順序）
+#     HEAD   /api/uploads/{id}               查詢 Upload-Offset；GET 另外回傳尚未上傳的區塊
+#     POST   /api/uploads/{id}/finalize      比對檢查碼並完成上傳（與 /upload 相同的資料庫更新）
+#     DELETE /api/uploads/{id}               取消上傳
 # =============================
 
-from fastapi import APIRouter, File, UploadFile, Form, Depends, HTTPException
+from fastapi import APIRouter, File, UploadFile, Form, Depends, HTTPException, Request, Response
 from fastapi.responses import RedirectResponse
 import os
 import re
 
-from db import getDB
+from db import getDB, getPool
+import fastjson
 import jobs  # ✅ 改成新的模組（取代 posts.py）
+import storage
+import uploadSessions
 
 router = APIRouter()
 
@@ -42,6 +52,7 @@ def safeFilename(filename: str):
 # =============================
 @router.post("/upload")
 async def upload_file(
+    request: Request,
     job_id: int = Form(...),
     uploadedFile: UploadFile = File(...),
     conn=Depends(getDB)
@@ -49,71 +60,130 @@ async def upload_file(
     """
     乙方上傳結案成果：
     - 檢查檔名
-    - 儲存檔案到 /www/uploads/
+    - 以內容雜湊儲存檔案（storage.storeBlob）
     - 寫入 deliverables 資料表
     - 更新 jobs.status = '上傳成果'
+    - 排入 deliverable.process 背景工作（檔案已落地即回應，不等待處理）
     """
 
-    # 1️⃣ 檢查與安全化檔名
+    uploaded_by = request.session.get("user_id")
+    if not uploaded_by:
+        raise HTTPException(status_code=403, detail="請先登入")
+
+    # 1️⃣ 檢查與安全化檔名（保留為下載時顯示的原始檔名）
     safe_name = safeFilename(uploadedFile.filename)
-    upload_dir = "www/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, safe_name)
-
-    # 2️⃣ 儲存檔案內容
-    contents = await uploadedFile.read()
-    with open(file_path, "wb") as f:
-        f.write(contents)
-
-    # 3️⃣ 儲存上傳紀錄 & 更新狀態
-    async with conn.cursor() as cur:
-        # 插入 deliverables 表
-        sql1 = """
-            INSERT INTO deliverables (job_id, file_path, uploaded_by)
-            VALUES (%s, %s, %s);
-        """
-        # 注意：uploaded_by 這裡暫時可改成假資料或從 session 傳入
-        uploaded_by = 1  # ⚠️ 之後改成 request.session["user_id"]
-        await cur.execute(sql1, (job_id, file_path, uploaded_by))
-
-        # 更新工作狀態
-        sql2 = """
-            UPDATE jobs
-            SET status = '上傳成果', updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s;
-        """
-        await cur.execute(sql2, (job_id,))
+
+    # 2️⃣ 串流儲存檔案內容；相同內容只增加引用次數，不重複寫檔
+    blob = await storage.storeBlob(conn, uploadedFile, storage.MAX_DELIVERABLE_SIZE)
+
+    # 3️⃣ 儲存上傳紀錄、更新狀態並排入背景處理（同一交易）
+    await jobs.addDeliverable(conn, job_id, blob["path"], safe_name, uploaded_by)
 
     return RedirectResponse(url=f"/read/{job_id}", status_code=302)
 
 
 # =============================
-# 分段上傳 (進階，可保留)
+# 可續傳的分段上傳
 # =============================
-@router.post("/upload/chunked")
-async def chunk_upload_file(fileField: UploadFile = File(...)):
+def _userId(request):
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=403, detail="請先登入")
+    return user_id
+
+
+def _offsetHeaders(progress):
+    return {
+        "Upload-Offset": str(progress["offset"]),
+        "Upload-Length": str(progress["size"]),
+        "Upload-Chunk-Size": str(progress["chunk_size"]),
+        "Cache-Control": "no-store",
+    }
+
+
+@router.post("/uploads")
+async def create_upload(
+    request: Request,
+    job_id: int = Form(...),
+    file_name: str = Form(...),
+    size: int = Form(...),
+    sha256: str | None = Form(None),
+    conn=Depends(getDB)
+):
     """
-    範例：分段上傳，限制檔案大小
+    建立上傳 session，回傳 201 與 Location；之後以 chunk_size 為單位 PUT 各區塊。
+    sha256 可在此或 finalize 時提供（十六進位）。
     """
-    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-    CHUNK_SIZE = 1024 * 1024  # 1MB
-    safeFn = safeFilename(fileField.filename)
-    upload_path = f"www/uploads/{safeFn}"
-    total_size = 0
+    user_id = _userId(request)
+    safe_name = safeFilename(file_name)
+    progress = await uploadSessions.create(conn, job_id, user_id, safe_name, size, sha256)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="找不到案件")
+    location = f"/api/uploads/{progress['id']}"
+    return fastjson.JSONResponse(
+        progress, status_code=201, headers={"Location": location, **_offsetHeaders(progress)}
+    )
+
 
+@router.head("/uploads/{session_id}")
+async def upload_offset(request: Request, session_id: str, conn=Depends(getDB)):
+    progress = await uploadSessions.status(conn, session_id, _userId(request))
+    return Response(status_code=200, headers=_offsetHeaders(progress))
+
+
+@router.get("/uploads/{session_id}")
+async def upload_status(request: Request, session_id: str, conn=Depends(getDB)):
+    progress = await uploadSessions.status(conn, session_id, _userId(request))
+    return fastjson.JSONResponse(progress, headers=_offsetHeaders(progress))
+
+
+@router.put("/uploads/{session_id}")
+async def upload_chunk(request: Request, session_id: str):
+    """
+    寫入一個區塊：
+    - Upload-Offset：區塊起點（chunk_size 的倍數）
+    - Upload-Checksum（選用）：sha256 <base64>，不符時回傳 460
+    - body 為區塊原始內容，長度必須剛好是 chunk_size（最後一塊為剩餘大小）
+    - 接收 body 期間不佔用資料庫連線：收完並檢查後才向連線池取連線
+    """
+    user_id = _userId(request)
     try:
-        with open(upload_path, "wb") as buffer:
-            while True:
-                chunk = await fileField.read(CHUNK_SIZE)
-                if not chunk:
-                    break
-                total_size += len(chunk)
-                if total_size > MAX_FILE_SIZE:
-                    buffer.close()
-                    os.remove(upload_path)
-                    raise HTTPException(status_code=413, detail="檔案過大")
-                buffer.write(chunk)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"上傳失敗: {str(e)}")
-
-    return {"filename": safeFn, "size_bytes": total_size}
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="缺少或錯誤的 Upload-Offset 標頭")
+
+    # 區塊最多 uploadSessions.CHUNK_SIZE，直接收在記憶體中；
+    # 確切長度與 offset 由 writeChunk 依 session 檢查
+    limit = uploadSessions.CHUNK_SIZE
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail="區塊過大")
+
+    data = bytearray()
+    async for piece in request.stream():
+        data += piece
+        if len(data) > limit:
+            raise HTTPException(status_code=413, detail="區塊過大")
+    uploadSessions.checkChecksum(request.headers.get("upload-checksum"), data)
+
+    async with getPool().connection() as conn:
+        progress = await uploadSessions.writeChunk(conn, session_id, user_id, offset, data)
+    return Response(status_code=204, headers=_offsetHeaders(progress))
+
+
+@router.post("/uploads/{session_id}/finalize")
+async def finalize_upload(
+    request: Request,
+    session_id: str,
+    sha256: str | None = Form(None),
+    conn=Depends(getDB)
+):
+    result = await uploadSessions.finalize(conn, session_id, _userId(request), sha256)
+    result["url"] = f"/read/{result['job_id']}"
+    return fastjson.JSONResponse(result)
+
+
+@router.delete("/uploads/{session_id}")
+async def abort_upload(request: Request, session_id: str, conn=Depends(getDB)):
+    await uploadSessions.abort(conn, session_id, _userId(request))
+    return Response(status_code=204)
@@ -1,21 +1,19 @@
-from fastapi import APIRouter, Form, Request
+from fastapi import APIRouter, Depends, Form, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-import psycopg
-from psycopg.rows import dict_row
 import secrets, datetime
 
+# === 資料庫連線（與其他 router 共用 db.py 的連線池）===
+from db import getDB
+import assets
+import credentials
+import metrics
+import users
+
 # === Router 模組化設定 ===
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
-
-# === 資料庫連線 ===
-async def getDB():
-    conn = await psycopg.AsyncConnection.connect(
-        "dbname=1141se user=postgres password=boy20050525 host=localhost port=5432",
-        row_factory=dict_row
-    )
-    return conn
+templates = metrics.instrumentTemplates(Jinja2Templates(directory="templates"))
+templates.env.globals["asset"] = assets.url  # 帶指紋的 CSS 網址
 
 
 # === 登入頁 ===
@@ -29,23 +27,33 @@ async def login_form(request: Request):
 async def login(
     request: Request,
     username: str = Form(...),
-    password: str = Form(...)
+    password: str = Form(...),
+    conn=Depends(getDB)
 ):
-    conn = await getDB()
     async with conn.cursor() as cur:
         await cur.execute(
-            "SELECT * FROM users WHERE username=%s AND password=%s;",
-            (username, password)
+            "SELECT id, username, role, email, password FROM users WHERE username=%s;",
+            (username,)
         )
         user = await cur.fetchone()
 
-    if not user:
+    # 密碼驗證在 credentials 的 thread pool 中執行，不阻塞其他請求
+    stored = user["password"] if user else None
+    if not await credentials.verifyPassword(password, stored):
         return HTMLResponse("❌ 帳號或密碼錯誤 <a href='/loginForm'>返回登入</a>", status_code=401)
 
-    # 建立登入 session
-    request.session["user_id"] = user["id"]
-    request.session["username"] = user["username"]
-    request.session["role"] = user["role"]
+    # 舊版明文（或舊參數）密碼：登入成功時改存新的雜湊
+    if credentials.needsRehash(stored):
+        hashed = await credentials.hashPassword(password)
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "UPDATE users SET password=%s WHERE id=%s AND password=%s;",
+                (hashed, user["id"], stored)
+            )
+        await conn.commit()
+
+    # 建立登入 session（頁面需要的身分資料只在這裡存一次）
+    users.startSession(request, user)
 
     return RedirectResponse(url="/", status_code=302)
 
@@ -70,16 +78,19 @@ async def register_user(
     username: str = Form(...),
     password: str = Form(...),
     role: str = Form(...),
+    conn=Depends(getDB)
 ):
-    conn = await getDB()
+    hashed = await credentials.hashPassword(password)
     async with conn.cursor() as cur:
         try:
             await cur.execute(
                 "INSERT INTO users (username, password, role) VALUES (%s, %s, %s);",
-                (username, password, role)
+                (username, hashed, role)
             )
             await conn.commit()
         except Exception as e:
+            # 連線會歸還連線池，需先結束失敗的交易
+            await conn.rollback()
             return HTMLResponse(f"⚠️ 註冊失敗：{e}<br><a href='/register'>返回重試</a>", status_code=400)
 
     return HTMLResponse("✅ 註冊成功！<a href='/loginForm'>返回登入</a>", status_code=200)
@@ -93,8 +104,7 @@ async def forgot_password_page(request: Request):
 
 # === 寄出重設密碼信 ===
 @router.post("/forgot")
-async def send_reset_email(request: Request, email: str = Form(...)):
-    conn = await getDB()
+async def send_reset_email(request: Request, email: str = Form(...), conn=Depends(getDB)):
     async with conn.cursor() as cur:
         await cur.execute("SELECT id FROM users WHERE email=%s;", (email,))
         user = await cur.fetchone()
@@ -131,8 +141,8 @@ async def reset_password(
     request: Request,
     token: str = Form(...),
     password: str = Form(...),
+    conn=Depends(getDB)
 ):
-    conn = await getDB()
     async with conn.cursor() as cur:
         # 驗證 token
         await cur.execute(
@@ -146,10 +156,11 @@ async def reset_password(
         if record["expires_at"] < datetime.datetime.now():
             return HTMLResponse("⚠️ 連結已過期", status_code=400)
 
-        # 更新密碼
+        # 更新密碼（存雜湊）
+        hashed = await credentials.hashPassword(password)
         await cur.execute(
             "UPDATE users SET password=%s WHERE id=%s;",
-            (password, record["user_id"])
+            (hashed, record["user_id"])
         )
 
         # 移除 token
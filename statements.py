@@ -0,0 +1,65 @@
+# statements.py
+# =============================
+# 具名 SQL 敘述登錄表 (Prepared-statement registry)
+# =============================
+# 功能說明：
+# - jobs.py 的每個 SQL 以名稱登錄一次，執行時以名稱取用
+# - 預設使用 psycopg 伺服器端 prepared statement（prepare=True）：
+#   每條連線第一次執行時 PREPARE，之後只送參數，省去 parse / plan
+# - 每條連線的 prepared statement 快取大小由 DB_PREPARED_MAX 設定（psycopg prepared_max）
+# - execute 同時記錄每個敘述的執行時間與資料列數（metrics.py）
+# - PgBouncer transaction pooling 模式下連線會在交易間被換掉，
+#   設定 DB_PGBOUNCER_TXN=1 即完全停用 prepared statement
+# =============================
+
+import os
+import time
+
+import metrics
+
+# PgBouncer transaction pooling 模式開關
+PGBOUNCER_TXN = os.environ.get("DB_PGBOUNCER_TXN", "0") == "1"
+
+# 每條連線最多保留的 prepared statement 數量
+PREPARED_MAX = int(os.environ.get("DB_PREPARED_MAX", 100))
+
+# 傳給 cursor.execute 的 prepare 參數：
+# True  = 立即 prepare；False = 永不 prepare；None = psycopg 預設（執行 5 次後才 prepare）
+PREPARE = False if PGBOUNCER_TXN else True
+
+_registry = {}
+
+
+def register(name, sql):
+    # 同名重複登錄時 SQL 必須相同，避免兩個函式互相覆蓋
+    existing = _registry.get(name)
+    if existing is not None and existing != sql:
+        raise ValueError(f"statement {name!r} 已登錄為不同的 SQL")
+    _registry[name] = sql
+    return name
+
+
+def get(name):
+    return _registry[name]
+
+
+def names():
+    return sorted(_registry)
+
+
+async def execute(cur, name, params=None):
+    # pipeline 模式下 execute 只是把敘述排入佇列，無法個別計時
+    if cur.pgconn.pipeline_status:
+        await cur.execute(_registry[name], params, prepare=PREPARE)
+        metrics.observeQuery(name, 0, 0, pipelined=True)
+        return
+    start = time.perf_counter()
+    await cur.execute(_registry[name], params, prepare=PREPARE)
+    metrics.observeQuery(name, time.perf_counter() - start, cur.rowcount)
+
+
+def configureConnection(conn):
+    # 由連線池對每條新連線呼叫
+    conn.prepared_max = PREPARED_MAX
+    if PGBOUNCER_TXN:
+        conn.prepare_threshold = None
@@ -0,0 +1,73 @@
+# staticFiles.py
+# =============================
+# 靜態檔案 (Static files with cache headers)
+# =============================
+# 功能說明：
+# - 取代 StaticFiles 掛載 /static，依路徑加上 Cache-Control
+# - 以內容雜湊命名的檔案（thumbs/ 縮圖、assets.py 產生的 name.<hash>.css）內容永不改變：快取一年並標示 immutable，
+#   瀏覽器重新整理時也不會再發出驗證請求
+# - 其他檔案短時間快取，之後以 ETag / Last-Modified 驗證（304）
+# - 檔案旁有 buildStatic.py 預先壓縮的 .br / .gz 且瀏覽器接受時，直接送出壓縮檔，
+#   不必每次請求都壓縮（Range 請求仍送原檔）
+# =============================
+
+import mimetypes
+import os
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+import assets
+import compression
+
+# 內容定址、可永久快取的目錄（相對於 www/）
+IMMUTABLE_PREFIXES = ("thumbs/",)
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+DEFAULT_CACHE = f"public, max-age={int(os.environ.get('STATIC_MAX_AGE', 3600))}"
+
+# 預先壓縮檔的副檔名
+PRECOMPRESSED = {"br": ".br", "gzip": ".gz"}
+
+
+def _sibling(full_path, stat_result, encoding):
+    # 壓縮檔需比原檔新，避免原檔更新後仍送出舊內容
+    try:
+        stat = os.stat(full_path + PRECOMPRESSED[encoding])
+    except OSError:
+        return None
+    if stat.st_mtime < stat_result.st_mtime:
+        return None
+    return stat
+
+
+class CachedStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        path = self.get_path(scope).replace(os.sep, "/")
+        immutable = path.startswith(IMMUTABLE_PREFIXES) or assets.isFingerprinted(path)
+        cache_control = IMMUTABLE_CACHE if immutable else DEFAULT_CACHE
+
+        available = [e for e in PRECOMPRESSED if _sibling(full_path, stat_result, e)]
+        if available and "range" not in request_headers:
+            encoding = compression.negotiate(request_headers.get("accept-encoding"), available)
+            if encoding:
+                compressed = full_path + PRECOMPRESSED[encoding]
+                response = FileResponse(
+                    compressed,
+                    status_code=status_code,
+                    stat_result=os.stat(compressed),
+                    media_type=mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+                    headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding", "Cache-Control": cache_control},
+                )
+                if self.is_not_modified(response.headers, request_headers):
+                    return NotModifiedResponse(response.headers)
+                return response
+
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = cache_control
+        if available:
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
@@ -0,0 +1,298 @@
+# storage.py
+# =============================
+# 檔案儲存層 (Storage Layer)
+# =============================
+# 功能說明：
+# - 以固定大小的區塊串流寫入上傳檔案，不把整個檔案讀進記憶體
+# - 寫檔在 thread pool 執行，不阻塞 event loop
+# - 依端點限制檔案大小，並在串流時同步計算 SHA-256
+# - 先寫入同目錄的暫存檔，完整寫完後才以 os.replace 原子性地放到目的地
+# - 以內容雜湊 (SHA-256) 存放 blob，並以 blobs 資料表計算引用次數
+# - 分段上傳完成的檔案（uploadSessions.py）以 adoptBlob 硬連結為 blob，不再複製
+# - 供 routes/upload.py、main.py（addJob / editJob）、jobs.py 共同使用
+# =============================
+
+import asyncio
+import hashlib
+import os
+import tempfile
+
+from fastapi import HTTPException
+
+import thumbnails
+
+MB = 1024 * 1024
+
+# 每次讀寫的區塊大小
+CHUNK_SIZE = 1 * MB
+
+# 各端點的檔案大小上限（位元組），可由環境變數調整
+MAX_DELIVERABLE_SIZE = int(os.environ.get("UPLOAD_MAX_DELIVERABLE", 200 * MB))  # /api/upload
+MAX_REQUIREMENT_SIZE = int(os.environ.get("UPLOAD_MAX_REQUIREMENT", 50 * MB))   # /addJob、/editJob
+MAX_RESUMABLE_SIZE = int(os.environ.get("UPLOAD_MAX_RESUMABLE", 2048 * MB))     # /api/uploads（分段上傳）
+
+
+def _writeChunk(f, hasher, chunk):
+    # 在 thread 中同時更新雜湊與寫入，避免佔用 event loop
+    hasher.update(chunk)
+    f.write(chunk)
+
+
+def _syncClose(f):
+    # 確保資料落地後才關閉，rename 之後檔案即為完整且持久
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+
+def _discard(f, tmp_path):
+    # 失敗時關閉並刪除暫存檔
+    try:
+        f.close()
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+async def saveUpload(upload, dest_path, max_size, chunk_size=CHUNK_SIZE):
+    """
+    將 UploadFile 串流寫入 dest_path：
+    - 超過 max_size 時回傳 413 並刪除暫存檔
+    - 回傳 {"path", "size", "sha256"}
+    """
+    # 若已知檔案大小，直接拒絕過大的上傳
+    if getattr(upload, "size", None) is not None and upload.size > max_size:
+        raise HTTPException(status_code=413, detail="檔案過大")
+
+    dest_dir = os.path.dirname(dest_path) or "."
+    await asyncio.to_thread(os.makedirs, dest_dir, exist_ok=True)
+
+    # 暫存檔放在同一個目錄，確保 os.replace 為同一檔案系統上的原子操作
+    fd, tmp_path = await asyncio.to_thread(
+        tempfile.mkstemp, dir=dest_dir, prefix=".upload-", suffix=".part"
+    )
+    f = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=413, detail="檔案過大")
+            await asyncio.to_thread(_writeChunk, f, hasher, chunk)
+
+        await asyncio.to_thread(_syncClose, f)
+        await asyncio.to_thread(os.replace, tmp_path, dest_path)
+    except BaseException:
+        await asyncio.to_thread(_discard, f, tmp_path)
+        raise
+
+    return {"path": dest_path, "size": size, "sha256": hasher.hexdigest()}
+
+
+# =============================
+# 內容定址儲存 (Content-addressed blobs)
+# =============================
+# - 檔案以 SHA-256 為鍵，存放於 BLOB_ROOT/ab/cd/<sha256>
+# - blobs 資料表記錄大小、路徑與引用次數 (refcount)
+# - jobs.requirement_file、deliverables.file_path 存放 blob 路徑，
+#   原始檔名另存於 jobs.requirement_name、deliverables.file_name
+# - 內容相同的上傳只增加引用次數，不佔額外磁碟也不重寫檔案
+# =============================
+
+BLOB_ROOT = os.environ.get("BLOB_ROOT", os.path.join("uploads", "blobs"))
+
+_HEX = set("0123456789abcdef")
+
+
+def blobPath(sha256):
+    # 以前兩層 hash 前綴分目錄，避免單一目錄檔案過多
+    return os.path.join(BLOB_ROOT, sha256[:2], sha256[2:4], sha256)
+
+
+async def _lockHashes(cur, hashes):
+    """
+    以 advisory lock 讓同一內容的「寫入 blob」與「刪除 blob 檔案」依序進行，交易結束時自動釋放。
+    依雜湊排序後逐一取得，多個交易同時鎖多個雜湊也不會死結。
+    """
+    for sha256 in sorted(set(hashes)):
+        await cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", (sha256,))
+
+
+def blobHash(path):
+    # 由 blob 路徑取回 SHA-256；舊版（非 blob）路徑回傳 None
+    if not path:
+        return None
+    name = os.path.basename(path)
+    if len(name) == 64 and set(name) <= _HEX and os.path.normpath(path) == os.path.normpath(blobPath(name)):
+        return name
+    return None
+
+
+def _hashStream(f, max_size, chunk_size):
+    # 只讀不寫：先算出內容雜湊，判斷是否已存在相同 blob
+    f.seek(0)
+    hasher = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_size:
+            return None, size
+        hasher.update(chunk)
+    f.seek(0)
+    return hasher.hexdigest(), size
+
+
+async def storeBlob(conn, upload, max_size):
+    """
+    將 UploadFile 存成內容定址的 blob：
+    - 先讀一次計算 SHA-256，若 blob 已存在只增加 refcount（不寫檔）
+    - 否則透過 saveUpload 串流寫入分層目錄並新增 blobs 紀錄
+    - 回傳 {"path", "sha256", "size", "deduplicated"}
+    """
+    if getattr(upload, "size", None) is not None and upload.size > max_size:
+        raise HTTPException(status_code=413, detail="檔案過大")
+
+    sha256, size = await asyncio.to_thread(_hashStream, upload.file, max_size, CHUNK_SIZE)
+    if sha256 is None:
+        raise HTTPException(status_code=413, detail="檔案過大")
+
+    path = blobPath(sha256)
+    async with conn.cursor() as cur:
+        # 持有到呼叫端 commit：releaseBlobs 不會在這段期間刪掉同內容的檔案
+        await _lockHashes(cur, [sha256])
+        # 已存在相同內容：只增加引用次數（同時鎖住該列，避免與刪除競爭）
+        await cur.execute(
+            "UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = %s RETURNING path;",
+            (sha256,)
+        )
+        row = await cur.fetchone()
+        if row and await asyncio.to_thread(os.path.exists, row["path"]):
+            return {"path": row["path"], "sha256": sha256, "size": size, "deduplicated": True}
+
+        # 新內容（或紀錄存在但檔案遺失）：串流寫入 blob 路徑
+        saved = await saveUpload(upload, path, max_size)
+        if saved["sha256"] != sha256:
+            await asyncio.to_thread(os.remove, path)
+            raise HTTPException(status_code=409, detail="上傳內容在處理期間發生變化")
+
+        if not row:
+            await cur.execute(
+                """
+                INSERT INTO blobs (sha256, size, path, refcount)
+                VALUES (%s, %s, %s, 1)
+                ON CONFLICT (sha256) DO UPDATE SET refcount = blobs.refcount + 1;
+                """,
+                (sha256, size, path)
+            )
+
+    return {"path": path, "sha256": sha256, "size": size, "deduplicated": False}
+
+
+def _hashFile(path, max_size, chunk_size=CHUNK_SIZE):
+    with open(path, "rb") as f:
+        return _hashStream(f, max_size, chunk_size)
+
+
+async def hashFile(path, max_size):
+    # 回傳 (sha256, size)；超過 max_size 時 sha256 為 None
+    return await asyncio.to_thread(_hashFile, path, max_size)
+
+
+def _linkInto(src, dest):
+    # 內容定址：目的地已有檔案時內容必定相同，保留原檔即可
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    try:
+        os.link(src, dest)
+    except FileExistsError:
+        pass
+
+
+async def adoptBlob(conn, src_path, sha256, size):
+    """
+    將磁碟上已完整寫入（且已 fsync）的檔案收為 blob，不複製內容（不 commit）：
+    - 新增 / 更新 blobs 紀錄（refcount + 1）
+    - blob 路徑尚無檔案時以 os.link 建立硬連結（src_path 必須與 BLOB_ROOT 在同一個檔案系統）
+    - src_path 保留，由呼叫端 commit 後刪除；交易失敗時最多留下一個無人引用的 blob 檔案，
+      不會有指向不存在檔案的紀錄
+    - sha256 由呼叫端事先算好；回傳格式與 storeBlob 相同
+    """
+    path = blobPath(sha256)
+    async with conn.cursor() as cur:
+        await _lockHashes(cur, [sha256])
+        await cur.execute(
+            """
+            INSERT INTO blobs (sha256, size, path, refcount)
+            VALUES (%s, %s, %s, 1)
+            ON CONFLICT (sha256) DO UPDATE SET refcount = blobs.refcount + 1
+            RETURNING path;
+            """,
+            (sha256, size, path)
+        )
+        row = await cur.fetchone()
+    exists = await asyncio.to_thread(os.path.exists, row["path"])
+    if not exists:
+        await asyncio.to_thread(_linkInto, src_path, row["path"])
+    return {"path": row["path"], "sha256": sha256, "size": size, "deduplicated": exists}
+
+
+def _removeFiles(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def releaseBlobs(conn, paths):
+    """
+    釋放 blob 引用：refcount 減一，歸零時刪除紀錄並在 commit 後刪除檔案。
+    舊版（非 blob）路徑會被略過；一定會 commit 呼叫端的交易（沒有可釋放的 blob 時亦同）。
+    刪檔前重新取得 advisory lock 並確認紀錄仍不存在：commit 之後若有人以相同內容
+    重新建立了 blob（storeBlob / adoptBlob），該檔案不會被刪除。
+    """
+    hashes = [h for h in (blobHash(p) for p in paths) if h]
+    if not hashes:
+        await conn.commit()
+        return
+
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE blobs b
+            SET refcount = b.refcount - n.cnt
+            FROM (
+                SELECT sha256, COUNT(*) AS cnt
+                FROM unnest(%s::text[]) AS t(sha256)
+                GROUP BY sha256
+            ) n
+            WHERE b.sha256 = n.sha256;
+            """,
+            (hashes,)
+        )
+        await cur.execute(
+            "DELETE FROM blobs WHERE sha256 = ANY(%s) AND refcount <= 0 RETURNING sha256, path;",
+            (hashes,)
+        )
+        orphaned = {row["sha256"]: row["path"] for row in await cur.fetchall()}
+    await conn.commit()
+    if not orphaned:
+        return
+
+    # 確定 commit 之後才刪除實體檔案（含預覽縮圖），並在鎖內排除已被重新建立的 blob
+    async with conn.cursor() as cur:
+        await _lockHashes(cur, orphaned)
+        await cur.execute("SELECT sha256 FROM blobs WHERE sha256 = ANY(%s);", (list(orphaned),))
+        for row in await cur.fetchall():
+            del orphaned[row["sha256"]]
+        if orphaned:
+            await asyncio.to_thread(_removeFiles, list(orphaned.values()))
+            await asyncio.to_thread(thumbnails.removeThumbnails, list(orphaned))
+    await conn.commit()
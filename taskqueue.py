@@ -0,0 +1,198 @@
+# taskqueue.py
+# =============================
+# 背景工作佇列 (Postgres-backed task queue)
+# =============================
+# 功能說明：
+# - enqueue：在呼叫端的交易中新增 tasks 資料列，與業務資料一起 commit（不會有孤兒工作）
+# - claim：以 SELECT ... FOR UPDATE SKIP LOCKED 取工作，多個 worker 不會搶到同一筆
+# - 失敗時以指數退避重試，超過 max_attempts 後標記為 dead（dead-letter），保留 last_error
+# - worker 當機時，超過 LEASE 秒仍為 running 的工作會被放回佇列；
+#   已用完 max_attempts 的直接標記為 dead（例如每次都讓 worker 記憶體不足而當機的檔案）
+# - enqueue 會 NOTIFY tasks_queued，worker 可立即醒來，不必頻繁輪詢
+# - handler 以 @handler("名稱") 登錄（見 processing.py），由 worker.py 執行
+# =============================
+
+import json
+import os
+import traceback
+
+import statements
+
+CHANNEL = "tasks_queued"
+
+# 工作執行超過此秒數仍未完成，視為 worker 已當機
+LEASE = float(os.environ.get("TASK_LEASE", 300))
+
+# 重試延遲：RETRY_BASE * 2^(attempts-1) 秒，最多 RETRY_MAX 秒
+RETRY_BASE = float(os.environ.get("TASK_RETRY_BASE", 5))
+RETRY_MAX = float(os.environ.get("TASK_RETRY_MAX", 3600))
+
+# 名稱 -> async 函式 (conn, payload)
+handlers = {}
+
+
+def handler(kind):
+    def register(fn):
+        if kind in handlers and handlers[kind] is not fn:
+            raise ValueError(f"task {kind!r} 已登錄")
+        handlers[kind] = fn
+        return fn
+    return register
+
+
+# ---------------------------------
+# 佇列操作
+# ---------------------------------
+statements.register("tasks.enqueue", """
+        WITH t AS (
+            INSERT INTO tasks (kind, payload, max_attempts, run_at)
+            VALUES (%s, %s, %s, now() + make_interval(secs => %s))
+            RETURNING id
+        )
+        SELECT t.id, pg_notify(%s, %s) AS notified
+        FROM t;
+        """)
+
+statements.register("tasks.claim", """
+        UPDATE tasks
+        SET status = 'running', attempts = attempts + 1,
+            locked_by = %s, locked_at = now(), updated_at = now()
+        WHERE id IN (
+            SELECT id FROM tasks
+            WHERE status = 'queued' AND run_at <= now()
+            ORDER BY run_at, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, kind, payload, attempts, max_attempts;
+        """)
+
+statements.register("tasks.complete", """
+        UPDATE tasks
+        SET status = 'done', locked_by = NULL, updated_at = now()
+        WHERE id = %s;
+        """)
+
+statements.register("tasks.fail", """
+        UPDATE tasks
+        SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+            run_at = now() + make_interval(secs => %s),
+            last_error = %s, locked_by = NULL, updated_at = now()
+        WHERE id = %s
+        RETURNING status;
+        """)
+
+statements.register("tasks.recover", """
+        UPDATE tasks
+        SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+            locked_by = NULL, updated_at = now(),
+            last_error = 'lease expired on ' || COALESCE(locked_by, '?')
+        WHERE status = 'running' AND locked_at < now() - make_interval(secs => %s)
+        RETURNING id, status;
+        """)
+
+statements.register("tasks.retry", """
+        UPDATE tasks
+        SET status = 'queued', attempts = 0, run_at = now(), updated_at = now()
+        WHERE status = 'dead' AND (%s::bigint IS NULL OR id = %s)
+        RETURNING id;
+        """)
+
+statements.register("tasks.stats", """
+        SELECT kind, status, COUNT(*) AS count
+        FROM tasks
+        WHERE status <> 'done'
+        GROUP BY kind, status
+        ORDER BY kind, status;
+        """)
+
+
+async def enqueue(conn, kind, payload=None, delay=0, max_attempts=5):
+    """
+    新增一個工作；不 commit，由呼叫端與業務資料一起 commit。
+    kind 只需在 worker 程序中登錄（未登錄時由 worker 記錄錯誤並重試）。
+    """
+    async with conn.cursor() as cur:
+        await statements.execute(
+            cur, "tasks.enqueue",
+            (kind, json.dumps(payload or {}, ensure_ascii=False), max_attempts, delay, CHANNEL, kind)
+        )
+        return (await cur.fetchone())["id"]
+
+
+async def claim(conn, worker_id, limit):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "tasks.claim", (worker_id, limit))
+        rows = await cur.fetchall()
+    await conn.commit()
+    return rows
+
+
+def retryDelay(attempts):
+    return min(RETRY_MAX, RETRY_BASE * 2 ** max(0, attempts - 1))
+
+
+async def complete(conn, task_id):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "tasks.complete", (task_id,))
+    await conn.commit()
+
+
+async def fail(conn, task, error):
+    # 回傳新的狀態：queued（稍後重試）或 dead
+    async with conn.cursor() as cur:
+        await statements.execute(
+            cur, "tasks.fail", (retryDelay(task["attempts"]), error[-4000:], task["id"])
+        )
+        row = await cur.fetchone()
+    await conn.commit()
+    return row["status"] if row else None
+
+
+async def recover(conn, lease=LEASE):
+    # 回傳 {"queued": [放回佇列的 id], "dead": [已無重試次數的 id]}
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "tasks.recover", (lease,))
+        rows = await cur.fetchall()
+    await conn.commit()
+    return {
+        "queued": [row["id"] for row in rows if row["status"] == "queued"],
+        "dead": [row["id"] for row in rows if row["status"] == "dead"],
+    }
+
+
+async def retryDead(conn, task_id=None):
+    # 把 dead 工作放回佇列（全部或指定 id）
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "tasks.retry", (task_id, task_id))
+        rows = await cur.fetchall()
+    await conn.commit()
+    return [row["id"] for row in rows]
+
+
+async def stats(conn):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "tasks.stats")
+        rows = await cur.fetchall()
+    await conn.rollback()
+    return rows
+
+
+async def run(pool, task):
+    """
+    執行一個已 claim 的工作：handler 使用獨立的連線與交易，
+    成功後標記 done，例外時記錄錯誤並重試或進入 dead。
+    """
+    fn = handlers.get(task["kind"])
+    try:
+        if fn is None:
+            raise LookupError(f"沒有 handler：{task['kind']}")
+        async with pool.connection() as conn:
+            await fn(conn, task["payload"])
+            await conn.commit()
+    except Exception:
+        async with pool.connection() as conn:
+            return await fail(conn, task, traceback.format_exc())
+    async with pool.connection() as conn:
+        await complete(conn, task["id"])
+    return "done"
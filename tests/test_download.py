@@ -0,0 +1,86 @@
+# tests/test_download.py
+# =============================
+# download.py 的 Range / ETag 解析
+# =============================
+# 執行：python -m pytest -q（於專案根目錄）
+# =============================
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from download import _etagMatches, _parseRange
+
+SIZE = 100
+
+
+# ---------------------------------
+# _parseRange
+# ---------------------------------
+def test_range_closed():
+    assert _parseRange("bytes=0-9", SIZE) == (0, 9)
+
+
+def test_range_end_clamped_to_size():
+    assert _parseRange("bytes=90-500", SIZE) == (90, 99)
+
+
+def test_range_suffix():
+    assert _parseRange("bytes=-5", SIZE) == (95, 99)
+
+
+def test_range_suffix_longer_than_file():
+    assert _parseRange("bytes=-500", SIZE) == (0, 99)
+
+
+def test_range_suffix_zero():
+    assert _parseRange("bytes=-0", SIZE) == "unsatisfiable"
+
+
+def test_range_open_ended():
+    assert _parseRange("bytes=10-", SIZE) == (10, 99)
+
+
+def test_range_start_after_end():
+    assert _parseRange("bytes=10-5", SIZE) is None
+
+
+def test_range_start_past_size():
+    assert _parseRange("bytes=100-", SIZE) == "unsatisfiable"
+    assert _parseRange("bytes=150-200", SIZE) == "unsatisfiable"
+
+
+@pytest.mark.parametrize("header", ["bytes=-5", "bytes=0-", "bytes=0-0"])
+def test_range_empty_file(header):
+    assert _parseRange(header, 0) == "unsatisfiable"
+
+
+def test_range_multiple_ranges():
+    assert _parseRange("bytes=0-1,3-4", SIZE) is None
+
+
+@pytest.mark.parametrize("header", ["items=0-9", "bytes=abc", "bytes=a-b"])
+def test_range_unsupported(header):
+    assert _parseRange(header, SIZE) is None
+
+
+# ---------------------------------
+# _etagMatches
+# ---------------------------------
+ETAG = '"abc"'
+
+
+def test_etag_weak_comparison():
+    assert _etagMatches('W/"abc"', ETAG)
+    assert _etagMatches('"x", "abc"', ETAG)
+    assert not _etagMatches('"x"', ETAG)
+
+
+def test_etag_strong_comparison():
+    assert _etagMatches('"abc"', ETAG, weak=False)
+    assert not _etagMatches('W/"abc"', ETAG, weak=False)
+
+
+def test_etag_wildcard_only_weak():
+    assert _etagMatches("*", ETAG)
+    assert not _etagMatches("*", ETAG, weak=False)
@@ -0,0 +1,123 @@
+# thumbnails.py
+# =============================
+# 預覽縮圖 (Preview thumbnails)
+# =============================
+# 功能說明：
+# - 圖片與 PDF 第一頁產生固定幾種寬度的 JPEG 縮圖，由 worker 執行（processing.py）
+# - 縮圖以內容雜湊命名：www/thumbs/ab/<sha256>-<寬度>.jpg，
+#   同內容的檔案只產生一次，內容不會改變，可由 /static 以長效快取提供（staticFiles.py）
+# - 需要 Pillow；PDF 另外需要 PyMuPDF。未安裝時不產生縮圖，頁面只顯示下載連結
+# - blob 被刪除時（storage.releaseBlobs）一併刪除縮圖
+# =============================
+
+import os
+import tempfile
+
+try:
+    from PIL import Image
+except ImportError:  # 未安裝 Pillow：不產生縮圖
+    Image = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # 未安裝 PyMuPDF：PDF 不產生縮圖
+    fitz = None
+
+# 縮圖寬度（像素）：清單、詳情頁、高解析度螢幕
+SIZES = (160, 480, 960)
+
+THUMB_ROOT = os.environ.get("THUMB_ROOT", os.path.join("www", "thumbs"))
+THUMB_URL = "/static/thumbs"
+
+JPEG_QUALITY = 80
+
+# 超過此像素數的圖片不處理（避免解壓縮炸彈）
+MAX_PIXELS = 80_000_000
+
+SUPPORTED = {"image/png", "image/jpeg", "application/pdf"}
+
+
+def _name(sha256, size):
+    return f"{sha256[:2]}/{sha256}-{size}.jpg"
+
+
+def thumbnailPath(sha256, size):
+    return os.path.join(THUMB_ROOT, *_name(sha256, size).split("/"))
+
+
+def thumbnailUrl(sha256, size=SIZES[1]):
+    return f"{THUMB_URL}/{_name(sha256, size)}"
+
+
+def srcset(sha256):
+    return ", ".join(f"{thumbnailUrl(sha256, size)} {size}w" for size in SIZES)
+
+
+def supports(mime_type):
+    if Image is None or mime_type not in SUPPORTED:
+        return False
+    return mime_type != "application/pdf" or fitz is not None
+
+
+def _openImage(path, mime_type):
+    if mime_type == "application/pdf":
+        with fitz.open(path) as doc:
+            if doc.page_count == 0:
+                return None
+            page = doc.load_page(0)
+            # 依最大縮圖寬度決定渲染倍率
+            zoom = max(SIZES) / max(page.rect.width, 1)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    image = Image.open(path)
+    image.draft("RGB", (max(SIZES), max(SIZES)))  # JPEG 可直接以較低解析度解碼
+    return image.convert("RGB")
+
+
+def generate(path, sha256, mime_type):
+    """
+    產生所有尺寸的縮圖（同步，於 thread 中執行）；
+    不支援的類型或無法解析的檔案回傳 False。
+    """
+    if not supports(mime_type):
+        return False
+    try:
+        image = _openImage(path, mime_type)
+    except Exception as e:
+        print(f"⚠️ 無法產生縮圖 {sha256}：{e}")
+        return False
+    if image is None:
+        return False
+
+    with image:
+        for size in SIZES:
+            dest = thumbnailPath(sha256, size)
+            if os.path.exists(dest):
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            thumb = image.copy()
+            thumb.thumbnail((size, size * 4))
+            # 先寫暫存檔再 rename，/static 不會讀到寫到一半的檔案；
+            # 暫存檔名每次唯一，同一個 blob 的兩個工作同時產生縮圖也不會互相覆蓋
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".thumb-", suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    thumb.save(f, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+                # mkstemp 建立的檔案權限為 0600，改成與一般靜態檔相同
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, dest)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+    return True
+
+
+def removeThumbnails(sha256s):
+    for sha256 in sha256s:
+        for size in SIZES:
+            try:
+                os.remove(thumbnailPath(sha256, size))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,325 @@
+# uploadSessions.py
+# =============================
+# 可續傳的分段上傳 (Resumable upload sessions, tus-style)
+# =============================
+# 功能說明：
+# - create：為案件建立上傳 session，預先建立與檔案同大小的稀疏暫存檔（不佔實際磁碟空間）
+# - writeChunk：以 os.pwrite 把區塊直接寫到暫存檔的對應位置，區塊可平行、不依順序上傳；
+#   fsync 後才記錄到 upload_chunks，回應的 offset 即保證已落地
+# - status：目前連續完成的 offset（tus 的 Upload-Offset）與尚未上傳的區塊
+# - finalize：確認所有區塊到齊、比對整個檔案的 SHA-256，暫存檔以硬連結放到 blob 路徑（不複製），
+#   再執行與 /api/upload 相同的資料庫更新（jobs.addDeliverable），commit 後刪除暫存檔
+# - session 逾期（UPLOAD_SESSION_TTL）後於下次建立 session 時清除
+# - 寫入區塊時以 FOR SHARE 鎖住 session、finalize 以 FOR UPDATE：
+#   finalize 會等進行中的寫入完成，之後的寫入則找不到 session
+# =============================
+
+import asyncio
+import base64
+import hashlib
+import os
+import secrets
+
+from fastapi import HTTPException
+
+import jobs
+import statements
+import storage
+
+MB = storage.MB
+
+# 暫存檔目錄，必須與 storage.BLOB_ROOT 在同一個檔案系統（finalize 以 os.link 建立 blob）
+SESSION_DIR = os.environ.get("UPLOAD_SESSION_DIR", os.path.join("uploads", "sessions"))
+
+# 區塊大小：除最後一塊外，每個 PUT 必須剛好是這個大小
+CHUNK_SIZE = int(os.environ.get("UPLOAD_SESSION_CHUNK", 8 * MB))
+
+# session 保留秒數（自建立起算）
+TTL = int(os.environ.get("UPLOAD_SESSION_TTL", 24 * 3600))
+
+
+def partPath(session_id):
+    return os.path.join(SESSION_DIR, f"{session_id}.part")
+
+
+# ---------------------------------
+# SQL
+# ---------------------------------
+statements.register("uploads.create", """
+        INSERT INTO upload_sessions (id, job_id, uploaded_by, file_name, size, chunk_size, sha256, expires_at)
+        SELECT %s, id, %s, %s, %s, %s, %s, now() + make_interval(secs => %s)
+        FROM jobs WHERE id = %s
+        RETURNING *;
+        """)
+
+statements.register("uploads.expire", """
+        DELETE FROM upload_sessions
+        WHERE expires_at < now()
+        RETURNING id;
+        """)
+
+# get：不上鎖；share：寫入區塊；lock：finalize / 取消
+for _name, _lock in (("get", ""), ("share", " FOR SHARE"), ("lock", " FOR UPDATE")):
+    statements.register(f"uploads.{_name}", f"""
+        SELECT * FROM upload_sessions
+        WHERE id = %s AND expires_at > now(){_lock};
+        """)
+
+statements.register("uploads.chunks", """
+        SELECT chunk_index FROM upload_chunks
+        WHERE session_id = %s
+        ORDER BY chunk_index;
+        """)
+
+statements.register("uploads.addChunk", """
+        INSERT INTO upload_chunks (session_id, chunk_index)
+        VALUES (%s, %s)
+        ON CONFLICT DO NOTHING;
+        """)
+
+statements.register("uploads.delete", """
+        DELETE FROM upload_sessions WHERE id = %s;
+        """)
+
+
+# ---------------------------------
+# 檔案操作（在 thread 中執行）
+# ---------------------------------
+def _createPart(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        # 只設定檔案長度，未寫入的部分不佔磁碟（稀疏檔）
+        os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def _pwrite(path, offset, data):
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _removeParts(session_ids):
+    for session_id in session_ids:
+        try:
+            os.remove(partPath(session_id))
+        except FileNotFoundError:
+            pass
+
+
+# ---------------------------------
+# 區塊計算
+# ---------------------------------
+def chunkCount(session):
+    return -(-session["size"] // session["chunk_size"])
+
+
+def chunkLength(session, offset):
+    """
+    檢查 offset 並回傳該區塊應有的長度：
+    offset 必須是 chunk_size 的倍數且小於檔案大小，否則回傳 400。
+    """
+    if offset < 0 or offset >= session["size"] or offset % session["chunk_size"]:
+        raise HTTPException(status_code=400, detail=f"Upload-Offset 必須是 {session['chunk_size']} 的倍數且小於檔案大小")
+    return min(session["chunk_size"], session["size"] - offset)
+
+
+def checkChecksum(header, data):
+    # tus checksum 擴充：Upload-Checksum: sha256 <base64>；不符時回傳 460
+    if not header:
+        return
+    algorithm, _, value = header.strip().partition(" ")
+    if algorithm.lower() != "sha256":
+        raise HTTPException(status_code=400, detail="Upload-Checksum 只支援 sha256")
+    try:
+        expected = base64.b64decode(value.strip(), validate=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Upload-Checksum 格式錯誤")
+    if hashlib.sha256(data).digest() != expected:
+        raise HTTPException(status_code=460, detail="區塊檢查碼不符")
+
+
+def _normalizeHash(value):
+    # 十六進位 SHA-256（大小寫皆可）；未提供時回傳 None
+    if not value:
+        return None
+    value = value.strip().lower()
+    if len(value) != 64 or not set(value) <= set("0123456789abcdef"):
+        raise HTTPException(status_code=400, detail="sha256 必須是 64 個十六進位字元")
+    return value
+
+
+def _progress(session, indexes):
+    received = set(indexes)
+    chunk_size = session["chunk_size"]
+    contiguous = 0
+    while contiguous in received:
+        contiguous += 1
+    missing = [i * chunk_size for i in range(chunkCount(session)) if i not in received]
+    return {
+        "id": session["id"],
+        "job_id": session["job_id"],
+        "file_name": session["file_name"],
+        "size": session["size"],
+        "chunk_size": chunk_size,
+        # 從頭連續完成的位元組數（tus Upload-Offset）
+        "offset": min(contiguous * chunk_size, session["size"]),
+        "missing": missing,
+        "expires_at": session["expires_at"],
+    }
+
+
+async def _session(conn, session_id, user_id, variant):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, f"uploads.{variant}", (session_id,))
+        session = await cur.fetchone()
+    if session is None:
+        raise HTTPException(status_code=404, detail="上傳 session 不存在或已過期")
+    if session["uploaded_by"] != user_id:
+        raise HTTPException(status_code=403, detail="無權存取此上傳")
+    return session
+
+
+async def _chunks(conn, session_id):
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "uploads.chunks", (session_id,))
+        return [row["chunk_index"] for row in await cur.fetchall()]
+
+
+# ---------------------------------
+# Session 操作
+# ---------------------------------
+async def expire(conn):
+    """
+    刪除逾期的 session 與暫存檔，回傳刪除的數量；不 commit，由呼叫端 commit。
+    檔案在 commit 前就刪除：逾期的 session 已不接受寫入。
+    """
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "uploads.expire")
+        expired = [row["id"] for row in await cur.fetchall()]
+    if expired:
+        await asyncio.to_thread(_removeParts, expired)
+    return len(expired)
+
+
+async def create(conn, job_id, uploaded_by, file_name, size, sha256=None):
+    """
+    建立上傳 session；案件不存在時回傳 None。
+    size 超過 storage.MAX_RESUMABLE_SIZE 時回傳 413。
+    """
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="檔案大小必須大於 0")
+    if size > storage.MAX_RESUMABLE_SIZE:
+        raise HTTPException(status_code=413, detail="檔案過大")
+
+    sha256 = _normalizeHash(sha256)
+    await expire(conn)
+
+    session_id = secrets.token_urlsafe(24)
+    path = partPath(session_id)
+    await asyncio.to_thread(_createPart, path, size)
+    try:
+        async with conn.cursor() as cur:
+            await statements.execute(
+                cur, "uploads.create",
+                (session_id, uploaded_by, file_name, size, CHUNK_SIZE, sha256, TTL, job_id)
+            )
+            session = await cur.fetchone()
+        await conn.commit()
+    except BaseException:
+        await asyncio.to_thread(_removeParts, [session_id])
+        raise
+
+    if session is None:
+        await asyncio.to_thread(_removeParts, [session_id])
+        return None
+    return _progress(session, [])
+
+
+async def status(conn, session_id, user_id):
+    session = await _session(conn, session_id, user_id, "get")
+    return _progress(session, await _chunks(conn, session_id))
+
+
+async def writeChunk(conn, session_id, user_id, offset, data):
+    """
+    將一個完整區塊寫到 offset；同一區塊重送會直接覆寫（內容相同時結果不變）。
+    回傳目前的進度（同 status）。
+    """
+    session = await _session(conn, session_id, user_id, "share")
+    if len(data) != chunkLength(session, offset):
+        raise HTTPException(status_code=400, detail="區塊長度與 chunk_size 不符")
+
+    try:
+        await asyncio.to_thread(_pwrite, partPath(session_id), offset, data)
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="暫存檔已不存在，請重新建立上傳")
+
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "uploads.addChunk", (session_id, offset // session["chunk_size"]))
+    progress = _progress(session, await _chunks(conn, session_id))
+    await conn.commit()
+    return progress
+
+
+async def finalize(conn, session_id, user_id, sha256=None):
+    """
+    完成上傳：
+    - 所有區塊都已寫入，否則回傳 409
+    - 整個檔案的 SHA-256 與宣告的檢查碼（建立時或完成時提供）相符，否則刪除 session 並回傳 460
+    - 暫存檔硬連結到 blob 路徑並登錄（storage.adoptBlob）、寫入 deliverables 並更新狀態
+      （jobs.addDeliverable），commit 後才刪除暫存檔
+    """
+    session = await _session(conn, session_id, user_id, "lock")
+    expected = _normalizeHash(sha256) or session["sha256"]
+    if not expected:
+        raise HTTPException(status_code=400, detail="請提供 sha256 檢查碼")
+
+    missing = chunkCount(session) - len(await _chunks(conn, session_id))
+    if missing:
+        raise HTTPException(status_code=409, detail=f"尚有 {missing} 個區塊未上傳")
+
+    path = partPath(session_id)
+    try:
+        actual, size = await storage.hashFile(path, session["size"])
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="暫存檔已不存在，請重新建立上傳")
+
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "uploads.delete", (session_id,))
+
+    if actual != expected:
+        await conn.commit()
+        await asyncio.to_thread(_removeParts, [session_id])
+        raise HTTPException(status_code=460, detail="檔案檢查碼不符，請重新上傳")
+
+    # commit 前檔案就已在 blob 路徑（背景處理一定讀得到）；任何一步失敗都會 rollback，
+    # session 與暫存檔維持原狀，可再次 finalize，最多留下一個無人引用的 blob 檔案
+    blob = await storage.adoptBlob(conn, path, actual, size)
+    # 與 /api/upload 相同：新增成果紀錄、更新狀態、排入背景處理（並 commit）
+    await jobs.addDeliverable(conn, session["job_id"], blob["path"], session["file_name"], user_id)
+    await asyncio.to_thread(_removeParts, [session_id])
+    return {
+        "job_id": session["job_id"],
+        "file_name": session["file_name"],
+        "size": size,
+        "sha256": actual,
+        "deduplicated": blob["deduplicated"],
+    }
+
+
+async def abort(conn, session_id, user_id):
+    await _session(conn, session_id, user_id, "lock")
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "uploads.delete", (session_id,))
+    await conn.commit()
+    await asyncio.to_thread(_removeParts, [session_id])
@@ -0,0 +1,75 @@
+# users.py
+# =============================
+# 使用者身分 (Session identity & profile cache)
+# =============================
+# 功能說明：
+# - 登入時把頁面需要的身分資料（user_id、username、role）一次存進 session，
+#   之後的頁面直接由 session 取得，不再為了顯示名稱查詢 users
+# - 需要最新資料時（例如舊版 session 缺少 username）使用 getProfile，
+#   以小型 TTL 快取避免每個請求都查資料庫
+# - 供 sessionLogin.py（登入 / 登出）與 main.py 使用
+# =============================
+
+import os
+
+import cache
+import statements
+
+# session 中存放的身分欄位
+SESSION_KEYS = ("user_id", "username", "role")
+
+profileCache = cache.TTLCache(
+    "user_profile",
+    maxsize=int(os.environ.get("USER_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("USER_CACHE_TTL", 300)),
+)
+
+statements.register("users.profile", "SELECT id, username, role, email FROM users WHERE id = %s;")
+
+
+def startSession(request, user):
+    # 登入：清除舊 session 後寫入身分資料
+    request.session.clear()
+    request.session["user_id"] = user["id"]
+    request.session["username"] = user["username"]
+    request.session["role"] = user["role"]
+    profileCache.set(user["id"], {k: user.get(k) for k in ("id", "username", "role", "email")})
+
+
+def currentUser(request):
+    # 由 session 取得目前登入者；未登入時各欄位為 None
+    return {key: request.session.get(key) for key in SESSION_KEYS}
+
+
+async def getProfile(conn, user_id):
+    """
+    取得使用者資料（id、username、role、email），優先讀取快取；
+    使用者不存在時回傳 None（不快取）。
+    """
+    profile = profileCache.get(user_id)
+    if profile is not None:
+        return profile
+    version = profileCache.version
+    async with conn.cursor() as cur:
+        await statements.execute(cur, "users.profile", (user_id,))
+        profile = await cur.fetchone()
+    if profile is not None:
+        profileCache.set(user_id, profile, version)
+    return profile
+
+
+async def resolveUser(request, conn):
+    """
+    頁面用的登入者資料：session 已有 username 時完全不查資料庫；
+    舊版 session（只有 user_id / role）改由 getProfile 補齊並寫回 session。
+    """
+    user = currentUser(request)
+    if user["user_id"] and not user["username"]:
+        profile = await getProfile(conn, user["user_id"])
+        if profile is None:
+            # 帳號已不存在
+            request.session.clear()
+            return currentUser(request)
+        request.session["username"] = user["username"] = profile["username"]
+        request.session["role"] = user["role"] = profile["role"]
+    return user
@@ -0,0 +1,151 @@
+# worker.py
+# =============================
+# 背景工作程序 (Task worker)
+# =============================
+# 用法：
+#   python worker.py [--concurrency N]   持續執行 tasks 佇列中的工作
+#   python worker.py stats               列出尚未完成的工作數（依 kind / status）
+#   python worker.py retry [--id ID]     將 dead 工作放回佇列（預設全部）
+#
+# - 與 web 程序分開部署、各自擴充；多個 worker 以 SKIP LOCKED 分工，不會重複執行
+# - LISTEN tasks_queued 收到新工作立即執行，另以 --poll 秒輪詢（延後重試的工作、漏掉的通知）
+# - 同時執行的工作數以 --concurrency 限制
+# - SIGTERM / SIGINT：停止取新工作，等待執行中的工作完成（最多 --grace 秒）；
+#   未完成的工作在 LEASE 到期後由其他 worker 重新執行
+# =============================
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+
+import psycopg
+from psycopg.rows import dict_row
+
+import db
+import processing  # noqa: F401 登錄 handler
+import taskqueue
+
+CONCURRENCY = int(os.environ.get("TASK_CONCURRENCY", 4))
+POLL_INTERVAL = float(os.environ.get("TASK_POLL_INTERVAL", 5))
+SHUTDOWN_GRACE = float(os.environ.get("TASK_SHUTDOWN_GRACE", 30))
+
+
+async def _listen(wake, stop):
+    # 收到 NOTIFY 就喚醒主迴圈；斷線時重新連線（期間仍靠輪詢取工作）
+    delay = 1
+    while not stop.is_set():
+        try:
+            async with await psycopg.AsyncConnection.connect(db.DATABASE_URL, autocommit=True) as conn:
+                await conn.execute(f"LISTEN {taskqueue.CHANNEL};")
+                delay = 1
+                wake.set()
+                async for _ in conn.notifies():
+                    wake.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ LISTEN {taskqueue.CHANNEL} 中斷：{e}，{delay} 秒後重新連線")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+async def _execute(pool, task):
+    start = time.perf_counter()
+    status = await taskqueue.run(pool, task)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"task {task['id']} {task['kind']} 第 {task['attempts']} 次：{status}（{elapsed:.0f} ms）")
+
+
+async def work(args):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    pool = await db.openPool()
+    stop = asyncio.Event()
+    wake = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    listener = asyncio.create_task(_listen(wake, stop))
+    running = set()
+    last_recover = 0.0
+
+    def finished(task):
+        running.discard(task)
+        wake.set()
+
+    print(f"worker {worker_id} 啟動：concurrency={args.concurrency}，handlers={sorted(taskqueue.handlers)}")
+    try:
+        while not stop.is_set():
+            wake.clear()
+
+            # 回收當機 worker 留下的工作
+            if time.monotonic() - last_recover > taskqueue.LEASE / 2:
+                last_recover = time.monotonic()
+                async with pool.connection() as conn:
+                    recovered = await taskqueue.recover(conn)
+                if recovered["queued"]:
+                    print(f"⚠️ 回收逾時工作：{recovered['queued']}")
+                if recovered["dead"]:
+                    print(f"❌ 逾時且已無重試次數，標記為 dead：{recovered['dead']}")
+
+            free = args.concurrency - len(running)
+            claimed = []
+            if free > 0:
+                async with pool.connection() as conn:
+                    claimed = await taskqueue.claim(conn, worker_id, free)
+                for task in claimed:
+                    t = asyncio.create_task(_execute(pool, task))
+                    running.add(t)
+                    t.add_done_callback(finished)
+
+            # 取滿了代表佇列可能還有工作，空位出現（finished 會 wake）就再取
+            if free > 0 and len(claimed) == free:
+                continue
+            stopping = asyncio.create_task(stop.wait())
+            waking = asyncio.create_task(wake.wait())
+            await asyncio.wait({stopping, waking}, timeout=args.poll, return_when=asyncio.FIRST_COMPLETED)
+            stopping.cancel()
+            waking.cancel()
+    finally:
+        listener.cancel()
+        if running:
+            print(f"等待 {len(running)} 個執行中的工作完成（最多 {args.grace} 秒）")
+            _, pending = await asyncio.wait(running, timeout=args.grace)
+            for t in pending:
+                t.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        await db.closePool()
+        print(f"worker {worker_id} 已停止")
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="背景工作程序")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="同時執行的工作數")
+    parser.add_argument("--poll", type=float, default=POLL_INTERVAL, help="輪詢間隔秒數")
+    parser.add_argument("--grace", type=float, default=SHUTDOWN_GRACE, help="停止時等待執行中工作的秒數")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("stats", help="列出尚未完成的工作數")
+    p_retry = sub.add_parser("retry", help="將 dead 工作放回佇列")
+    p_retry.add_argument("--id", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        await work(args)
+        return 0
+
+    async with await psycopg.AsyncConnection.connect(db.DATABASE_URL, row_factory=dict_row) as conn:
+        if args.command == "stats":
+            for row in await taskqueue.stats(conn):
+                print(f"{row['kind']:<24} {row['status']:<8} {row['count']:>8}")
+        elif args.command == "retry":
+            ids = await taskqueue.retryDead(conn, args.id)
+            print(f"已放回佇列：{ids}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))